@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+
+
+class SubmissionHistoryCursorPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # id различает записи с одинаковым changed_at, иначе порядок внутри них не определен
+    ordering = ('changed_at', 'id')
+
+    def get_page_size(self, request):
+        # PAGE_SIZE приходит из окружения строкой и может быть не задан: тогда страница максимальная
+        self.page_size = int(api_settings.PAGE_SIZE or self.max_page_size)
+        return super().get_page_size(request)
@@ -1,16 +1,19 @@
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+
+from api.signals import LANGS, delete_cache_patterns
 
 User = get_user_model()
 
 
+def invalidate_users_list_cache():
+    for lang in LANGS:
+        delete_cache_patterns(f'admin_users_list_{lang}_page_*')
+
+
 # Сигналы для инвалидации кеша
 @receiver(post_save, sender=User)
 @receiver(post_delete, sender=User)
 def invalidate_user_cache(sender, instance, **kwargs):
-    for lang in ['ru', 'en']:
-        cache_key_pattern = f'admin_users_list_{lang}_page_*'
-        keys = cache.keys(cache_key_pattern)
-        cache.delete_many(keys)
\ No newline at end of file
+    invalidate_users_list_cache()
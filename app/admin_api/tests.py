@@ -1,17 +1,43 @@
+import errno
+import hashlib
+import importlib.util
+import json
 import os
+import shutil
+import tempfile
+import time
 import uuid
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core import signing
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import UnreadablePostError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from api.models import UserProfile, Profile, Task, Submission, TaskSubmission
-from api.serializers import ProfileSerializer, TaskSerializer
+from api.blobs import create_profile_file
+from api.exceptions import UploadConflict
+from api.models import UserProfile, Profile, FileBlob, ProfileFile, Task, TaskProfile, Submission, SubmissionHistory, \
+    TaskSubmission
+from api.serializers import ProfileSerializer, SubmissionLatestHistorySerializer, TaskSerializer
+from api.sqljson import SQLJSONSerializer
+from api.resumable import ResumableUpload
+from api.uploads import ProfileFileUploadHandler, UploadTooLarge
+from users.hashing import encode_passwords_in_processes
+from users.provisioning import PARALLEL_HASH_THRESHOLD, hash_passwords
 from .factories import UserFactory, ProfileFactory, UserProfileFactory
 from .permissions import IsAdmin
 from .views import AdminRetrieveUpdateDestroyProfileView, AdminRetrieveUpdateDestroyTaskView
@@ -99,6 +125,49 @@ class AdminUsersListViewTest(APITestCase):
         self.assertTrue(all(field in response.data['results'][0] for field in expected_fields))
 
 
+class AdminUserDestroyViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.task = Task.objects.create(title_ru='Задача', title_en='Task', profile_id=self.profile)
+        UserProfile.objects.create(user=self.regular_user, profile=self.profile)
+        submission = Submission.objects.create(user_id=self.regular_user, task_id=self.task, comment='Ответ')
+        SubmissionHistory.objects.create(submission=submission, previous_comment='Старый ответ')
+        UserActionLog.objects.create(user=self.regular_user, action='Viewed profile list')
+        self.url = reverse('admin-user-detail', kwargs={'userId': self.regular_user.id, 'lang': 'en'})
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_delete_user(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.objects.filter(id=self.regular_user.id).exists())
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_delete_user_async(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.delete(f'{self.url}?async=1')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # До фонового удаления пользователь уже неактивен и скрыт из списка
+        self.regular_user.refresh_from_db()
+        self.assertFalse(self.regular_user.is_active)
+        response = self.client.get(reverse('admin-users', kwargs={'lang': 'en'}))
+        self.assertNotIn(str(self.regular_user.id), [user['id'] for user in response.data['results']])
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(User.objects.filter(id=self.regular_user.id).exists())
+        self.assertFalse(Submission.objects.exists())
+        self.assertFalse(UserActionLog.objects.filter(user_id=self.regular_user.id).exists())
+        self.assertTrue(Task.objects.filter(id=self.task.id).exists())
+
+    def test_delete_user_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class AdminUserViewSetTests(APITestCase):
     def setUp(self):
         self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
@@ -129,6 +198,49 @@ class AdminUserViewSetTests(APITestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
 
+    def test_set_profiles_pairs(self):
+        second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        UserProfile.objects.create(user=self.regular_user, profile=self.profile)
+        url = reverse('admin-user-set-profiles', kwargs={'lang': 'en'})
+        data = {'pairs': [
+            {'user_id': str(self.regular_user.id), 'profile_id': str(self.profile.id)},
+            {'user_id': str(self.regular_user.id), 'profile_id': str(second_profile.id)},
+            {'user_id': str(self.admin_user.id), 'profile_id': str(self.profile.id)},
+        ]}
+        # Аутентификация, два IN-запроса на пользователей и профили, существующие пары и вставка
+        with self.assertNumQueries(5):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(response.data['existing'], [{'user_id': self.regular_user.id, 'profile_id': self.profile.id}])
+        self.assertEqual(UserProfile.objects.count(), 3)
+
+    def test_set_profiles_cross_product(self):
+        second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        url = reverse('admin-user-set-profiles', kwargs={'lang': 'en'})
+        data = {
+            'user_ids': [str(self.regular_user.id), str(self.admin_user.id)],
+            'profile_ids': [str(self.profile.id), str(second_profile.id)],
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['created']), 4)
+        self.assertEqual(response.data['existing'], [])
+        self.assertEqual(UserProfile.objects.count(), 4)
+
+    def test_set_profiles_unknown_ids(self):
+        url = reverse('admin-user-set-profiles', kwargs={'lang': 'en'})
+        data = {'user_ids': [str(self.regular_user.id), str(uuid.uuid4())], 'profile_ids': [str(self.profile.id)]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('user_ids', response.data)
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_set_profiles_invalid_spec(self):
+        url = reverse('admin-user-set-profiles', kwargs={'lang': 'en'})
+        response = self.client.post(url, {'user_ids': [str(self.regular_user.id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_set_password_success(self):
         url = reverse('admin-user-set-password', kwargs={'lang': 'ru'})
         data = {
@@ -171,6 +283,109 @@ class AdminUserViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AdminUserBulkCreateViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        self.url = reverse('admin-users-bulk', kwargs={'lang': 'en'})
+        self.client.force_authenticate(user=self.admin_user)
+
+    def user_data(self, i, **kwargs):
+        return {'username': f'bulk{i}', 'email': f'bulk{i}@example.com', 'password': f'Str0ng-pass-{i}', **kwargs}
+
+    def test_bulk_create_json(self):
+        data = [self.user_data(0, profiles=[str(self.profile.id), str(self.second_profile.id)]), self.user_data(1)]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        user = User.objects.get(username='bulk0')
+        self.assertTrue(user.check_password('Str0ng-pass-0'))
+        self.assertEqual(set(user.profiles.all()), {self.profile, self.second_profile})
+        self.assertFalse(User.objects.get(username='bulk1').profiles.exists())
+
+    def test_bulk_create_csv(self):
+        body = 'username,email,password,profiles\n' \
+               f'bulk0,bulk0@example.com,Str0ng-pass-0,{self.profile.id};{self.second_profile.id}\n' \
+               'bulk1,bulk1@example.com,Str0ng-pass-1,\n'
+        response = self.client.generic('POST', self.url, body.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserProfile.objects.filter(user__username='bulk0').count(), 2)
+        self.assertTrue(User.objects.get(username='bulk1').check_password('Str0ng-pass-1'))
+
+    def test_bulk_create_duplicates(self):
+        data = [self.user_data(0), self.user_data(0), self.user_data(1, email='user@example.com')]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        self.assertIn('email', response.data)
+        self.assertFalse(User.objects.filter(username__startswith='bulk').exists())
+
+    def test_bulk_create_repeated_profile(self):
+        body = 'username,email,password,profiles\n' \
+               f'bulk0,bulk0@example.com,Str0ng-pass-0,{self.profile.id};{self.profile.id}\n'
+        response = self.client.generic('POST', self.url, body.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserProfile.objects.filter(user__username='bulk0').count(), 1)
+
+    def test_bulk_create_weak_passwords(self):
+        data = [self.user_data(0, password='12345678'), self.user_data(1, password='bulk1@example.com')]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', response.data[0])
+        self.assertIn('password', response.data[1])
+        self.assertFalse(User.objects.filter(username__startswith='bulk').exists())
+
+    def test_bulk_create_unknown_profile(self):
+        response = self.client.post(self.url, [self.user_data(0, profiles=[str(uuid.uuid4())])], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(username='bulk0').exists())
+
+    def test_bulk_create_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, [self.user_data(0)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_hash_passwords_in_processes(self):
+        passwords = [f'password{i}' for i in range(PARALLEL_HASH_THRESHOLD)]
+        encoded = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords, encoded)))
+
+    def test_bulk_create_hashes_in_request_process(self):
+        data = [self.user_data(i) for i in range(PARALLEL_HASH_THRESHOLD)]
+        with mock.patch('users.provisioning.encode_passwords_in_processes') as in_processes:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        in_processes.assert_not_called()
+        self.assertTrue(User.objects.get(username='bulk0').check_password('Str0ng-pass-0'))
+
+    def test_provision_users_command_hashes_in_processes(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('username,email,password,profiles\n')
+            for i in range(PARALLEL_HASH_THRESHOLD):
+                file.write(f'bulk{i},bulk{i}@example.com,Str0ng-pass-{i},\n')
+        self.addCleanup(os.remove, file.name)
+
+        with mock.patch('users.provisioning.encode_passwords_in_processes',
+                        wraps=encode_passwords_in_processes) as in_processes:
+            call_command('provision_users', file.name, '--workers', '2', stdout=StringIO())
+        self.assertEqual(in_processes.call_args.args[3], 2)
+        self.assertTrue(User.objects.get(username='bulk1').check_password('Str0ng-pass-1'))
+
+    def test_provision_users_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(f'username,email,password,profiles\nbulk0,bulk0@example.com,Str0ng-pass-0,{self.profile.id}\n')
+        self.addCleanup(os.remove, file.name)
+
+        call_command('provision_users', file.name, stdout=StringIO())
+
+        user = User.objects.get(username='bulk0')
+        self.assertTrue(user.check_password('Str0ng-pass-0'))
+        self.assertEqual(list(user.profiles.all()), [self.profile])
+
+
 class AdminProfileListCreateViewTests(APITestCase):
     def setUp(self):
         self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
@@ -283,6 +498,52 @@ class AdminRetrieveUpdateDestroyProfileViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Profile.objects.filter(id=self.profile.id).exists())
 
+    @override_settings(BACKGROUND_TASKS_EAGER=True, DELETION_BATCH_SIZE=1)
+    def test_delete_profile_async(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        second_task = Task.objects.create(title_ru='Задача 2', title_en='Task 2', profile_id=self.profile)
+        TaskProfile.objects.create(task=self.task, profile=self.profile)
+        TaskProfile.objects.create(task=second_task, profile=self.profile)
+        UserProfile.objects.create(user=self.regular_user, profile=self.profile)
+        for task in (self.task, second_task):
+            submission = Submission.objects.create(user_id=self.regular_user, task_id=task, comment='Ответ')
+            TaskSubmission.objects.create(task=task, submission=submission)
+            SubmissionHistory.objects.create(submission=submission, previous_comment='Старый ответ')
+        with self.settings(MEDIA_ROOT=media_root):
+            profile_file = ProfileFile.objects.create(
+                profile=self.profile, file=SimpleUploadedFile('file.txt', b'content'))
+        file_path = profile_file.file.path
+        cache.set(f'task_en_{second_task.id}', {'title': 'Task 2'})
+
+        self.client.force_authenticate(user=self.admin_user)
+        with self.settings(MEDIA_ROOT=media_root), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'{self.url}?async=1')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Profile.objects.filter(id=self.profile.id).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(Submission.objects.exists())
+        self.assertFalse(SubmissionHistory.objects.exists())
+        self.assertFalse(UserProfile.objects.exists())
+        self.assertFalse(ProfileFile.objects.exists())
+        self.assertFalse(os.path.exists(file_path))
+        self.assertIsNone(cache.get(f'task_en_{second_task.id}'))
+
+    def test_delete_profile_async_hides_profile_until_purged(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.delete(f'{self.url}?async=1')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+
+        self.assertTrue(Profile.objects.filter(id=self.profile.id, deleted_at__isnull=False).exists())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(Profile.objects.filter(id=self.profile.id).exists())
+        self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+
     def test_delete_profile_as_regular_user(self):
         self.client.force_authenticate(user=self.regular_user)
         response = self.client.delete(self.url)
@@ -349,6 +610,498 @@ class AdminRetrieveUpdateDestroyProfileViewTest(APITestCase):
         os.rmdir(base)
 
 
+class AdminProfileFileUploadViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.url = reverse('admin-profile-files', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        self.client.force_authenticate(user=self.admin_user)
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.media_root = media_root
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_upload_files(self):
+        content = b'file_content' * 1000
+        files = [SimpleUploadedFile('file1.txt', content), SimpleUploadedFile('file2.txt', b'second')]
+        response = self.client.post(self.url, {'file': files}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+
+        profile_file = ProfileFile.objects.get(profile=self.profile, size=len(content))
+        self.assertEqual(profile_file.checksum, hashlib.sha256(content).hexdigest())
+        with profile_file.file.open('rb') as file:
+            self.assertEqual(file.read(), content)
+
+    def test_upload_same_content_is_stored_once(self):
+        second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        second_url = reverse('admin-profile-files', kwargs={'profileId': second_profile.id, 'lang': 'en'})
+        self.client.post(self.url, {'file': SimpleUploadedFile('report.pdf', b'same content')}, format='multipart')
+        response = self.client.post(second_url, {'file': SimpleUploadedFile('copy.pdf', b'same content')},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]['name'], 'copy.pdf')
+
+        self.assertEqual(FileBlob.objects.count(), 1)
+        self.assertEqual(len(set(ProfileFile.objects.values_list('file', flat=True))), 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_blob_deleted_with_last_reference(self):
+        second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        for profile in (self.profile, second_profile):
+            create_profile_file(profile, SimpleUploadedFile('report.pdf', b'same content'))
+        blob = FileBlob.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.delete()
+        self.assertTrue(FileBlob.objects.filter(id=blob.id).exists())
+        self.assertTrue(os.path.exists(blob.file.path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second_profile.delete()
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(os.path.exists(blob.file.path))
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_replace_files_cleans_up_after_commit(self):
+        old_files = [create_profile_file(self.profile, SimpleUploadedFile(f'old{i}.txt', f'old {i}'.encode()))
+                     for i in range(3)]
+        old_paths = [profile_file.blob.file.path for profile_file in old_files]
+        url = reverse('admin-profile-detail', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        data = {'description_ru': 'Профиль', 'description_en': 'Profile',
+                'uploaded_files': [SimpleUploadedFile('new.txt', b'new content')]}
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.put(url, data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.profile.files.values_list('name', flat=True)), ['new.txt'])
+        # До коммита содержимое старых файлов не трогается
+        self.assertTrue(all(os.path.exists(path) for path in old_paths))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(FileBlob.objects.count(), 1)
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+
+    def test_replace_files_rolls_back_on_error(self):
+        create_profile_file(self.profile, SimpleUploadedFile('old.txt', b'old content'))
+        url = reverse('admin-profile-detail', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        data = {'description_ru': 'Профиль', 'description_en': 'Profile',
+                'uploaded_files': [SimpleUploadedFile('big.txt', b'x' * 101)]}
+
+        with self.settings(PROFILE_MAX_FILE_SIZE=100), self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.put(url, data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(self.profile.files.values_list('name', flat=True)), ['old.txt'])
+        self.assertEqual(callbacks, [])
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True, FILE_CLEANUP_RETRIES=3, FILE_CLEANUP_RETRY_DELAY=0)
+    def test_cleanup_retries_storage_errors(self):
+        profile_file = create_profile_file(self.profile, SimpleUploadedFile('file.txt', b'content'))
+        storage = FileBlob._meta.get_field('file').storage
+        with mock.patch.object(storage, 'delete', side_effect=[OSError('busy'), OSError('busy'), None]) as mocked:
+            with self.captureOnCommitCallbacks(execute=True):
+                ProfileFile.objects.filter(id=profile_file.id).delete()
+        self.assertEqual(mocked.call_count, 3)
+        self.assertFalse(FileBlob.objects.exists())
+
+    def test_purge_deleted_collects_orphan_blobs(self):
+        orphan = create_profile_file(self.profile, SimpleUploadedFile('orphan.txt', b'orphan'))
+        kept = create_profile_file(self.profile, SimpleUploadedFile('kept.txt', b'kept'))
+        # Фоновая очистка не выполнилась (например, процесс перезапустился до ее запуска)
+        with mock.patch('api.signals.run_in_background'), self.captureOnCommitCallbacks(execute=True):
+            orphan.delete()
+        self.assertEqual(FileBlob.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_deleted', '--older-than', '3600', stdout=StringIO())
+        self.assertEqual(FileBlob.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_deleted', stdout=StringIO())
+        self.assertEqual(list(FileBlob.objects.values_list('id', flat=True)), [kept.blob_id])
+        self.assertEqual(len(self.stored_files()), 1)
+
+    @override_settings(PROFILE_MAX_FILE_SIZE=100)
+    def test_upload_file_too_large(self):
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('big.txt', b'x' * 101)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(ProfileFile.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(PROFILE_MAX_TOTAL_SIZE=150)
+    def test_upload_profile_total_size_exceeded(self):
+        ProfileFile.objects.create(profile=self.profile, file='files/existing.txt', size=100)
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('file.txt', b'x' * 60)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(ProfileFile.objects.count(), 1)
+
+    @override_settings(PROFILE_MAX_NUMBER_FILES=1)
+    def test_upload_too_many_files(self):
+        files = [SimpleUploadedFile('file1.txt', b'first'), SimpleUploadedFile('file2.txt', b'second')]
+        response = self.client.post(self.url, {'file': files}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(ProfileFile.objects.exists())
+
+    def test_upload_handler_aborts_on_first_chunk_over_limit(self):
+        handler = ProfileFileUploadHandler(max_file_size=100, remaining_size=1000, remaining_files=5)
+        handler.new_file('file', 'file.txt', 'text/plain', None)
+        handler.receive_data_chunk(b'x' * 60, 0)
+        with self.assertRaises(UploadTooLarge):
+            handler.receive_data_chunk(b'x' * 60, 60)
+        self.assertTrue(handler.file.closed)
+
+    def test_upload_to_nonexistent_profile(self):
+        url = reverse('admin-profile-files', kwargs={'profileId': uuid.uuid4(), 'lang': 'en'})
+        response = self.client.post(url, {'file': SimpleUploadedFile('file.txt', b'content')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_upload_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('file.txt', b'content')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class InterruptedStream:
+    """Поток тела запроса, который обрывается после limit байт, как при разрыве соединения"""
+
+    def __init__(self, data, limit):
+        self.data = BytesIO(data)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.data.tell() >= self.limit:
+            raise UnreadablePostError("connection reset")
+        return self.data.read(min(size, self.limit - self.data.tell()))
+
+
+class AdminResumableUploadViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.client.force_authenticate(user=self.admin_user)
+        self.content = os.urandom(300)
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        upload_settings = self.settings(MEDIA_ROOT=os.path.join(media_root, 'media'),
+                                        RESUMABLE_UPLOAD_DIR=os.path.join(media_root, 'uploads'))
+        upload_settings.enable()
+        self.addCleanup(upload_settings.disable)
+
+    def create_upload(self, length=None):
+        url = reverse('admin-profile-uploads', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        length = len(self.content) if length is None else length
+        response = self.client.post(url, {'filename': 'big.bin', 'length': length}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def patch(self, upload_id, offset, data):
+        url = reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'})
+        return self.client.generic('PATCH', url, data, content_type='application/offset+octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset))
+
+    def get_offset(self, upload_id):
+        response = self.client.get(reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Upload-Offset'], str(response.data['offset']))
+        return response.data['offset']
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('admin-upload-finalize', kwargs={'uploadId': upload_id, 'lang': 'en'}))
+
+    def assert_stored(self, response):
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        profile_file = ProfileFile.objects.get(profile=self.profile)
+        self.assertEqual(profile_file.size, len(self.content))
+        self.assertEqual(profile_file.checksum, hashlib.sha256(self.content).hexdigest())
+        with profile_file.file.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_upload_in_chunks(self):
+        upload_id = self.create_upload()
+        for offset in (0, 100, 200):
+            response = self.patch(upload_id, offset, self.content[offset:offset + 100])
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(response['Upload-Offset'], str(offset + 100))
+
+        self.assert_stored(self.finalize(upload_id))
+        self.assertFalse(os.path.exists(os.path.join(settings.RESUMABLE_UPLOAD_DIR, str(upload_id))))
+        response = self.client.get(reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_resume_after_interrupted_chunk(self):
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content[:100])
+
+        # Соединение обрывается посреди второй части: полученные 50 байт сохраняются
+        upload = ResumableUpload.get(upload_id)
+        with upload.lock():
+            upload.write_chunk(InterruptedStream(self.content[100:], limit=50), 100)
+        self.assertEqual(self.get_offset(upload_id), 150)
+
+        # Повтор со старого смещения отклоняется, клиент продолжает с того, что сообщил сервер
+        response = self.patch(upload_id, 100, self.content[100:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.patch(upload_id, 150, self.content[150:])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assert_stored(self.finalize(upload_id))
+
+    def test_resume_after_interruption_before_any_bytes(self):
+        upload_id = self.create_upload()
+        upload = ResumableUpload.get(upload_id)
+        with upload.lock():
+            upload.write_chunk(InterruptedStream(self.content, limit=0), 0)
+        self.assertEqual(self.get_offset(upload_id), 0)
+
+        self.patch(upload_id, 0, self.content)
+        self.assert_stored(self.finalize(upload_id))
+
+    def test_finalize_incomplete_upload(self):
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content[:100])
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(ProfileFile.objects.exists())
+        self.assertEqual(self.get_offset(upload_id), 100)
+
+    def test_chunk_exceeding_declared_length(self):
+        upload_id = self.create_upload(length=100)
+        response = self.patch(upload_id, 0, self.content[:101])
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.get_offset(upload_id), 0)
+
+    def test_patch_without_offset(self):
+        upload_id = self.create_upload()
+        url = reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'})
+        response = self.client.generic('PATCH', url, self.content, content_type='application/offset+octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PROFILE_MAX_FILE_SIZE=100)
+    def test_create_upload_too_large(self):
+        url = reverse('admin-profile-uploads', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        response = self.client.post(url, {'filename': 'big.bin', 'length': 101}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_abort_upload(self):
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content[:100])
+        url = reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(os.path.join(settings.RESUMABLE_UPLOAD_DIR, str(upload_id))))
+        self.assertEqual(self.patch(upload_id, 100, self.content[100:]).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_finalize_existing_content_reuses_blob(self):
+        create_profile_file(self.profile, SimpleUploadedFile('first.bin', self.content))
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FileBlob.objects.count(), 1)
+        self.assertEqual(ProfileFile.objects.filter(blob=FileBlob.objects.get()).count(), 2)
+
+    def test_finalize_discards_stored_content_when_limits_exceeded_under_lock(self):
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content)
+        # Между предварительной проверкой и блокировкой профиль заполнил параллельный запрос
+        with mock.patch('admin_api.views.check_profile_limits', side_effect=[None, UploadTooLarge('full')]), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertEqual([name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names], [])
+
+    def test_upload_of_another_admin(self):
+        upload_id = self.create_upload()
+        other_admin = User.objects.create_superuser('admin2', 'admin2@example.com', 'adminpass')
+        self.client.force_authenticate(user=other_admin)
+        self.assertEqual(self.patch(upload_id, 0, self.content).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.finalize(upload_id).status_code, status.HTTP_404_NOT_FOUND)
+        url = reverse('admin-upload-detail', kwargs={'uploadId': upload_id, 'lang': 'en'})
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNotNone(ResumableUpload.get(upload_id))
+
+    def test_expired_lock_of_another_request_is_kept(self):
+        upload = ResumableUpload.get(self.create_upload())
+        with upload.lock():
+            # Блокировка истекла, и ее взял другой запрос: выход из первого не должен ее снять
+            cache.delete(f'{upload.cache_key(upload.id)}_lock')
+            second = upload.lock()
+            second.__enter__()
+        with self.assertRaises(UploadConflict):
+            with upload.lock():
+                pass
+        second.__exit__(None, None, None)
+        with upload.lock():
+            pass
+
+    def test_purge_abandoned_uploads(self):
+        live_id = self.create_upload()
+        expired_id = self.create_upload()
+        cache.delete(ResumableUpload.cache_key(expired_id))
+        other_dir = os.path.join(settings.RESUMABLE_UPLOAD_DIR, 'not-an-upload')
+        os.makedirs(other_dir)
+
+        out = StringIO()
+        call_command('purge_uploads', stdout=out)
+
+        self.assertIn('uploads: 1', out.getvalue())
+        self.assertTrue(os.path.isdir(os.path.join(settings.RESUMABLE_UPLOAD_DIR, str(live_id))))
+        self.assertFalse(os.path.exists(os.path.join(settings.RESUMABLE_UPLOAD_DIR, str(expired_id))))
+        self.assertTrue(os.path.isdir(other_dir))
+
+    def test_assemble_without_copy_file_range_support(self):
+        upload_id = self.create_upload()
+        self.patch(upload_id, 0, self.content[:100])
+        self.patch(upload_id, 100, self.content[100:])
+        with mock.patch('api.resumable.os.copy_file_range', side_effect=OSError(errno.EXDEV, 'Cross-device link')):
+            self.assert_stored(self.finalize(upload_id))
+
+
+S3_TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'profile_files': {
+        'BACKEND': 'api.s3.ProfileFilesS3Storage',
+        'OPTIONS': {'bucket_name': 'profile-files', 'access_key': 'testing', 'secret_key': 'testing',
+                    'region_name': 'us-east-1'},
+    },
+}
+
+
+class AdminPresignedUploadViewTest(APITestCase):
+    content = b'direct upload content' * 100
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.url = reverse('admin-profile-presigned-uploads', kwargs={'profileId': self.profile.id, 'lang': 'en'})
+        self.complete_url = reverse('admin-presigned-upload-complete', kwargs={'lang': 'en'})
+        self.data = {'filename': 'report.pdf', 'length': len(self.content),
+                     'checksum': hashlib.sha256(self.content).hexdigest()}
+        self.client.force_authenticate(user=self.admin_user)
+
+    def start_s3(self):
+        from moto import mock_aws
+        import boto3
+
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        storage_settings = self.settings(STORAGES=S3_TEST_STORAGES)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.s3 = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing',
+                               aws_secret_access_key='testing')
+        self.s3.create_bucket(Bucket='profile-files')
+
+    def put_object(self, key, body):
+        self.s3.put_object(Bucket='profile-files', Key=key, Body=body)
+
+    def test_filesystem_storage_not_supported(self):
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_invalid_checksum(self):
+        response = self.client.post(self.url, dict(self.data, checksum='abc'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tampered_token(self):
+        response = self.client.post(self.complete_url, {'token': 'tampered'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'), "moto is not installed")
+    def test_presigned_upload(self):
+        self.start_s3()
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['method'], 'PUT')
+        key = f"blobs/{self.data['checksum'][:2]}/{self.data['checksum']}/report.pdf"
+        self.assertIn(key, response.data['url'])
+        self.assertIn('Signature', response.data['url'])
+        self.assertIn('x-amz-checksum-sha256', response.data['headers'])
+        self.assertFalse(ProfileFile.objects.exists())
+
+        self.put_object(key, self.content)
+        response = self.client.post(self.complete_url, {'token': response.data['token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'report.pdf')
+
+        profile_file = ProfileFile.objects.get(profile=self.profile)
+        self.assertEqual(profile_file.blob.file.name, key)
+        self.assertEqual(profile_file.size, len(self.content))
+        self.assertEqual(profile_file.checksum, self.data['checksum'])
+
+    @skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'), "moto is not installed")
+    def test_complete_is_idempotent(self):
+        self.start_s3()
+        token = self.client.post(self.url, self.data, format='json').data['token']
+        self.put_object(f"blobs/{self.data['checksum'][:2]}/{self.data['checksum']}/report.pdf", self.content)
+
+        first = self.client.post(self.complete_url, {'token': token}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        replay = self.client.post(self.complete_url, {'token': token}, format='json')
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(ProfileFile.objects.filter(profile=self.profile).count(), 1)
+
+    def test_token_expires_with_upload_link(self):
+        token = signing.TimestampSigner(salt='api.presigned.upload').sign_object({'profile_id': str(self.profile.id)})
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + settings.PRESIGNED_UPLOAD_TTL + 1):
+            response = self.client.post(self.complete_url, {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'), "moto is not installed")
+    @override_settings(FILE_DOWNLOAD_BACKEND='sendfile')
+    def test_sendfile_backend_redirects_for_s3(self):
+        self.start_s3()
+        profile_file = create_profile_file(self.profile, SimpleUploadedFile('report.pdf', self.content))
+        url = reverse('profile-file-download',
+                      kwargs={'lang': 'en', 'profileId': self.profile.id, 'fileId': profile_file.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertIn(profile_file.file.name, response['Location'])
+        self.assertIn('Signature', response['Location'])
+
+    @skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'), "moto is not installed")
+    def test_existing_content_attached_without_upload(self):
+        self.start_s3()
+        create_profile_file(self.profile, SimpleUploadedFile('original.pdf', self.content))
+        second_profile = Profile.objects.create(description_ru='Второй профиль', description_en='Second profile')
+        url = reverse('admin-profile-presigned-uploads', kwargs={'profileId': second_profile.id, 'lang': 'en'})
+
+        response = self.client.post(url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('url', response.data)
+        self.assertEqual(FileBlob.objects.count(), 1)
+        self.assertEqual(second_profile.files.get().name, 'report.pdf')
+
+    @skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'), "moto is not installed")
+    def test_complete_rejects_missing_or_wrong_content(self):
+        self.start_s3()
+        token = self.client.post(self.url, self.data, format='json').data['token']
+        response = self.client.post(self.complete_url, {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        key = f"blobs/{self.data['checksum'][:2]}/{self.data['checksum']}/report.pdf"
+        self.put_object(key, b'x' * len(self.content))
+        response = self.client.post(self.complete_url, {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertNotIn('Contents', self.s3.list_objects_v2(Bucket='profile-files'))
+        self.assertFalse(ProfileFile.objects.exists())
+
+
 class AdminTaskListCreateViewTest(APITestCase):
     def setUp(self):
         self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
@@ -462,6 +1215,70 @@ class AdminTaskListCreateViewTest(APITestCase):
         self.assertNotEqual(response2.data, response3.data)
 
 
+class AdminTaskBulkCreateViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.url = reverse('admin-tasks-bulk', kwargs={'lang': 'en'})
+        self.client.force_authenticate(user=self.admin_user)
+
+    def task_data(self, i, profile_id=None):
+        return {
+            'profile_id': str(profile_id or self.profile.id),
+            'title_ru': f'Задача {i}',
+            'title_en': f'Task {i}',
+            'description_ru': f'Описание {i}',
+            'description_en': f'Description {i}',
+        }
+
+    def test_bulk_create_json(self):
+        response = self.client.post(self.url, [self.task_data(i) for i in range(3)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Task.objects.filter(profile_id=self.profile).count(), 3)
+        self.assertEqual(TaskProfile.objects.filter(profile=self.profile).count(), 3)
+
+    def test_bulk_create_ndjson(self):
+        body = '\n'.join(json.dumps(self.task_data(i)) for i in range(2))
+        response = self.client.generic('POST', self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_bulk_create_csv(self):
+        rows = [self.task_data(i) for i in range(2)]
+        body = ','.join(rows[0]) + '\n' + '\n'.join(','.join(row.values()) for row in rows)
+        response = self.client.generic('POST', self.url, body.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(Task.objects.values_list('title_en', flat=True)), {'Task 0', 'Task 1'})
+
+    def test_bulk_create_unknown_profile(self):
+        data = [self.task_data(0), self.task_data(1, profile_id=uuid.uuid4())]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_create_invalid_row(self):
+        data = [self.task_data(0), {**self.task_data(1), 'status': 'UNKNOWN'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_create_invalidates_list_cache(self):
+        cache.clear()
+        list_url = reverse('admin-tasks', kwargs={'lang': 'en'})
+        Task.objects.create(title_ru='Задача', title_en='Task', profile_id=self.profile)
+        self.client.get(list_url)
+        self.client.post(self.url, [self.task_data(0)], format='json')
+        response = self.client.get(list_url)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_bulk_create_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, [self.task_data(0)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class AdminRetrieveUpdateDestroyTaskViewTest(APITestCase):
     def setUp(self):
         self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
@@ -521,6 +1338,18 @@ class AdminRetrieveUpdateDestroyTaskViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Task.objects.filter(id=self.task.id).exists())
 
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_delete_task_async(self):
+        submission = Submission.objects.create(user_id=self.regular_user, task_id=self.task, comment='Ответ')
+        SubmissionHistory.objects.create(submission=submission, previous_comment='Старый ответ')
+        self.client.force_authenticate(user=self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'{self.url}?async=1')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+        self.assertFalse(Submission.objects.exists())
+        self.assertTrue(Profile.objects.filter(id=self.profile.id).exists())
+
     def test_delete_task_as_regular_user(self):
         self.client.force_authenticate(user=self.regular_user)
         response = self.client.delete(self.url)
@@ -577,7 +1406,8 @@ class AdminSubmissionsListViewTest(APITestCase):
         self.assertEqual(len(response.data), 1)
 
     def test_order_submissions(self):
-        Submission.objects.create(task_id=self.task, user_id=self.regular_user, status='DONE')
+        other_user = User.objects.create_user('other', 'other@example.com', 'otherpass')
+        Submission.objects.create(task_id=self.task, user_id=other_user, status='DONE')
         self.client.force_authenticate(user=self.admin_user)
         response = self.client.get(f"{self.url}?ordering=-status")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -619,6 +1449,26 @@ class AdminRetrieveUpdateDestroySubmissionViewTest(APITestCase):
         self.submission.refresh_from_db()
         self.assertEqual(self.submission.status, 'ACCEPTED')
 
+    def test_update_submission_leased_by_other_admin(self):
+        other_admin = User.objects.create_superuser('admin2', 'admin2@example.com', 'adminpass')
+        Submission.objects.filter(id=self.submission.id).update(
+            reviewer=other_admin, lease_expires_at=timezone.now() + timedelta(minutes=5))
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.patch(self.url, {'status': 'ACCEPTED'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.status, 'WAITING')
+
+    def test_update_submission_releases_own_lease(self):
+        Submission.objects.filter(id=self.submission.id).update(
+            reviewer=self.admin_user, lease_expires_at=timezone.now() + timedelta(minutes=5))
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.put(self.url, {'status': 'ACCEPTED', 'admin_comment': 'Reviewed'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.submission.refresh_from_db()
+        self.assertIsNone(self.submission.reviewer)
+        self.assertIsNone(self.submission.lease_expires_at)
+
     def test_delete_submission_as_admin(self):
         self.client.force_authenticate(user=self.admin_user)
         response = self.client.delete(self.url)
@@ -631,6 +1481,239 @@ class AdminRetrieveUpdateDestroySubmissionViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('change_history', response.data)
 
+    def test_change_history_latest_entries(self):
+        for i in range(3):
+            SubmissionHistory.objects.create(submission=self.submission, previous_comment=f'Comment {i}')
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(f'{self.url}?history_limit=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['change_history_count'], 3)
+        self.assertEqual([entry['previous_comment'] for entry in response.data['change_history']],
+                         ['Comment 2', 'Comment 1'])
+
+    def test_change_history_latest_entries_keeps_request_context(self):
+        SubmissionHistory.objects.create(submission=self.submission, previous_comment='Comment')
+        contexts = []
+        get_latest_change_history = SubmissionLatestHistorySerializer.get_latest_change_history
+
+        def spy(serializer, obj):
+            contexts.append(serializer.context)
+            return get_latest_change_history(serializer, obj)
+
+        self.client.force_authenticate(user=self.admin_user)
+        with mock.patch.object(SubmissionLatestHistorySerializer, 'get_latest_change_history', spy):
+            response = self.client.get(f'{self.url}?history_limit=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(contexts[0]['history_limit'], 1)
+        self.assertEqual(contexts[0]['request'].user, self.admin_user)
+        self.assertIn('view', contexts[0])
+
+    def test_change_history_invalid_limit(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(f'{self.url}?history_limit=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdminSubmissionBulkReviewViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.tasks = [Task.objects.create(title_ru=f'Задача {i}', title_en=f'Task {i}', profile_id=self.profile)
+                      for i in range(5)]
+        self.submissions = [Submission.objects.create(task_id=task, user_id=self.regular_user, comment='Comment')
+                            for task in self.tasks]
+        self.url = reverse('admin-submissions-review', kwargs={'lang': 'ru'})
+
+    def review(self, submissions, review_status='ACCEPTED'):
+        return [{'id': str(submission.id), 'status': review_status, 'admin_comment': 'Reviewed'}
+                for submission in submissions]
+
+    def test_bulk_review(self):
+        self.client.force_authenticate(user=self.admin_user)
+        data = self.review(self.submissions[:2]) + [
+            {'id': str(uuid.uuid4()), 'status': 'ACCEPTED', 'admin_comment': 'Reviewed'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['result'] for item in response.data['results']], ['updated', 'updated', 'not_found'])
+
+        for submission in self.submissions[:2]:
+            submission.refresh_from_db()
+            self.assertEqual(submission.status, 'ACCEPTED')
+            self.assertEqual(submission.admin_comment, 'Reviewed')
+            self.assertEqual(submission.change_history.get().previous_status, 'WAITING')
+
+    def test_bulk_review_skips_submissions_leased_by_other_admin(self):
+        other_admin = User.objects.create_superuser('admin2', 'admin2@example.com', 'adminpass')
+        lease_expires_at = timezone.now() + timedelta(minutes=5)
+        Submission.objects.filter(id=self.submissions[0].id).update(
+            reviewer=other_admin, lease_expires_at=lease_expires_at)
+        Submission.objects.filter(id=self.submissions[1].id).update(
+            reviewer=self.admin_user, lease_expires_at=lease_expires_at)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(self.url, self.review(self.submissions[:2]), format='json')
+        self.assertEqual([item['result'] for item in response.data['results']], ['leased', 'updated'])
+        self.assertEqual(Submission.objects.get(id=self.submissions[0].id).status, 'WAITING')
+        reviewed = Submission.objects.get(id=self.submissions[1].id)
+        self.assertIsNone(reviewed.reviewer)
+        self.assertIsNone(reviewed.lease_expires_at)
+
+    def test_bulk_review_unchanged(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(self.url, self.review(self.submissions[:1]), format='json')
+        response = self.client.post(self.url, self.review(self.submissions[:1]), format='json')
+        self.assertEqual(response.data['results'][0]['result'], 'unchanged')
+        self.assertEqual(SubmissionHistory.objects.count(), 1)
+
+    def test_bulk_review_constant_queries(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with CaptureQueriesContext(connection) as small_batch:
+            self.client.post(self.url, self.review(self.submissions[:1]), format='json')
+        with CaptureQueriesContext(connection) as large_batch:
+            self.client.post(self.url, self.review(self.submissions[1:], 'REJECTED'), format='json')
+        self.assertEqual(len(small_batch), len(large_batch))
+
+    def test_bulk_review_invalid_item_rejects_batch(self):
+        self.client.force_authenticate(user=self.admin_user)
+        data = self.review(self.submissions[:2])
+        data[1]['status'] = 'UNKNOWN'
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Submission.objects.filter(status='ACCEPTED').exists())
+
+    def test_bulk_review_duplicate_ids(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(self.url, self.review([self.submissions[0]] * 2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_review_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, self.review(self.submissions[:1]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AdminSubmissionClaimViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.other_admin = User.objects.create_superuser('admin2', 'admin2@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.submissions = [
+            Submission.objects.create(
+                task_id=Task.objects.create(title_ru=f'Задача {i}', title_en=f'Task {i}', profile_id=self.profile),
+                user_id=self.regular_user, status='WAITING')
+            for i in range(3)
+        ]
+        self.url = reverse('admin-submissions-claim', kwargs={'lang': 'ru'})
+        self.release_url = reverse('admin-submissions-release', kwargs={'lang': 'ru'})
+
+    def claim(self, user, count):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(self.url, {'count': count}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['id'] for item in response.data}
+
+    def test_claim_submissions(self):
+        claimed = self.claim(self.admin_user, 2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(Submission.objects.filter(reviewer=self.admin_user).count(), 2)
+
+    def test_claim_in_arrival_order(self):
+        now = timezone.now()
+        for offset, submission in enumerate(reversed(self.submissions)):
+            Submission.objects.filter(id=submission.id).update(created_at=now + timedelta(seconds=offset))
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(self.url, {'count': 2}, format='json')
+        self.assertEqual([item['id'] for item in response.data],
+                         [str(submission.id) for submission in self.submissions[:0:-1]])
+
+    def test_claims_do_not_overlap(self):
+        first = self.claim(self.admin_user, 2)
+        second = self.claim(self.other_admin, 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(first & second)
+
+    def test_expired_lease_can_be_claimed(self):
+        self.claim(self.admin_user, 3)
+        Submission.objects.filter(id=self.submissions[0].id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.claim(self.other_admin, 3), {str(self.submissions[0].id)})
+
+    def test_reviewed_submissions_are_not_claimed(self):
+        Submission.objects.filter(id=self.submissions[0].id).update(status='ACCEPTED')
+        self.assertNotIn(str(self.submissions[0].id), self.claim(self.admin_user, 3))
+
+    def test_release_submissions(self):
+        claimed = self.claim(self.admin_user, 2)
+        response = self.client.post(self.release_url, {'ids': list(claimed)}, format='json')
+        self.assertEqual(response.data['released'], 2)
+        self.assertEqual(len(self.claim(self.other_admin, 3)), 3)
+
+    def test_release_only_own_submissions(self):
+        claimed = self.claim(self.admin_user, 2)
+        self.client.force_authenticate(user=self.other_admin)
+        response = self.client.post(self.release_url, {'ids': list(claimed)}, format='json')
+        self.assertEqual(response.data['released'], 0)
+
+    def test_claim_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, {'count': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AdminSubmissionHistoryListViewTest(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.regular_user = User.objects.create_user('user', 'user@example.com', 'userpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        self.task = Task.objects.create(title_ru='Задача', title_en='Task', profile_id=self.profile)
+        self.submission = Submission.objects.create(task_id=self.task, user_id=self.regular_user, status='WAITING')
+        for i in range(3):
+            SubmissionHistory.objects.create(submission=self.submission, previous_comment=f'Comment {i}')
+        self.url = reverse('admin-submission-history', kwargs={'submissionId': self.submission.id, 'lang': 'ru'})
+
+    def test_cursor_pagination(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(f'{self.url}?page_size=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['previous_comment'] for entry in response.data['results']],
+                         ['Comment 0', 'Comment 1'])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([entry['previous_comment'] for entry in response.data['results']], ['Comment 2'])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_pagination_with_equal_timestamps(self):
+        SubmissionHistory.objects.update(changed_at=timezone.now())
+        self.client.force_authenticate(user=self.admin_user)
+        ids = []
+        url = f'{self.url}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            ids += [entry['id'] for entry in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, sorted(str(pk) for pk in SubmissionHistory.objects.values_list('id', flat=True)))
+
+    def test_page_size_without_setting(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'PAGE_SIZE': None}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_nonexistent_submission(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('admin-submission-history', kwargs={'submissionId': uuid.uuid4(), 'lang': 'ru'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_history_as_regular_user(self):
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 
 class AdminUserActionLogListViewTest(APITestCase):
     def setUp(self):
@@ -664,6 +1747,15 @@ class AdminUserActionLogListViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['results'][0]['action'], 'Another action')
 
+    @mock.patch.object(PageNumberPagination, 'page_size', None)
+    def test_list_user_action_logs_without_page_size_streams(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([log['action'] for log in data], ['Test action'])
+
     def test_pagination(self):
         for i in range(20):
             UserActionLog.objects.create(user=self.regular_user, action=f'Action {i}')
@@ -672,3 +1764,98 @@ class AdminUserActionLogListViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('next', response.data)
         self.assertIn('previous', response.data)
+
+
+class AdminSQLJSONEngineTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'userpass') for i in range(3)]
+        self.profile = Profile.objects.create(description_ru='Профиль', description_en='Profile')
+        self.tasks = [
+            Task.objects.create(title_ru=f'Задача «{i}»', title_en=f'Task "{i}"', description_ru=f'Описание **{i}**',
+                                description_en=f'Description\n\n* {i}', profile_id=self.profile, status=task_status)
+            for i, task_status in enumerate(('AVAILABLE', 'DONE', 'AVAILABLE'))
+        ]
+        for task_index, task in enumerate(self.tasks[:2]):
+            for user_index, user in enumerate(self.users[:task_index + 2]):
+                Submission.objects.create(task_id=task, user_id=user, comment='Ответ',
+                                          status=('WAITING', 'ACCEPTED', 'REJECTED')[user_index])
+        now = timezone.now()
+        for i in range(25):
+            log = UserActionLog.objects.create(user=self.users[i % 3], action=f'Действие {i}',
+                                               extra_data={'path': '/ru/', 'n': i, 'nested': [None, True]} if i % 2 else None)
+            # Время без микросекунд DRF выводит без дробной части
+            UserActionLog.objects.filter(pk=log.pk).update(
+                timestamp=now.replace(microsecond=0 if i % 5 == 0 else i) + timedelta(seconds=i))
+        self.client.force_authenticate(user=self.admin_user)
+
+    def get_both(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cache.clear()
+        separator = '&' if '?' in url else '?'
+        sql_response = self.client.get(f'{url}{separator}engine=sql')
+        self.assertEqual(sql_response.status_code, status.HTTP_200_OK)
+        self.assertTrue(sql_response.streaming)
+        self.assertEqual(sql_response['Content-Type'], 'application/json')
+        return response.json(), json.loads(b''.join(sql_response.streaming_content))
+
+    def test_tasks_parity(self):
+        for lang in ('ru', 'en'):
+            url = reverse('admin-tasks', kwargs={'lang': lang})
+            for query in ('', '?ordering=-submissions_count', '?status=AVAILABLE'):
+                data, sql_data = self.get_both(url + query)
+                self.assertEqual(sql_data, data)
+                self.assertEqual([list(item) for item in sql_data['results']], [list(item) for item in data['results']])
+
+    def test_grouped_submissions_parity(self):
+        def normalize(groups):
+            return sorted(({**group, 'submissions': sorted(group['submissions'], key=lambda item: item['id'])}
+                           for group in groups), key=lambda group: group['task_id'])
+
+        url = reverse('admin-submissions', kwargs={'lang': 'ru'})
+        data, sql_data = self.get_both(url)
+        self.assertEqual(sql_data['count'], 2)
+        self.assertEqual(normalize(sql_data['results']), normalize(data['results']))
+
+        _, sql_data = self.get_both(f'{url}?ordering=-status')
+        for group in sql_data['results']:
+            statuses = [submission['status'] for submission in group['submissions']]
+            self.assertEqual(statuses, sorted(statuses, reverse=True))
+
+    @mock.patch.object(PageNumberPagination, 'page_size', 1)
+    def test_grouped_submissions_order_parity(self):
+        Submission.objects.create(task_id=self.tasks[2], user_id=self.users[0], comment='Ответ', status='ACCEPTED')
+        url = reverse('admin-submissions', kwargs={'lang': 'ru'})
+        for query in ('?ordering=status', '?ordering=-status', ''):
+            for page in (1, 2, 3):
+                separator = '&' if query else '?'
+                data, sql_data = self.get_both(f'{url}{query}{separator}page={page}')
+                self.assertEqual(sql_data['count'], 3)
+                self.assertEqual(sql_data['results'], data['results'])
+
+    def test_user_logs_parity(self):
+        url = reverse('admin-users-logs', kwargs={'lang': 'ru'})
+        for query in ('', '?ordering=-timestamp', '?page=2', f'?user={self.users[0].username}'):
+            data, sql_data = self.get_both(url + query)
+            self.assertEqual(sql_data['count'], data['count'])
+            self.assertEqual(sql_data['results'], data['results'])
+            # Ссылки на соседние страницы сохраняют выбранный движок
+            for link in ('next', 'previous'):
+                sql_link = sql_data[link] and sql_data[link].replace('engine=sql&', '').replace('?engine=sql', '')
+                self.assertEqual(sql_link, data[link])
+
+    def test_page_built_in_one_query(self):
+        url = reverse('admin-users-logs', kwargs={'lang': 'ru'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{url}?engine=sql')
+            b''.join(response.streaming_content)
+        # COUNT для пагинатора и сама страница с LIMIT/OFFSET
+        self.assertEqual(len(queries), 2)
+        self.assertIn('JSON_BUILD_OBJECT', queries[1]['sql'])
+        self.assertIn('LIMIT', queries[1]['sql'])
+
+    def test_nested_serializer_not_compiled(self):
+        self.assertIsNone(SQLJSONSerializer.compile(TaskSerializer()))
+        self.assertIsNotNone(SQLJSONSerializer.compile(TaskSerializer(exclude_fields=('profile',))))
@@ -7,12 +7,26 @@ urlpatterns = [
     path("users/", views.AdminUsersListView.as_view(), name='admin-users'),
     path("users/set-password/", views.AdminUserViewSet.as_view({'post': 'set_password'}), name='admin-user-set-password'),
     path("users/set-profile/", views.AdminUserViewSet.as_view({'post': 'set_profile'}), name='admin-user-set-profile'),
+    path("users/bulk/", views.AdminUserBulkCreateView.as_view(), name='admin-users-bulk'),
+    path("users/set-profiles/", views.AdminUserViewSet.as_view({'post': 'set_profiles'}), name='admin-user-set-profiles'),
     path("users/create-user/", UserViewSet.as_view({'post': 'create'}), name='admin-user-create'),
+    path("users/<uuid:userId>/", views.AdminUserDestroyView.as_view(), name='admin-user-detail'),
     path("users/logs/", views.AdminUserActionLogListView.as_view(), name='admin-users-logs'),
     path("profiles/", views.AdminProfileListCreateView.as_view(), name='admin-profiles'),
     path("profiles/<uuid:profileId>/", views.AdminRetrieveUpdateDestroyProfileView.as_view(), name='admin-profile-detail'),
+    path("profiles/<uuid:profileId>/files/", views.AdminProfileFileUploadView.as_view(), name='admin-profile-files'),
+    path("profiles/<uuid:profileId>/uploads/", views.AdminResumableUploadCreateView.as_view(), name='admin-profile-uploads'),
+    path("uploads/<uuid:uploadId>/", views.AdminResumableUploadView.as_view(), name='admin-upload-detail'),
+    path("uploads/<uuid:uploadId>/finalize/", views.AdminResumableUploadFinalizeView.as_view(), name='admin-upload-finalize'),
+    path("profiles/<uuid:profileId>/uploads/presigned/", views.AdminPresignedUploadCreateView.as_view(), name='admin-profile-presigned-uploads'),
+    path("uploads/presigned/complete/", views.AdminPresignedUploadCompleteView.as_view(), name='admin-presigned-upload-complete'),
     path("tasks/", views.AdminTaskListCreateView.as_view(), name='admin-tasks'),
+    path("tasks/bulk/", views.AdminTaskBulkCreateView.as_view(), name='admin-tasks-bulk'),
     path("tasks/<uuid:taskId>/", views.AdminRetrieveUpdateDestroyTaskView.as_view(), name='admin-task-detail'),
     path("submissions/", views.AdminSubmissionsListView.as_view(), name='admin-submissions'),
+    path("submissions/review/", views.AdminSubmissionBulkReviewView.as_view(), name='admin-submissions-review'),
+    path("submissions/claim/", views.AdminSubmissionClaimView.as_view(), name='admin-submissions-claim'),
+    path("submissions/release/", views.AdminSubmissionReleaseView.as_view(), name='admin-submissions-release'),
     path("submissions/<uuid:submissionId>/", views.AdminRetrieveUpdateDestroySubmissionView.as_view(), name='admin-submission-detail'),
+    path("submissions/<uuid:submissionId>/history/", views.AdminSubmissionHistoryListView.as_view(), name='admin-submission-history'),
 ]
@@ -1,10 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.filters import OrderingFilter
-from rest_framework.generics import ListAPIView, RetrieveUpdateDestroyAPIView, get_object_or_404
+from rest_framework.generics import GenericAPIView, ListAPIView, DestroyAPIView, RetrieveUpdateDestroyAPIView, \
+    get_object_or_404
 from rest_framework.mixins import CreateModelMixin
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
@@ -12,14 +21,33 @@ from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
 
+from api.deletion import purge_profile, purge_task, purge_user
 from api.filters import SubmissionsFilter
+from api.mixins import BackgroundDestroyMixin, QueryPlannerMixin, SQLJSONListMixin, StreamingListMixin
 from users.models import UserActionLog
-from users.serializers import UserSerializer, UserChangePasswordSerializer
+from users.provisioning import provision_users
+from users.serializers import UserSerializer, UserChangePasswordSerializer, UserProvisionSerializer
 from api.serializers import ProfileSerializer, TaskSerializer, SubmissionSerializer, GroupedSubmissionSerializer, \
-    ProfileChangeSerializer, SubmissionAdminUpdateSerializer
+    ProfileChangeSerializer, ProfileBulkChangeSerializer, SubmissionAdminUpdateSerializer, \
+    SubmissionHistorySerializer, SubmissionLatestHistorySerializer, SubmissionReviewSerializer, SubmissionClaimSerializer, \
+    SubmissionReleaseSerializer, ClaimedSubmissionSerializer, TaskImportSerializer, ProfileFileSerializer, \
+    ResumableUploadCreateSerializer, PresignedUploadCreateSerializer, PresignedUploadCompleteSerializer, \
+    FilteredSubmissionSerializer
+from api.sqljson import GroupedSQLJSONSerializer
+from api.signals import invalidate_profile_list_cache, invalidate_task_list_cache
+from .signals import invalidate_users_list_cache
 from .permissions import IsAdmin
-from api.models import Profile, Task, Submission, UserProfile
+from api.models import Profile, Task, TaskProfile, Submission, SubmissionHistory, UserProfile, FileBlob
+from api.parsers import ORJSONParser
+from api.planner import plan_queryset
+from api.blobs import attach_blob, create_profile_file
+from api.exceptions import SubmissionLeased, UploadConflict, is_constraint_violation
+from api.presigned import complete_upload, get_completed_file, load_upload, presign_upload
+from api.resumable import ResumableUpload
+from api.uploads import ProfileFileUploadHandler, StreamingMultiPartParser, check_profile_limits, get_profile_usage
 from .filters import ProfilesFilter, UsersFilter, UserLogsFilter
+from .pagination import SubmissionHistoryCursorPagination
+from .parsers import NDJSONParser, CSVParser
 from .serializers import UserActionLogSerializer
 from rest_framework.viewsets import ViewSet
 from api.views import BaseListLangAPIView
@@ -41,18 +69,50 @@ class AdminBaseListView(BaseListLangAPIView):
 
 class AdminUsersListView(AdminBaseListView):
     list_base_cache_name = 'admin_users'
+    fast_list = True
     filterset_class = UsersFilter
     ordering_fields = ('username', 'email')
     ordering = ('id',)
 
     def get_queryset(self):
-        return User.objects.prefetch_related('profiles')
+        return User.objects.filter(deleted_at__isnull=True)
 
     def get_serializer(self, *args, **kwargs):
         kwargs['exclude_fields'] = ('profiles',)
+        kwargs.update(self.get_field_selection())
         return UserSerializer(*args, **kwargs)
 
 
+class AdminUserBulkCreateView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = UserProvisionSerializer
+    parser_classes = (ORJSONParser, NDJSONParser, CSVParser)
+    max_users = 10000
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False, max_length=self.max_users)
+        serializer.is_valid(raise_exception=True)
+
+        users = provision_users(serializer.validated_data)
+
+        return Response({"created": len(users), "ids": [user.id for user in users]}, status=status.HTTP_201_CREATED)
+
+
+class AdminUserDestroyView(BackgroundDestroyMixin, DestroyAPIView):
+    lookup_url_kwarg = "userId"
+    permission_classes = (IsAdmin,)
+    purge_function = purge_user
+
+    def get_queryset(self):
+        return User.objects.filter(deleted_at__isnull=True)
+
+    def mark_deleted(self, instance):
+        # Помеченный пользователь сразу теряет доступ, не дожидаясь фонового удаления
+        instance.deleted_at = timezone.now()
+        instance.is_active = False
+        instance.save(update_fields=['deleted_at', 'is_active'])
+
+
 class AdminUserViewSet(ViewSet):
     permission_classes = (IsAdmin,)
 
@@ -64,12 +124,44 @@ class AdminUserViewSet(ViewSet):
         user = serializer.validated_data['user']
         profile = serializer.validated_data['profile']
 
-        user_profile, created = UserProfile.objects.get_or_create(user=user, profile=profile)
-        if not created:
+        # Дубликат отсекается уникальным ограничением (user, profile) вместо get_or_create
+        try:
+            with transaction.atomic():
+                UserProfile.objects.create(user=user, profile=profile)
+        except IntegrityError as exc:
+            if not is_constraint_violation(exc, 'unique_user_profile'):
+                raise
             return Response({"detail": "The profile has already been added to the user"}, status=status.HTTP_409_CONFLICT)
 
         return Response({"detail": "Profile added successfully"}, status=status.HTTP_204_NO_CONTENT)
 
+    @action(["post"], detail=False)
+    def set_profiles(self, request, *args, **kwargs):
+        serializer = ProfileBulkChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        pairs = serializer.validated_data['pairs']
+        existing_pairs = set(
+            UserProfile.objects.filter(
+                user_id__in=serializer.validated_data['user_ids'],
+                profile_id__in=serializer.validated_data['profile_ids'],
+            ).values_list('user_id', 'profile_id')
+        ).intersection(pairs)
+        new_pairs = [pair for pair in pairs if pair not in existing_pairs]
+
+        # Пары, добавленные параллельным запросом после проверки, пропускаются уникальным ограничением
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id, profile_id=profile_id) for user_id, profile_id in new_pairs],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        if new_pairs:
+            invalidate_users_list_cache()
+
+        return Response({
+            "created": [{"user_id": user_id, "profile_id": profile_id} for user_id, profile_id in new_pairs],
+            "existing": [{"user_id": user_id, "profile_id": profile_id} for user_id, profile_id in sorted(existing_pairs)],
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
     def set_password(self, request, *args, **kwargs):
         serializer = UserChangePasswordSerializer(data=request.data)
@@ -104,12 +196,13 @@ class AdminProfileListCreateView(CreateModelMixin, AdminBaseListView):
         if method == 'GET':
             lang = self.get_exclude_lang()
             kwargs['exclude_fields'] = ('tasks', 'files', f'description_{lang}', f'description_{lang}_html')
+            kwargs.update(self.get_field_selection())
             return ProfileSerializer(*args, **kwargs)
         else:
             return ProfileSerializer(*args, **kwargs)
 
     def get_queryset(self):
-        return Profile.objects.prefetch_related('tasks')
+        return Profile.objects.filter(deleted_at__isnull=True)
 
     def get_ordering_fields(self):
         fields = ('id', f'tasks_count')
@@ -119,21 +212,203 @@ class AdminProfileListCreateView(CreateModelMixin, AdminBaseListView):
         return self.create(request, *args, **kwargs)
 
 
-class AdminRetrieveUpdateDestroyProfileView(RetrieveUpdateDestroyAPIView):
+class AdminRetrieveUpdateDestroyProfileView(QueryPlannerMixin, BackgroundDestroyMixin, RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "profileId"
     permission_classes = (IsAdmin,)
     serializer_class = ProfileSerializer
+    purge_function = purge_profile
+
+    def get_queryset(self):
+        return Profile.objects.filter(deleted_at__isnull=True)
+
+
+class AdminProfileFileUploadView(GenericAPIView):
+    lookup_url_kwarg = "profileId"
+    permission_classes = (IsAdmin,)
+    parser_classes = (StreamingMultiPartParser,)
+    serializer_class = ProfileFileSerializer
 
     def get_queryset(self):
-        return Profile.objects.prefetch_related('tasks')
+        return Profile.objects.filter(deleted_at__isnull=True)
+
+    def get_upload_handlers(self, request):
+        count, size = get_profile_usage(self.kwargs['profileId'])
+        return [ProfileFileUploadHandler(
+            request,
+            max_file_size=settings.PROFILE_MAX_FILE_SIZE,
+            remaining_size=settings.PROFILE_MAX_TOTAL_SIZE - size,
+            remaining_files=settings.PROFILE_MAX_NUMBER_FILES - count,
+        )]
+
+    def post(self, request, *args, **kwargs):
+        # Профиль проверяется до чтения тела запроса, чтобы не принимать файлы для несуществующего профиля
+        profile = self.get_object()
+        files = request.FILES.getlist('file')
+        if not files:
+            raise ValidationError({"file": ["No files were uploaded"]})
+
+        with transaction.atomic():
+            # Повторная проверка под блокировкой профиля, чтобы параллельные загрузки не превысили лимиты
+            get_object_or_404(Profile.objects.select_for_update(), pk=profile.pk)
+            check_profile_limits(profile.pk, len(files), sum(file.size for file in files))
+
+            profile_files = [
+                create_profile_file(profile, file, checksum=file.checksum, size=file.size) for file in files
+            ]
+
+        serializer = self.get_serializer(profile_files, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AdminResumableUploadCreateView(GenericAPIView):
+    lookup_url_kwarg = "profileId"
+    permission_classes = (IsAdmin,)
+    serializer_class = ResumableUploadCreateSerializer
+
+    def get_queryset(self):
+        return Profile.objects.filter(deleted_at__isnull=True)
+
+    def post(self, request, *args, **kwargs):
+        profile = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Предварительная проверка, чтобы не принимать загрузку, которая заведомо не поместится в профиль
+        check_profile_limits(profile.pk, 1, serializer.validated_data['length'])
+        upload = ResumableUpload.create(profile.pk, user_id=request.user.pk, **serializer.validated_data)
+
+        headers = upload.headers()
+        headers['Location'] = reverse('admin-upload-detail', kwargs={'lang': self.kwargs['lang'], 'uploadId': upload.id})
+        return Response(upload.as_dict(), status=status.HTTP_201_CREATED, headers=headers)
+
+
+class AdminResumableUploadView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+
+    def get_upload(self):
+        upload = ResumableUpload.get(self.kwargs['uploadId'])
+        # Чужая сессия выглядит так же, как несуществующая
+        if upload is None or upload.user_id != self.request.user.pk:
+            raise NotFound("Upload not found")
+        return upload
+
+    def get(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        return Response(upload.as_dict(), headers=upload.headers())
+
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            raise ValidationError({"Upload-Offset": ["A valid Upload-Offset header is required"]})
+
+        # Тело читается напрямую из потока частями, без парсеров и буферизации в памяти
+        with upload.lock():
+            upload.write_chunk(request.stream, offset)
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=upload.headers())
+
+    def delete(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        with upload.lock():
+            upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdminResumableUploadFinalizeView(AdminResumableUploadView):
+    serializer_class = ProfileFileSerializer
+    http_method_names = ['post', 'options']
+
+    def post(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        with upload.lock():
+            upload = self.get_upload()
+            if not upload.is_complete:
+                raise UploadConflict(f"Upload is incomplete: {upload.offset} of {upload.length} bytes received")
+            # Предварительная проверка без блокировки: не собирать файл, который заведомо не поместится
+            check_profile_limits(upload.profile_id, 1, upload.length)
+
+            # Сборка, хеширование и перенос байтов в хранилище идут до транзакции,
+            # под блокировкой профиля остаются только проверка лимитов и вставка строк
+            stored = upload.store()
+            try:
+                with transaction.atomic():
+                    profile = get_object_or_404(
+                        Profile.objects.select_for_update().filter(deleted_at__isnull=True), pk=upload.profile_id)
+                    check_profile_limits(profile.pk, 1, upload.length)
+                    profile_file = upload.finalize(profile, stored)
+            except Exception:
+                upload.discard(stored)
+                raise
+            upload.delete()
+
+        serializer = self.get_serializer(profile_file)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AdminPresignedUploadCreateView(GenericAPIView):
+    """
+    Выдает подписанную ссылку, по которой клиент загружает файл прямо в хранилище, минуя сервер приложения.
+    Если такое содержимое уже хранится, файл сразу привязывается к профилю (201), загружать ничего не нужно.
+    """
+    lookup_url_kwarg = "profileId"
+    permission_classes = (IsAdmin,)
+    serializer_class = PresignedUploadCreateSerializer
+
+    def get_queryset(self):
+        return Profile.objects.filter(deleted_at__isnull=True)
+
+    def post(self, request, *args, **kwargs):
+        profile = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with transaction.atomic():
+            get_object_or_404(Profile.objects.select_for_update(), pk=profile.pk)
+            check_profile_limits(profile.pk, 1, data['length'])
+            blob = FileBlob.objects.select_for_update().filter(checksum=data['checksum'], size=data['length']).first()
+            if blob is not None:
+                profile_file = attach_blob(profile, blob, data['filename'])
+                return Response(ProfileFileSerializer(profile_file).data, status=status.HTTP_201_CREATED)
+
+        return Response(presign_upload(profile, data['filename'], data['length'], data['checksum']))
+
+
+class AdminPresignedUploadCompleteView(GenericAPIView):
+    """
+    Вызывается клиентом после PUT в хранилище: проверяет объект и создает файл профиля.
+    Повтор с тем же токеном возвращает уже созданный файл (200).
+    """
+    permission_classes = (IsAdmin,)
+    serializer_class = PresignedUploadCompleteSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data['token']
+        upload = load_upload(token)
+
+        with transaction.atomic():
+            profile = get_object_or_404(
+                Profile.objects.select_for_update().filter(deleted_at__isnull=True), pk=upload['profile_id'])
+            profile_file = get_completed_file(profile, token)
+            if profile_file is not None:
+                return Response(ProfileFileSerializer(profile_file).data)
+            check_profile_limits(profile.pk, 1, upload['length'])
+            profile_file = complete_upload(profile, upload, token)
+
+        return Response(ProfileFileSerializer(profile_file).data, status=status.HTTP_201_CREATED)
 
 
 class AdminTaskListCreateView(CreateModelMixin, AdminBaseListView):
     list_base_cache_name = 'admin_tasks'
+    sql_list = True
     ordering = ('id',)
 
     def get_queryset(self):
-        return Task.objects.select_related('profile_id').prefetch_related('submissions')
+        return Task.objects.filter(deleted_at__isnull=True)
 
     def get_serializer(self, *args, **kwargs):
         method = self.request.method
@@ -141,6 +416,7 @@ class AdminTaskListCreateView(CreateModelMixin, AdminBaseListView):
             lang = self.get_exclude_lang()
             kwargs['exclude_fields'] = (
                 f'title_{lang}', f'description_{lang}', f'description_{lang}_html', 'profile_id', 'profile')
+            kwargs.update(self.get_field_selection())
             return TaskSerializer(*args, **kwargs)
         else:
             return TaskSerializer(*args, **kwargs)
@@ -170,26 +446,65 @@ class AdminTaskListCreateView(CreateModelMixin, AdminBaseListView):
         return fields
 
 
-class AdminRetrieveUpdateDestroyTaskView(RetrieveUpdateDestroyAPIView):
+class AdminTaskBulkCreateView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = TaskImportSerializer
+    parser_classes = (ORJSONParser, NDJSONParser, CSVParser)
+    max_tasks = 10000
+    batch_size = 1000
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False, max_length=self.max_tasks)
+        serializer.is_valid(raise_exception=True)
+
+        tasks = []
+        for task_data in serializer.validated_data:
+            profile_id = task_data.pop('profile_id')
+            tasks.append(Task(profile_id_id=profile_id, **task_data))
+
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+            TaskProfile.objects.bulk_create(
+                [TaskProfile(task=task, profile_id=task.profile_id_id) for task in tasks], batch_size=self.batch_size)
+
+        # bulk_create не шлет post_save, поэтому списки инвалидируются один раз на всю пачку
+        invalidate_task_list_cache()
+        invalidate_profile_list_cache()
+
+        return Response({"created": len(tasks), "ids": [task.id for task in tasks]}, status=status.HTTP_201_CREATED)
+
+
+class AdminRetrieveUpdateDestroyTaskView(QueryPlannerMixin, BackgroundDestroyMixin, RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "taskId"
     permission_classes = (IsAdmin,)
     serializer_class = TaskSerializer
+    purge_function = purge_task
 
     def get_queryset(self):
-        return Task.objects.select_related('profile_id').prefetch_related('submissions')
+        return Task.objects.filter(deleted_at__isnull=True)
 
 
-class AdminSubmissionsListView(ListAPIView):
+class AdminSubmissionsListView(SQLJSONListMixin, ListAPIView):
     permission_classes = (IsAdmin,)
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = SubmissionsFilter
     ordering_fields = ('status',)
+    sql_list = True
 
     def get_queryset(self):
         return Submission.objects.select_related('task_id').only("id", "status", "user_id", "task_id")
 
+    def get_sql_serializer(self):
+        return GroupedSQLJSONSerializer.compile(FilteredSubmissionSerializer(), 'task_id', 'submissions')
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+        # id завершает сортировку: порядок групп (по первой заявке) одинаков в обоих движках и между страницами
+        queryset = queryset.order_by(*queryset.query.order_by, 'id')
+        if self.wants_sql_engine():
+            response = self.sql_list_response(queryset)
+            if response is not None:
+                return response
 
         grouped_submissions = {}
         for submission in queryset:
@@ -215,26 +530,186 @@ class AdminSubmissionsListView(ListAPIView):
 class AdminRetrieveUpdateDestroySubmissionView(RetrieveUpdateDestroyAPIView):
     permission_classes = (IsAdmin,)
     serializer_class = SubmissionSerializer
+    max_history_limit = 100
+
+    def get_history_limit(self):
+        """Количество последних записей истории для встраивания (?history_limit=K) или None для полной истории"""
+        history_limit = self.request.query_params.get('history_limit')
+        if history_limit is None or self.request.method != 'GET':
+            return None
+        if not history_limit.isdigit() or not 0 < int(history_limit) <= self.max_history_limit:
+            raise ValidationError(
+                {"history_limit": f"Must be an integer between 1 and {self.max_history_limit}"})
+        return int(history_limit)
 
     def get_serializer(self, *args, **kwargs):
         method = self.request.method
+        kwargs.setdefault('context', self.get_serializer_context())
         if method == 'PUT':
             return SubmissionAdminUpdateSerializer(*args, **kwargs)
+        history_limit = self.get_history_limit()
+        if history_limit is not None:
+            kwargs['context'] = {**kwargs['context'], 'history_limit': history_limit}
+            return SubmissionLatestHistorySerializer(*args, **kwargs)
         else:
             return SubmissionSerializer(*args, **kwargs)
 
     def get_object(self):
         submission_id = self.kwargs.get('submissionId')
-        obj = get_object_or_404(Submission.objects.prefetch_related('change_history'), id=submission_id)
+
+        queryset = Submission.objects.all()
+        if self.request.method == 'GET':
+            queryset = plan_queryset(queryset, self.get_serializer())
+        elif self.request.method in ('PUT', 'PATCH'):
+            queryset = queryset.select_for_update()
+
+        obj = get_object_or_404(queryset, id=submission_id)
         self.check_object_permissions(self.request, obj)
         return obj
 
+    def update(self, request, *args, **kwargs):
+        # Закрепление проверяется под блокировкой строки, чтобы не разойтись с параллельным claim
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        submission = serializer.instance
+        if submission.is_leased_by_other(self.request.user):
+            raise SubmissionLeased()
+        serializer.save()
+
+        # Проверенный ответ больше не закреплен за проверяющим
+        if submission.reviewer_id is not None:
+            submission.reviewer = None
+            submission.lease_expires_at = None
+            submission.save(update_fields=['reviewer', 'lease_expires_at'])
+
+
+class AdminSubmissionBulkReviewView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = SubmissionReviewSerializer
+    max_reviews = 1000
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False,
+                                         max_length=self.max_reviews)
+        serializer.is_valid(raise_exception=True)
+        reviews = serializer.validated_data
+
+        results = []
+        history = []
+        reviewed_submissions = []
+
+        # Постоянное число запросов независимо от размера пачки: SELECT ... FOR UPDATE, bulk_create, bulk_update
+        with transaction.atomic():
+            submissions = Submission.objects.select_for_update().in_bulk([review['id'] for review in reviews])
+
+            for review in reviews:
+                submission = submissions.get(review['id'])
+                if submission is None:
+                    results.append({'id': review['id'], 'result': 'not_found'})
+                    continue
+                if submission.is_leased_by_other(request.user):
+                    results.append({'id': review['id'], 'result': 'leased'})
+                    continue
+
+                changes = {'status': review['status'], 'admin_comment': review['admin_comment']}
+                submission_history = SubmissionHistory.from_changes(submission, changes)
+                if submission_history is None:
+                    results.append({'id': review['id'], 'result': 'unchanged'})
+                    continue
+
+                for attr, value in changes.items():
+                    setattr(submission, attr, value)
+                submission.reviewer = None
+                submission.lease_expires_at = None
+                history.append(submission_history)
+                reviewed_submissions.append(submission)
+                results.append({'id': review['id'], 'result': 'updated'})
+
+            SubmissionHistory.objects.bulk_create(history)
+            Submission.objects.bulk_update(reviewed_submissions,
+                                           ['status', 'admin_comment', 'reviewer', 'lease_expires_at'])
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class AdminSubmissionClaimView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = SubmissionClaimSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        now = timezone.now()
+        lease_expires_at = now + timedelta(seconds=settings.SUBMISSION_REVIEW_LEASE_SECONDS)
+
+        # SKIP LOCKED: параллельные проверяющие не ждут друг друга и не получают одни и те же ответы;
+        # ответы выдаются в порядке поступления
+        with transaction.atomic():
+            claimable = Submission.objects.select_for_update(skip_locked=True).filter(
+                Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now),
+                status=Submission.Status.WAITING,
+            ).order_by('created_at', 'id')
+            submissions = list(claimable[:serializer.validated_data['count']])
+
+            Submission.objects.filter(id__in=[submission.id for submission in submissions]).update(
+                reviewer=request.user, lease_expires_at=lease_expires_at)
+
+        for submission in submissions:
+            submission.reviewer = request.user
+            submission.lease_expires_at = lease_expires_at
+
+        return Response(ClaimedSubmissionSerializer(submissions, many=True).data, status=status.HTTP_200_OK)
+
+
+class AdminSubmissionReleaseView(GenericAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = SubmissionReleaseSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        released = Submission.objects.filter(id__in=serializer.validated_data['ids'], reviewer=request.user).update(
+            reviewer=None, lease_expires_at=None)
+
+        return Response({"released": released}, status=status.HTTP_200_OK)
+
 
-class AdminUserActionLogListView(ListAPIView):
-    queryset = UserActionLog.objects.select_related('user').all()
+class AdminSubmissionHistoryListView(ListAPIView):
+    permission_classes = (IsAdmin,)
+    serializer_class = SubmissionHistorySerializer
+    pagination_class = SubmissionHistoryCursorPagination
+    filter_backends = ()
+
+    def get_queryset(self):
+        submission_id = self.kwargs.get('submissionId')
+        get_object_or_404(Submission.objects.only('id'), id=submission_id)
+        return SubmissionHistory.objects.filter(submission_id=submission_id)
+
+
+class AdminUserActionLogListView(StreamingListMixin, SQLJSONListMixin, QueryPlannerMixin, ListAPIView):
+    queryset = UserActionLog.objects.all()
     serializer_class = UserActionLogSerializer
     permission_classes = (IsAdmin,)
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = UserLogsFilter
     ordering_fields = ('id', 'timestamp')
     ordering = ('timestamp',)
+    sql_list = True
+
+    def list(self, request, *args, **kwargs):
+        if self.wants_sql_engine():
+            response = self.sql_list_response(self.filter_queryset(self.get_queryset()))
+            if response is not None:
+                return response
+        # PAGE_SIZE не задан: пагинатор есть, но страницу не отдает
+        paginated = self.paginator is not None and self.paginator.get_page_size(request)
+        if self.wants_stream() or not paginated:
+            # Выгрузка всего журнала: строки пишутся в ответ по мере чтения из БД
+            response = self.streaming_list_response(self.filter_queryset(self.get_queryset()))
+            if response is not None:
+                return response
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,57 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_TASKS_WORKERS, thread_name_prefix='background')
+    return _executor
+
+
+def _run(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        # Недоделанная работа подбирается командой purge_deleted
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Запускает func в фоновом потоке после коммита текущей транзакции.
+    При BACKGROUND_TASKS_EAGER выполняет ее синхронно (для тестов и отладки).
+    """
+    def submit():
+        if settings.BACKGROUND_TASKS_EAGER:
+            func(*args, **kwargs)
+        else:
+            _get_executor().submit(_run, func, *args, **kwargs)
+
+    transaction.on_commit(submit)
+
+
+def call_with_retries(func, *args, exceptions=(Exception,), attempts=None, delay=None):
+    """Вызывает func, повторяя попытку при exceptions с растущей паузой (FILE_CLEANUP_RETRY_DELAY * номер попытки)"""
+    attempts = attempts or settings.FILE_CLEANUP_RETRIES
+    delay = settings.FILE_CLEANUP_RETRY_DELAY if delay is None else delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args)
+        except exceptions:
+            if attempt == attempts:
+                raise
+            logger.warning("%s failed, attempt %s of %s", getattr(func, "__qualname__", func), attempt, attempts,
+                           exc_info=True)
+            time.sleep(delay * attempt)
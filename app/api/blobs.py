@@ -0,0 +1,134 @@
+import os
+
+from django.db import DatabaseError, IntegrityError, transaction
+
+from api.background import call_with_retries
+from api.models import FileBlob, ProfileFile
+from api.uploads import file_checksum
+
+
+def get_or_create_blob(file, checksum, size):
+    """
+    Возвращает заблокированный blob с этим SHA-256. Байты пишутся в хранилище,
+    только если такого содержимого еще нет. Вызывается внутри транзакции.
+    """
+    blob = FileBlob.objects.select_for_update().filter(checksum=checksum).first()
+    if blob is not None:
+        return blob
+
+    blob = FileBlob(checksum=checksum, size=size)
+    blob.file.save(os.path.basename(file.name), file, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # То же содержимое параллельно сохранил другой запрос: оставляем его blob, свою копию удаляем
+        blob.file.delete(save=False)
+        blob = FileBlob.objects.select_for_update().get(checksum=checksum)
+    return blob
+
+
+def store_blob_file(file, checksum):
+    """
+    Кладет содержимое в хранилище вне транзакции, если blob с таким SHA-256 еще нет, и возвращает путь к нему
+    (для get_or_register_blob). None - такое содержимое уже хранится, переносить байты не нужно.
+    """
+    if FileBlob.objects.filter(checksum=checksum).exists():
+        return None
+    blob = FileBlob(checksum=checksum)
+    blob.file.save(os.path.basename(file.name), file, save=False)
+    return blob.file.name
+
+
+def get_or_register_blob(name, checksum, size):
+    """
+    Возвращает заблокированный blob для содержимого, которое клиент уже положил в хранилище по пути name.
+    Если такое содержимое уже есть, лишняя копия удаляется после коммита. Вызывается внутри транзакции.
+    """
+    blob = FileBlob.objects.select_for_update().filter(checksum=checksum).first()
+    if blob is None:
+        try:
+            with transaction.atomic():
+                return FileBlob.objects.create(checksum=checksum, size=size, file=name)
+        except IntegrityError:
+            blob = FileBlob.objects.select_for_update().get(checksum=checksum)
+
+    if blob.file.name != name:
+        transaction.on_commit(lambda: delete_storage_files([name]))
+    return blob
+
+
+def attach_blob(profile, blob, name):
+    """Создает файл профиля, ссылающийся на blob"""
+    return ProfileFile.objects.create(profile=profile, blob=blob, file=blob.file.name,
+                                      name=name, size=blob.size, checksum=blob.checksum)
+
+
+def create_profile_file(profile, file, checksum=None, size=None):
+    """Привязывает файл к профилю через общий blob"""
+    checksum = checksum or file_checksum(file)
+    size = file.size if size is None else size
+    with transaction.atomic():
+        blob = get_or_create_blob(file, checksum, size)
+        return attach_blob(profile, blob, os.path.basename(file.name))
+
+
+def collect_blobs(blob_ids):
+    """
+    Удаляет blob, на которые больше не ссылается ни один файл профиля, и возвращает их количество.
+    Количество ссылок считается по строкам ProfileFile, байты удаляются из хранилища после коммита.
+    """
+    blob_ids = {blob_id for blob_id in blob_ids if blob_id}
+    if not blob_ids:
+        return 0
+
+    with transaction.atomic():
+        # Сначала блокируем blob, затем отдельным запросом (с новым снимком) проверяем ссылки:
+        # загрузка, успевшая сослаться на blob, уже закоммичена, а новая дождется блокировки
+        blobs = list(FileBlob.objects.select_for_update().filter(id__in=blob_ids))
+        referenced = set(ProfileFile.objects.filter(blob_id__in=blob_ids).values_list('blob_id', flat=True))
+        unreferenced = [blob for blob in blobs if blob.id not in referenced]
+        if not unreferenced:
+            return 0
+
+        FileBlob.objects.filter(id__in=[blob.id for blob in unreferenced]).delete()
+        names = [blob.file.name for blob in unreferenced]
+        transaction.on_commit(lambda: delete_storage_files(names))
+    return len(unreferenced)
+
+
+def collect_orphan_blobs(created_before):
+    """
+    Удаляет blob без ссылок, созданные раньше created_before: их не собрала фоновая очистка
+    (процесс перезапустился или упал до ее выполнения). Вызывается командой purge_deleted.
+    """
+    blob_ids = FileBlob.objects.filter(profile_files__isnull=True, created_at__lte=created_before) \
+        .values_list('id', flat=True)
+    return collect_blobs(list(blob_ids))
+
+
+def delete_storage_files(names):
+    """Удаляет файлы из хранилища, повторяя попытку при ошибках ввода-вывода"""
+    storage = FileBlob._meta.get_field('file').storage
+    for name in names:
+        call_with_retries(storage.delete, name, exceptions=(OSError,))
+
+
+def cleanup_files(blob_ids, names=()):
+    """
+    Фоновая очистка после удаления строк ProfileFile: файлы без blob (загруженные до дедупликации)
+    удаляются сразу, blob - если на них больше нет ссылок.
+    """
+    delete_storage_files(names)
+    call_with_retries(collect_blobs, blob_ids, exceptions=(DatabaseError,))
+
+
+def delete_profile_files(queryset):
+    """
+    Удаляет файлы профиля в текущей транзакции (queryset может быть срезом); содержимое очищает
+    в фоне после коммита обработчик post_delete (api.signals)
+    """
+    ids = list(queryset.values_list('pk', flat=True))
+    if not ids:
+        return 0
+    return ProfileFile.objects.filter(pk__in=ids).delete()[1].get(ProfileFile._meta.label, 0)
@@ -0,0 +1,85 @@
+import gzip
+
+import orjson
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+try:
+    import brotli
+except ImportError:  # без brotli кэшируется только gzip
+    brotli = None
+
+# Порядок предпочтения при одинаковом q в Accept-Encoding
+ENCODINGS = ('br', 'gzip')
+
+
+def compress_variants(content):
+    """
+    Варианты тела для кэша: исходное и сжатые. Сжатие выполняется один раз при заполнении кэша
+    и только для ответов не меньше RESPONSE_COMPRESSION_MIN_SIZE байт.
+    """
+    variants = {'identity': content}
+    if len(content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+        return variants
+    variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=9)
+    return variants
+
+
+def parse_accept_encoding(header):
+    """{кодировка: q} из заголовка Accept-Encoding"""
+    accepted = {}
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        param, _, value = params.strip().partition('=')
+        if param.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, variants):
+    """Самый предпочтительный для клиента сжатый вариант из имеющихся или identity"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = 'identity', 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in variants and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class PrecompressedResponse(Response):
+    """
+    Ответ с уже отрендеренным JSON из кэша: рендерер не вызывается, сжатый вариант отдается как есть.
+    data разбирается из JSON только при обращении к нему (например, в тестах).
+    """
+
+    def __init__(self, variants, encoding, **kwargs):
+        super().__init__(None, **kwargs)
+        self.variants = variants
+        self.encoding = encoding
+
+    @property
+    def data(self):
+        return orjson.loads(self.variants['identity'])
+
+    @data.setter
+    def data(self, value):
+        pass
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = 'application/json'
+        if self.encoding != 'identity':
+            self['Content-Encoding'] = self.encoding
+        patch_vary_headers(self, ('Accept-Encoding',))
+        return self.variants[self.encoding]
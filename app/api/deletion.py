@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from api.models import Profile, Task, Submission, SubmissionHistory, TaskSubmission, TaskProfile, UserProfile, \
+    ProfileFile
+from users.models import UserActionLog
+
+User = get_user_model()
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """
+    Удаляет строки queryset пачками, каждая пачка в своей короткой транзакции.
+    Пачка удаляется обычным delete(): сигналы (инвалидация кеша, очистка файлов) выполняются,
+    а дочерние таблицы лучше очистить заранее, чтобы каскад не разрастался в одну большую транзакцию.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += model._base_manager.filter(pk__in=ids).delete()[1].get(model._meta.label, 0)
+
+
+def _delete_submissions(**lookup):
+    submission_lookup = {f'submission__{key}': value for key, value in lookup.items()}
+    delete_in_batches(SubmissionHistory.objects.filter(**submission_lookup))
+    delete_in_batches(TaskSubmission.objects.filter(**submission_lookup))
+    delete_in_batches(Submission.objects.filter(**lookup))
+
+
+def purge_task(task_id):
+    """Удаляет помеченную задачу: сначала ответы и связи пачками, затем саму задачу."""
+    task = Task.objects.filter(id=task_id, deleted_at__isnull=False).first()
+    if task is None:
+        return
+
+    _delete_submissions(task_id=task_id)
+    delete_in_batches(TaskProfile.objects.filter(task_id=task_id))
+    task.delete()
+
+
+def purge_profile(profile_id):
+    """Удаляет помеченный профиль: ответы, задачи, связи и файлы пачками, затем сам профиль."""
+    profile = Profile.objects.filter(id=profile_id, deleted_at__isnull=False).first()
+    if profile is None:
+        return
+
+    _delete_submissions(task_id__profile_id=profile_id)
+    delete_in_batches(TaskProfile.objects.filter(Q(profile_id=profile_id) | Q(task__profile_id=profile_id)))
+    delete_in_batches(Task.objects.filter(profile_id=profile_id))
+    delete_in_batches(UserProfile.objects.filter(profile_id=profile_id))
+    delete_in_batches(ProfileFile.objects.filter(profile_id=profile_id))
+    profile.delete()
+
+
+def purge_user(user_id):
+    """Удаляет помеченного пользователя: ответы, журнал действий и связи пачками, затем самого пользователя."""
+    user = User.objects.filter(id=user_id, deleted_at__isnull=False).first()
+    if user is None:
+        return
+
+    _delete_submissions(user_id=user_id)
+    delete_in_batches(UserProfile.objects.filter(user_id=user_id))
+    delete_in_batches(UserActionLog.objects.filter(user_id=user_id))
+    user.delete()
+
+
+PURGE_FUNCTIONS = (
+    (User, purge_user),
+    (Profile, purge_profile),
+    (Task, purge_task),
+)
@@ -0,0 +1,139 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from rest_framework.negotiation import BaseContentNegotiation
+
+CHUNK_SIZE = 64 * 2 ** 10
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+signer = signing.TimestampSigner(salt='api.downloads.profile-file')
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Файл отдается как есть, поэтому заголовок Accept клиента не должен приводить к 406"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def make_download_token(profile_file):
+    return signer.sign(str(profile_file.pk))
+
+
+def check_download_token(token, profile_file):
+    """Проверяет подпись и срок жизни ссылки на скачивание"""
+    try:
+        value = signer.unsign(token, max_age=settings.FILE_DOWNLOAD_URL_TTL)
+    except signing.BadSignature:
+        return False
+    return value == str(profile_file.pk)
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном байт.
+    Возвращает (start, end) включительно, None - если заголовок не поддерживается, и False - если диапазон невыполним.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: последние N байт
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _set_file_headers(response, profile_file, content_type, etag, last_modified):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(True, profile_file.name or profile_file.file.name)
+    response['Last-Modified'] = http_date(last_modified)
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private'
+    return response
+
+
+def serve_profile_file(request, profile_file):
+    """
+    Отдает файл профиля. В режимах nginx/sendfile Django только проверяет доступ и отдает заголовок,
+    а передачу байт выполняет веб-сервер (если у хранилища нет локальных путей - редирект на подписанную ссылку).
+    В режиме django файл отдается частями с поддержкой Range.
+    """
+    name = profile_file.file.name
+    content_type = mimetypes.guess_type(profile_file.name or name)[0] or 'application/octet-stream'
+    etag = quote_etag(profile_file.checksum) if profile_file.checksum else None
+    last_modified = profile_file.uploaded_at.timestamp()
+
+    # If-None-Match / If-Modified-Since -> 304, If-Match / If-Unmodified-Since -> 412
+    conditional_response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if conditional_response is not None:
+        return conditional_response
+
+    backend = settings.FILE_DOWNLOAD_BACKEND
+    if backend in ('nginx', 'sendfile'):
+        try:
+            path = profile_file.file.path
+        except NotImplementedError:
+            # У S3 нет локального пути, который мог бы отдать веб-сервер: перенаправляем на подписанную ссылку хранилища
+            response = HttpResponseRedirect(profile_file.file.url)
+            response['Cache-Control'] = 'private'
+            return response
+        response = HttpResponse()
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        return _set_file_headers(response, profile_file, content_type, etag, last_modified)
+
+    size = profile_file.file.size
+    byte_range = None
+    # If-Range: диапазон отдается, только если файл не изменился с тех пор, как клиент получил его начало
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == etag:
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = profile_file.file.open('rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(file, start, end - start + 1), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return _set_file_headers(response, profile_file, content_type, etag, last_modified)
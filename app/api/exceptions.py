@@ -2,6 +2,12 @@ from rest_framework import status
 from rest_framework.exceptions import APIException
 
 
+def is_constraint_violation(exc, constraint_name):
+    """IntegrityError вызвана нарушением именно этого ограничения (имя сообщает драйвер Postgres)"""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == constraint_name
+
+
 class DuplicateSubmissionError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = "The user has already answered the task"
@@ -10,3 +16,18 @@ class DuplicateSubmissionError(APIException):
 class ProfileAddedError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = "The profile has already been added to the user"
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Upload offset does not match the current upload state"
+
+
+class SubmissionLeased(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The submission is being reviewed by another admin"
+
+
+class DirectUploadUnavailable(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = "The configured file storage does not support direct uploads"
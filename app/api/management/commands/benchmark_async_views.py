@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import AsyncRequestFactory, RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import views
+from api.models import Profile, Submission, Task, TaskProfile, UserProfile
+
+User = get_user_model()
+
+# Имя, синхронное представление, асинхронное представление
+ENDPOINTS = (
+    ('profiles', views.ProfilesListView, views.AsyncProfilesListView),
+    ('profile', views.ProfileRetrieveView, views.AsyncProfileRetrieveView),
+    ('tasks', views.TasksListView, views.AsyncTasksListView),
+    ('task', views.TaskRetrieveView, views.AsyncTaskRetrieveView),
+    ('submission', views.SubmissionCreateUpdateRetrieveView, views.AsyncSubmissionCreateUpdateRetrieveView),
+)
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает, сколько запросов в секунду обрабатывает один воркер: WSGI (синхронные представления, "
+            "запросы по очереди) и ASGI (асинхронные представления, --concurrency запросов одновременно в одном "
+            "цикле событий). Представления вызываются напрямую, без HTTP-сервера и middleware. "
+            "Тестовые строки создаются в транзакции, которая затем откатывается")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Сколько запросов отправить к каждому адресу")
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Сколько запросов одновременно обрабатывает асинхронный воркер")
+        parser.add_argument('--no-cache', action='store_true', help="Отключить кэш ответов (каждый запрос идет в БД)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, kwargs = self.create_rows()
+            headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+            for name, view_class, async_view_class in ENDPOINTS:
+                # cache_timeout=0: ответ не сохраняется в кэш, и каждый запрос читает БД
+                no_cache = options['no_cache'] and hasattr(view_class, 'cache_timeout')
+                initkwargs = {'cache_timeout': 0} if no_cache else {}
+                cache.clear()
+                wsgi = self.measure_wsgi(view_class.as_view(**initkwargs), kwargs[name], headers, options['requests'])
+                cache.clear()
+                asgi = self.measure_asgi(async_view_class.as_view(**initkwargs), kwargs[name], headers,
+                                         options['requests'], options['concurrency'])
+                self.stdout.write(f"{name:<11} wsgi {wsgi:>8.0f} req/s   asgi {asgi:>8.0f} req/s   "
+                                  f"x{asgi / wsgi:.2f}")
+            transaction.set_rollback(True)
+
+    def create_rows(self):
+        user = User.objects.create_user('benchmark_async', 'benchmark_async@example.com', 'benchmark')
+        profiles = Profile.objects.bulk_create(
+            Profile(description_ru=f'Профиль **{i}**', description_en=f'Profile **{i}**') for i in range(20))
+        profile = profiles[0]
+        tasks = Task.objects.bulk_create(
+            Task(title_ru=f'Задача {i}', title_en=f'Task {i}', description_ru=f'Описание *{i}*',
+                 description_en=f'Description *{i}*', profile_id=profile) for i in range(20))
+        task = tasks[0]
+        UserProfile.objects.create(user=user, profile=profile)
+        TaskProfile.objects.create(task=task, profile=profile)
+        Submission.objects.create(user_id=user, task_id=task, comment='Ответ')
+        return user, {
+            'profiles': {'lang': 'ru'},
+            'profile': {'lang': 'ru', 'profileId': profile.id},
+            'tasks': {'lang': 'ru', 'profileId': profile.id},
+            'task': {'lang': 'ru', 'taskId': task.id},
+            'submission': {'lang': 'ru', 'taskId': task.id},
+        }
+
+    def measure_wsgi(self, view, kwargs, headers, requests):
+        factory = RequestFactory()
+        started = time.perf_counter()
+        for _ in range(requests):
+            self.check_response(view(factory.get('/', headers=headers), **kwargs).render())
+        return requests / (time.perf_counter() - started)
+
+    def measure_asgi(self, view, kwargs, headers, requests, concurrency):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                self.check_response((await view(factory.get('/', headers=headers), **kwargs)).render())
+
+        async def run_all():
+            await asyncio.gather(*(request() for _ in range(requests)))
+
+        started = time.perf_counter()
+        async_to_sync(run_all)()
+        return requests / (time.perf_counter() - started)
+
+    def check_response(self, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"Unexpected response {response.status_code}: {response.content[:200]!r}")
@@ -0,0 +1,92 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.fast import FastListSerializer
+from api.models import Profile, Task
+from api.planner import plan_queryset
+from api.serializers import ProfileSerializer, TaskSerializer
+from api.sqljson import SQLJSONSerializer
+from api.streaming import stream_json_list
+from admin_api.serializers import UserActionLogSerializer
+from users.models import UserActionLog
+from users.serializers import UserSerializer
+
+User = get_user_model()
+
+
+def serialize_drf(queryset, serializer):
+    return type(serializer)(queryset, many=True, **serializer._kwargs).data
+
+
+def serialize_fast(queryset, serializer):
+    fast_serializer = FastListSerializer.compile(serializer)
+    return fast_serializer.to_representation(fast_serializer.values(queryset))
+
+
+def serialize_sql(queryset, serializer):
+    sql_serializer = SQLJSONSerializer.compile(serializer)
+    return ''.join(stream_json_list(sql_serializer.rows(queryset).iterator(), sql_serializer.render))
+
+
+ENGINES = {
+    'drf': (serialize_drf, lambda serializer: True),
+    'fast': (serialize_fast, FastListSerializer.compile),
+    'sql': (serialize_sql, SQLJSONSerializer.compile),
+}
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает скорость сериализации списков профилей, задач и пользователей разными способами. "
+            "Тестовые строки создаются в транзакции, которая затем откатывается")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Сколько строк создать в каждом списке")
+        parser.add_argument('--repeat', type=int, default=5, help="Сколько раз повторить замер (берется лучший)")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            profile, user = self.create_rows(rows)
+            for name, queryset, serializer in self.get_lists(profile, user):
+                queryset = plan_queryset(queryset, serializer)
+                for engine, (serialize, supports) in ENGINES.items():
+                    if not supports(serializer):
+                        self.stdout.write(f"{name:<10} {engine:<6} {'-':>12}")
+                        continue
+                    best = min(self.measure(serialize, queryset, serializer) for _ in range(options['repeat']))
+                    self.stdout.write(f"{name:<10} {engine:<6} {rows / best:>12.0f} rows/s "
+                                      f"{best * 1000 * 1000 / rows:>10.2f} ms per 1000 rows")
+            transaction.set_rollback(True)
+
+    def create_rows(self, rows):
+        profiles = Profile.objects.bulk_create(
+            Profile(description_ru=f'Профиль **{i}**', description_en=f'Profile **{i}**') for i in range(rows))
+        Task.objects.bulk_create(
+            Task(title_ru=f'Задача {i}', title_en=f'Task {i}', description_ru=f'Описание *{i}*',
+                 description_en=f'Description *{i}*', profile_id=profiles[0]) for i in range(rows))
+        users = User.objects.bulk_create(
+            User(username=f'benchmark_{i}', email=f'benchmark_{i}@example.com', password='!') for i in range(rows))
+        UserActionLog.objects.bulk_create(
+            UserActionLog(user=users[0], action=f'Действие {i}', extra_data={'path': '/ru/', 'method': 'GET'})
+            for i in range(rows))
+        return profiles[0], users[0]
+
+    def get_lists(self, profile, user):
+        return (
+            ('profiles', Profile.objects.order_by('id'),
+             ProfileSerializer(exclude_fields=('files', 'tasks', 'description_en', 'description_en_html'))),
+            ('tasks', Task.objects.filter(profile_id=profile).order_by('id'),
+             TaskSerializer(exclude_fields=('profile', 'submissions', 'title_en', 'description_en',
+                                            'description_en_html', 'profile_id'))),
+            ('users', User.objects.filter(username__startswith='benchmark_').order_by('id'),
+             UserSerializer(exclude_fields=('profiles',))),
+            ('logs', UserActionLog.objects.filter(user=user).order_by('timestamp'), UserActionLogSerializer()),
+        )
+
+    def measure(self, serialize, queryset, serializer):
+        started = time.perf_counter()
+        serialize(queryset.all(), serializer)
+        return time.perf_counter() - started
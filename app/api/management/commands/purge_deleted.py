@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.blobs import collect_orphan_blobs
+from api.deletion import PURGE_FUNCTIONS
+from api.models import FileBlob
+
+
+class Command(BaseCommand):
+    help = ("Дочищает пользователей, профили и задачи, помеченные на удаление, но не удаленные в фоне, "
+            "и содержимое файлов, на которое не осталось ссылок")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=0,
+                            help="Обрабатывать только объекты, помеченные (содержимое - созданное) больше указанного "
+                                 "числа секунд назад")
+
+    def handle(self, *args, **options):
+        deleted_before = timezone.now() - timedelta(seconds=options['older_than'])
+
+        for model, purge in PURGE_FUNCTIONS:
+            ids = list(model.objects.filter(deleted_at__lte=deleted_before).values_list('pk', flat=True))
+            for pk in ids:
+                purge(pk)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {len(ids)}")
+
+        self.stdout.write(f"{FileBlob._meta.verbose_name_plural}: {collect_orphan_blobs(deleted_before)}")
+
+        self.stdout.write(self.style.SUCCESS("Done"))
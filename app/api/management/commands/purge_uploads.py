@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.resumable import ResumableUpload
+
+
+class Command(BaseCommand):
+    help = ("Удаляет с диска части брошенных возобновляемых загрузок: каталоги в RESUMABLE_UPLOAD_DIR, "
+            "сессия которых истекла (RESUMABLE_UPLOAD_TTL)")
+
+    def handle(self, *args, **options):
+        purged = ResumableUpload.purge_abandoned()
+        self.stdout.write(f"uploads: {purged}")
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,93 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_submissions(apps, schema_editor):
+    """
+    Ответы одного пользователя на одну задачу сводятся к одному. Остается ответ с историей изменений
+    или уже проверенный (статус не WAITING или есть комментарий администратора), история и связи
+    с задачей остальных ответов переносятся на него.
+    """
+    Submission = apps.get_model("api", "Submission")
+    SubmissionHistory = apps.get_model("api", "SubmissionHistory")
+    TaskSubmission = apps.get_model("api", "TaskSubmission")
+
+    duplicates = Submission.objects.values("user_id", "task_id").annotate(rows=Count("id")).filter(rows__gt=1)
+    for group in duplicates:
+        submissions = list(Submission.objects.filter(user_id=group["user_id"], task_id=group["task_id"]).order_by("id"))
+        with_history = set(
+            SubmissionHistory.objects.filter(submission__in=submissions).values_list("submission_id", flat=True)
+        ) | set(
+            Submission.change_history.through.objects.filter(submission__in=submissions)
+            .values_list("submission_id", flat=True)
+        )
+        keeper = max(submissions, key=lambda submission: (
+            submission.id in with_history,
+            submission.status != "WAITING" or bool(submission.admin_comment),
+        ))
+        losers = [submission for submission in submissions if submission.id != keeper.id]
+
+        SubmissionHistory.objects.filter(submission__in=losers).update(submission=keeper)
+        keeper.change_history.add(*SubmissionHistory.objects.filter(submission_history__in=losers))
+        TaskSubmission.objects.filter(submission__in=losers).update(submission=keeper)
+        Submission.objects.filter(id__in=[submission.id for submission in losers]).delete()
+
+
+def delete_duplicate_links(apps, schema_editor):
+    """Из повторяющихся строк таблиц соответствия остается первая"""
+    for model_name, fields in (
+        ("TaskSubmission", ("task", "submission")),
+        ("UserProfile", ("user", "profile")),
+        ("TaskProfile", ("task", "profile")),
+    ):
+        model = apps.get_model("api", model_name)
+        duplicates = model.objects.values(*fields).annotate(keep=Min("id"), rows=Count("id")).filter(rows__gt=1)
+        for group in duplicates:
+            model.objects.filter(**{field: group[field] for field in fields}).exclude(id=group["keep"]).delete()
+
+
+def remove_duplicates(apps, schema_editor):
+    merge_duplicate_submissions(apps, schema_editor)
+    delete_duplicate_links(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    # Очистка выполняется в своей транзакции: Postgres не дает менять таблицу (ADD CONSTRAINT)
+    # с отложенными проверками внешних ключей после UPDATE/DELETE в той же транзакции
+    atomic = False
+
+    dependencies = [
+        ("api", "0003_alter_profile_options_alter_profilefile_file_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop, atomic=True),
+        migrations.AddConstraint(
+            model_name="submission",
+            constraint=models.UniqueConstraint(
+                fields=("user_id", "task_id"), name="unique_submission_user_task"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="taskprofile",
+            constraint=models.UniqueConstraint(
+                fields=("task", "profile"), name="unique_task_profile"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tasksubmission",
+            constraint=models.UniqueConstraint(
+                fields=("task", "submission"), name="unique_task_submission"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="userprofile",
+            constraint=models.UniqueConstraint(
+                fields=("user", "profile"), name="unique_user_profile"
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0004_unique_constraints"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="submission",
+            name="change_history",
+        ),
+        migrations.AddField(
+            model_name="submissionhistory",
+            name="changed_fields",
+            field=models.JSONField(
+                blank=True, default=list, verbose_name="Измененные поля"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submissionhistory",
+            name="previous_comment",
+            field=models.TextField(
+                blank=True, null=True, verbose_name="Предыдущий комментарий"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submissionhistory",
+            name="previous_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("ACCEPTED", "Принята"),
+                    ("WAITING", "В ожидании"),
+                    ("REJECTED", "Отклонена"),
+                ],
+                default="WAITING",
+                max_length=15,
+                null=True,
+                verbose_name="Предыдущий статус",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submissionhistory",
+            name="submission",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="change_history",
+                to="api.submission",
+                verbose_name="ID ответа",
+            ),
+        ),
+    ]
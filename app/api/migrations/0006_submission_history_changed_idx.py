@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0005_submission_history_fk"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="submissionhistory",
+            index=models.Index(
+                fields=["submission", "changed_at"],
+                name="submission_history_changed_idx",
+            ),
+        ),
+    ]
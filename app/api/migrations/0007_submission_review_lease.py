@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0006_submission_history_changed_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Проверка закреплена до"
+            ),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="reviewer",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="claimed_submissions",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Проверяющий",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["status", "lease_expires_at"],
+                name="submission_review_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0007_submission_review_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Помечен на удаление"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Помечена на удаление"
+            ),
+        ),
+    ]
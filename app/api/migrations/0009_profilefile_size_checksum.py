@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:46
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_size_and_checksum(apps, schema_editor):
+    ProfileFile = apps.get_model("api", "ProfileFile")
+    for profile_file in ProfileFile.objects.exclude(file="").exclude(file=None).iterator():
+        checksum = hashlib.sha256()
+        try:
+            with profile_file.file.open("rb") as file:
+                for chunk in file.chunks():
+                    checksum.update(chunk)
+        except FileNotFoundError:
+            continue
+        profile_file.size = profile_file.file.size
+        profile_file.checksum = checksum.hexdigest()
+        profile_file.save(update_fields=["size", "checksum"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0008_soft_delete"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilefile",
+            name="checksum",
+            field=models.CharField(
+                blank=True, default="", max_length=64, verbose_name="SHA-256"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilefile",
+            name="size",
+            field=models.PositiveBigIntegerField(
+                default=0, verbose_name="Размер в байтах"
+            ),
+        ),
+        migrations.RunPython(fill_size_and_checksum, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:55
+
+import os
+
+import api.models
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models, transaction
+
+
+def link_blobs(apps, schema_editor):
+    """Привязывает существующие файлы к blob по SHA-256; дубликаты на диске удаляются после коммита"""
+    ProfileFile = apps.get_model("api", "ProfileFile")
+    FileBlob = apps.get_model("api", "FileBlob")
+    storage = ProfileFile._meta.get_field("file").storage
+    duplicates = []
+
+    for profile_file in ProfileFile.objects.order_by("uploaded_at").iterator():
+        profile_file.name = os.path.basename(profile_file.file.name or "")
+        if profile_file.checksum:
+            blob, created = FileBlob.objects.get_or_create(
+                checksum=profile_file.checksum,
+                defaults={"file": profile_file.file.name, "size": profile_file.size},
+            )
+            if not created and profile_file.file.name != blob.file.name:
+                duplicates.append(profile_file.file.name)
+            profile_file.blob = blob
+            profile_file.file = blob.file.name
+        profile_file.save(update_fields=["name", "blob", "file"])
+
+    transaction.on_commit(
+        lambda: [storage.delete(name) for name in duplicates], using=schema_editor.connection.alias
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0009_profilefile_size_checksum"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileBlob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "checksum",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="SHA-256"
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255,
+                        upload_to=api.models.FileBlob.get_upload_path,
+                        verbose_name="Файл",
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(verbose_name="Размер в байтах"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Содержимое файла",
+                "verbose_name_plural": "Содержимое файлов",
+            },
+        ),
+        migrations.AddField(
+            model_name="profilefile",
+            name="name",
+            field=models.CharField(
+                blank=True, default="", max_length=255, verbose_name="Имя файла"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profilefile",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="profile_files",
+                to="api.fileblob",
+                verbose_name="Содержимое",
+            ),
+        ),
+        migrations.RunPython(link_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:09
+
+import api.models
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0010_file_blob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fileblob",
+            name="file",
+            field=models.FileField(
+                max_length=255,
+                storage=api.storage.get_profile_files_storage,
+                upload_to=api.models.FileBlob.get_upload_path,
+                verbose_name="Файл",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="profilefile",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=api.storage.get_profile_files_storage,
+                upload_to=api.models.ProfileFile.get_upload_path,
+                verbose_name="Файл",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:25
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0011_profile_files_storage"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="submission",
+            name="submission_review_queue_idx",
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Время создания",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["status", "created_at"], name="submission_review_queue_idx"
+            ),
+        ),
+    ]
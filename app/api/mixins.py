@@ -1,3 +1,23 @@
+import orjson
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from admin_api.permissions import IsAdmin
+from api.background import run_in_background
+from api.compression import PrecompressedResponse, choose_encoding, compress_variants
+from api.planner import plan_queryset
+from api.sqljson import SQLJSONSerializer
+from api.streaming import stream_json_list
 from users.models import UserActionLog
 
 
@@ -8,4 +28,246 @@ class UserActionLogMixin:
                 user=self.request.user,
                 action=action,
                 extra_data={'path': self.request.path, 'method': self.request.method}
-            )
\ No newline at end of file
+            )
+
+    async def alog_user_action(self, action):
+        if self.request.user.is_authenticated:
+            await UserActionLog.objects.acreate(
+                user=self.request.user,
+                action=action,
+                extra_data={'path': self.request.path, 'method': self.request.method}
+            )
+
+
+class QueryPlannerMixin:
+    """
+    При чтении строит запрос под итоговый набор полей сериализатора (api.planner):
+    только нужные колонки, select_related/prefetch_related только для выводимых связей.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, self.get_serializer())
+        return queryset
+
+
+class SQLJSONListMixin:
+    """
+    Список с ?engine=sql: JSON страницы собирает Postgres (api.sqljson), сортировка и LIMIT/OFFSET страницы
+    выполняются в том же запросе, а готовый текст отдается клиенту потоком, минуя рендерер DRF.
+    """
+    sql_list: bool = False
+
+    def wants_sql_engine(self):
+        return self.sql_list and self.request.method == 'GET' and self.request.query_params.get('engine') == 'sql'
+
+    def get_sql_serializer(self):
+        return SQLJSONSerializer.compile(self.get_serializer())
+
+    def sql_list_response(self, queryset):
+        """Потоковый ответ или None, если поля сериализатора нельзя собрать в SQL"""
+        sql_serializer = self.get_sql_serializer()
+        if sql_serializer is None:
+            return None
+
+        rows = sql_serializer.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            # Строки читаются уже после выхода из middleware: база (реплика) фиксируется сейчас
+            rows = rows.using(rows.db)
+            content = stream_json_list(rows.iterator(), sql_serializer.render)
+        else:
+            envelope = self.get_paginated_response([]).data
+            content = stream_json_list(page, sql_serializer.render, envelope=envelope)
+        return StreamingHttpResponse(content, content_type='application/json')
+
+
+class StreamingListMixin:
+    """
+    Список без пагинации больше stream_chunk_size строк (или с ?stream=1) отдается потоком: queryset читается
+    через iterator(chunk_size), объекты сериализуются по одному и сразу дописываются в JSON-массив, поэтому память
+    не растет с размером выборки. ?stream=1 выгружает всю таблицу, поэтому доступен только администраторам.
+    """
+    stream_chunk_size = 2000
+
+    def wants_stream(self):
+        return self.request.method == 'GET' and self.request.query_params.get('stream') in ('1', 'true') \
+            and IsAdmin().has_permission(self.request, self)
+
+    def is_small_list(self, queryset):
+        """Выборка помещается в одну порцию итератора: ее дешевле отрендерить целиком и закэшировать"""
+        return not queryset[self.stream_chunk_size:self.stream_chunk_size + 1].exists()
+
+    def streaming_list_response(self, queryset, fast_serializer=None):
+        """Потоковый ответ или None, если клиент выбрал не JSON (MessagePack, browsable API)"""
+        renderer = self.request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return None
+
+        # Тело читает БД после выхода из ReplicaRoutingMiddleware: фиксируем выбранную для запроса базу
+        queryset = queryset.using(queryset.db)
+        if fast_serializer is not None:
+            rows = fast_serializer.values(queryset).iterator(chunk_size=self.stream_chunk_size)
+            represent = fast_serializer.represent
+        else:
+            rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+            represent = self.get_serializer().to_representation
+
+        content = stream_json_list(rows, lambda obj: renderer.render(represent(obj)).decode())
+        return StreamingHttpResponse(content, content_type='application/json')
+
+
+class CompressedCacheMixin:
+    """
+    Кэш ответов в отрендеренном виде: при заполнении JSON рендерится и сжимается один раз (api.compression),
+    а попадание в кэш отдает готовые байты под Accept-Encoding клиента без рендеринга и сжатия.
+    """
+    cache_timeout = 60
+
+    def get_json_renderer(self):
+        return next(renderer for renderer in self.get_renderers() if isinstance(renderer, JSONRenderer))
+
+    def respond_with_variants(self, variants):
+        if not isinstance(self.request.accepted_renderer, JSONRenderer):
+            # MessagePack и browsable API рендерят данные сами
+            return Response(orjson.loads(variants['identity']))
+        encoding = choose_encoding(self.request.headers.get('Accept-Encoding'), variants)
+        return PrecompressedResponse(variants, encoding)
+
+    def cached_variants_response(self, variants):
+        # Записи в старом формате (данные, а не байты) считаются промахом
+        if not isinstance(variants, dict) or 'identity' not in variants:
+            return None
+        return self.respond_with_variants(variants)
+
+    def get_cached_response(self, cache_key):
+        return self.cached_variants_response(cache.get(cache_key))
+
+    def cache_response(self, cache_key, data):
+        variants = compress_variants(self.get_json_renderer().render(data))
+        cache.set(cache_key, variants, timeout=self.cache_timeout)
+        return self.respond_with_variants(variants)
+
+    async def aget_cached_response(self, cache_key):
+        return self.cached_variants_response(await cache.aget(cache_key))
+
+    async def acache_response(self, cache_key, data):
+        variants = compress_variants(self.get_json_renderer().render(data))
+        await cache.aset(cache_key, variants, timeout=self.cache_timeout)
+        return self.respond_with_variants(variants)
+
+
+class AsyncReadMixin:
+    """
+    Асинхронное представление для ASGI: GET выполняется корутиной aget() на async ORM и async кэше, не занимая
+    поток воркера на время запросов к БД и Redis. Аутентификация, права и остальные методы (POST, PUT, PATCH)
+    выполняются обычным синхронным кодом DRF через sync_to_async.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+        # То же, что APIView.dispatch, но обработчик - корутина aget()
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await self.aget(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        """paginate_queryset PageNumberPagination, где COUNT и строки страницы читаются через async ORM"""
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        page_size = paginator.get_page_size(self.request)
+        if not page_size:
+            return None
+
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = await queryset.acount()
+        page_number = paginator.get_page_number(self.request, django_paginator)
+        try:
+            paginator.page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        if django_paginator.num_pages > 1 and paginator.template is not None:
+            paginator.display_page_controls = True
+        paginator.request = self.request
+        return [obj async for obj in paginator.page.object_list]
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+class AsyncListMixin(AsyncReadMixin):
+    """alist() - асинхронный BaseListLangAPIView.list для страниц списка"""
+
+    async def alist(self, request, *args, **kwargs):
+        paginated = self.paginator is not None and self.paginator.get_page_size(request)
+        if self.wants_sql_engine() or self.wants_stream() or not paginated:
+            # Потоковые ответы читают БД итератором в синхронном генераторе
+            return await sync_to_async(self.list)(request, *args, **kwargs)
+
+        cache_key = self.get_list_cache_key()
+        cached_response = await self.aget_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not await queryset.aexists():
+            raise NotFound(self.not_found_name)
+
+        fast_serializer = self.get_fast_serializer()
+        page = await self.apaginate_queryset(
+            queryset if fast_serializer is None else fast_serializer.values(queryset))
+
+        if fast_serializer is not None:
+            data = fast_serializer.to_representation(page)
+        else:
+            data = self.get_serializer(page, many=True).data
+        return await self.acache_response(cache_key, self.get_paginated_response(data).data)
+
+
+class BackgroundDestroyMixin:
+    """
+    DELETE с ?async=1 помечает объект удаленным и сразу отвечает 202,
+    а дочерние записи удаляются в фоне пачками функцией purge_function.
+    """
+    purge_function = None
+
+    def destroy(self, request, *args, **kwargs):
+        if request.query_params.get('async') not in ('1', 'true'):
+            return super().destroy(request, *args, **kwargs)
+
+        instance = self.get_object()
+        with transaction.atomic():
+            self.mark_deleted(instance)
+            run_in_background(type(self).purge_function, instance.pk)
+
+        return Response({"detail": "Deletion scheduled", "id": instance.pk}, status=status.HTTP_202_ACCEPTED)
+
+    def mark_deleted(self, instance):
+        instance.deleted_at = timezone.now()
+        instance.save(update_fields=['deleted_at'])
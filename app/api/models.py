@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 from uuid import uuid4
 
+from api.storage import get_profile_files_storage
+
 User = get_user_model()
 
 
@@ -11,6 +15,7 @@ class Profile(models.Model):
     description_ru = models.TextField(verbose_name="Русское описание")
     description_en = models.TextField(verbose_name="Английское описание")
     tasks = models.ManyToManyField('Task', verbose_name="Задачи", through='TaskProfile')
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="Помечен на удаление")
 
     class Meta:
         verbose_name = "Профиль"
@@ -43,6 +48,7 @@ class Task(models.Model):
     type = models.CharField(max_length=15, choices=Type.choices, default=Type.FREE, verbose_name="Тип")
     submissions = models.ManyToManyField('Submission', through='TaskSubmission', verbose_name="Ответы",
                                          related_name="submissions_set")
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="Помечена на удаление")
 
     class Meta:
         verbose_name = "Задача"
@@ -64,27 +70,66 @@ class Submission(models.Model):
     comment = models.TextField(verbose_name="Комментарий")
     admin_comment = models.TextField(null=True, blank=True, verbose_name="Комментарий администратора")
     status = models.CharField(max_length=15, choices=Status.choices, default=Status.WAITING, verbose_name="Статус")
-    change_history = models.ManyToManyField('SubmissionHistory', related_name='submission_history',
-                                            verbose_name="История изменений", blank=True)
+    reviewer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name="claimed_submissions", verbose_name="Проверяющий")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Проверка закреплена до")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
 
     class Meta:
         verbose_name = "Ответ"
         verbose_name_plural = "Ответы"
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'task_id'], name='unique_submission_user_task'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='submission_review_queue_idx'),
+        ]
+
+    def is_leased_by_other(self, user):
+        """Ответ закреплен за другим проверяющим, и закрепление еще действует"""
+        return self.reviewer_id is not None and self.reviewer_id != user.id \
+            and self.lease_expires_at is not None and self.lease_expires_at > timezone.now()
 
 
 class SubmissionHistory(models.Model):
+    TRACKED_FIELDS = ('comment', 'admin_comment', 'status')
+
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
-    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, verbose_name="ID ответа")
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='change_history',
+                                   verbose_name="ID ответа")
     changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Время изменения")
-    previous_comment = models.TextField(verbose_name="Предыдущий комментарий")
+    changed_fields = models.JSONField(default=list, blank=True, verbose_name="Измененные поля")
+    previous_comment = models.TextField(null=True, blank=True, verbose_name="Предыдущий комментарий")
     previous_admin_comment = models.TextField(null=True, blank=True,
                                               verbose_name="Предыдущий комментарий администратора")
-    previous_status = models.CharField(max_length=15, choices=Submission.Status.choices,
+    previous_status = models.CharField(max_length=15, choices=Submission.Status.choices, null=True, blank=True,
                                        default=Submission.Status.WAITING, verbose_name="Предыдущий статус")
 
     class Meta:
         verbose_name = "История ответа"
         verbose_name_plural = "История ответов"
+        indexes = [
+            models.Index(fields=['submission', 'changed_at'], name='submission_history_changed_idx'),
+        ]
+
+    @classmethod
+    def from_changes(cls, submission, changes):
+        """
+        Собирает несохраненный снимок ответа до применения changes.
+        Возвращает None, если ни одно из отслеживаемых полей не меняется.
+        При SUBMISSION_HISTORY_CHANGED_FIELDS_ONLY сохраняются только измененные поля, остальные остаются NULL.
+        """
+        changed_fields = [field for field in cls.TRACKED_FIELDS
+                          if field in changes and changes[field] != getattr(submission, field)]
+        if not changed_fields:
+            return None
+
+        compact = settings.SUBMISSION_HISTORY_CHANGED_FIELDS_ONLY
+        snapshot = {
+            f'previous_{field}': getattr(submission, field) if not compact or field in changed_fields else None
+            for field in cls.TRACKED_FIELDS
+        }
+        return cls(submission=submission, changed_fields=changed_fields, **snapshot)
 
 
 class UserProfile(models.Model):
@@ -94,6 +139,9 @@ class UserProfile(models.Model):
     class Meta:
         verbose_name = "Соответствие профиля и пользователя"
         verbose_name_plural = "Таблица соответствия профиля и пользователя"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'profile'], name='unique_user_profile'),
+        ]
 
 
 class TaskProfile(models.Model):
@@ -103,6 +151,9 @@ class TaskProfile(models.Model):
     class Meta:
         verbose_name = "Соответствие профиля и задачи"
         verbose_name_plural = "Таблица соответствия профиля и задач"
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'profile'], name='unique_task_profile'),
+        ]
 
 
 class TaskSubmission(models.Model):
@@ -112,6 +163,26 @@ class TaskSubmission(models.Model):
     class Meta:
         verbose_name = "Соответствие задачи и ответа"
         verbose_name_plural = "Таблица соответствия задачи и ответа"
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'submission'], name='unique_task_submission'),
+        ]
+
+
+class FileBlob(models.Model):
+    """Содержимое файла, хранящееся один раз на каждый уникальный SHA-256"""
+    def get_upload_path(instance, filename):
+        return f'blobs/{instance.checksum[:2]}/{instance.checksum}/{filename}'
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    checksum = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    file = models.FileField(upload_to=get_upload_path, storage=get_profile_files_storage, max_length=255,
+                            verbose_name="Файл")
+    size = models.PositiveBigIntegerField(verbose_name="Размер в байтах")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время создания")
+
+    class Meta:
+        verbose_name = "Содержимое файла"
+        verbose_name_plural = "Содержимое файлов"
 
 
 class ProfileFile(models.Model):
@@ -119,7 +190,14 @@ class ProfileFile(models.Model):
         return f'files/{instance.profile.id}/{filename}'
 
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='files', verbose_name="Профиль")
-    file = models.FileField(upload_to=get_upload_path, blank=True, null=True, verbose_name="Файл")
+    # Путь совпадает с путем blob: одно и то же содержимое на диске хранится один раз
+    file = models.FileField(upload_to=get_upload_path, storage=get_profile_files_storage, blank=True, null=True,
+                            verbose_name="Файл")
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='profile_files',
+                             verbose_name="Содержимое")
+    name = models.CharField(max_length=255, blank=True, default='', verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Размер в байтах")
+    checksum = models.CharField(max_length=64, blank=True, default='', verbose_name="SHA-256")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Время загрузки")
 
     class Meta:
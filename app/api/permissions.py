@@ -1,6 +1,8 @@
 from rest_framework import permissions, status
 from rest_framework.exceptions import APIException, NotFound, PermissionDenied
 
+from admin_api.permissions import IsAdmin
+from api.downloads import check_download_token
 from api.models import Task, UserProfile
 
 
@@ -12,7 +14,7 @@ class IsProfileOwnerOrReadOnly(permissions.BasePermission):
         if not task_id:
             return NotFound("Task ID not provided")
 
-        task = Task.objects.filter(id=task_id).first()
+        task = Task.objects.filter(id=task_id, deleted_at__isnull=True, profile_id__deleted_at__isnull=True).first()
         if not task:
             return NotFound("Task not found")
 
@@ -45,3 +47,28 @@ class ProfileNotAddedToUserPermission(permissions.BasePermission):
         if UserProfile.objects.filter(user=user, profile=profile).exists():
             raise APIException(detail=self.message, code=status.HTTP_409_CONFLICT)
         return True
+
+
+class IsProfileFileMember(permissions.BasePermission):
+    """Файл профиля доступен администратору и пользователям, к которым привязан профиль"""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        # Администратор - в том же смысле, что и для admin_api (is_staff или is_superuser)
+        return IsAdmin().has_permission(request, view) or \
+            UserProfile.objects.filter(user=request.user, profile_id=obj.profile_id).exists()
+
+
+class IsProfileFileMemberOrSignedURL(IsProfileFileMember):
+    """Дополнительно пускает по неистекшей подписанной ссылке (?token=) без авторизации"""
+
+    def has_permission(self, request, view):
+        return 'token' in request.query_params or super().has_permission(request, view)
+
+    def has_object_permission(self, request, view, obj):
+        token = request.query_params.get('token')
+        if token is not None:
+            return check_download_token(token, obj)
+        return super().has_object_permission(request, view, obj)
@@ -0,0 +1,97 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """Что нужно загрузить из БД, чтобы сериализовать объекты без лишних колонок и запросов"""
+
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetch_related = []
+        self.annotations = {}
+        # Поле с неизвестным источником может обратиться к любой колонке - тогда колонки не ограничиваются
+        self.restrict_columns = True
+
+
+def get_serializer_fields(serializer):
+    serializer = getattr(serializer, 'child', serializer)
+    return {name: field for name, field in serializer.fields.items() if not field.write_only}
+
+
+def build_plan(model, serializer, prefix='', plan=None):
+    """
+    Разбирает итоговый набор полей сериализатора (после exclude_fields) и собирает план запроса.
+    Поля без прямого источника в модели (SerializerMethodField и т.п.) описываются в атрибуте
+    сериализатора planner_hints: {'поле': {'only': (...), 'annotate': {...}}}.
+    """
+    plan = plan or QueryPlan()
+    serializer = getattr(serializer, 'child', serializer)
+    hints = getattr(serializer, 'planner_hints', {})
+    plan.only.add(prefix + model._meta.pk.name)
+
+    for name, field in get_serializer_fields(serializer).items():
+        if name in hints:
+            hint = hints[name]
+            plan.only.update(prefix + column for column in hint.get('only', ()))
+            if not prefix:
+                plan.annotations.update(hint.get('annotate', {}))
+            continue
+
+        if field.source == '*' or '.' in field.source:
+            plan.restrict_columns = False
+            continue
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            plan.restrict_columns = False
+            continue
+
+        lookup = prefix + field.source
+        if not model_field.is_relation:
+            plan.only.add(lookup)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            plan.only.add(lookup)
+            if isinstance(field, serializers.BaseSerializer):
+                plan.select_related.add(lookup)
+                build_plan(model_field.related_model, field, prefix=f'{lookup}__', plan=plan)
+        elif model_field.many_to_many or model_field.one_to_many:
+            plan.prefetch_related.append(Prefetch(lookup, queryset=_related_queryset(model_field, field)))
+        else:
+            plan.restrict_columns = False
+
+    return plan
+
+
+def _related_queryset(model_field, field):
+    related_model = model_field.related_model
+    queryset = related_model._default_manager.all()
+    if isinstance(field, serializers.BaseSerializer):
+        queryset = plan_queryset(queryset, field)
+    else:
+        # Список первичных ключей (PrimaryKeyRelatedField(many=True))
+        queryset = queryset.only(related_model._meta.pk.name)
+    loaded_fields, defer = queryset.query.deferred_loading
+    if model_field.one_to_many and not defer:
+        # Обратный ForeignKey: без колонки связи Django догружал бы ее для каждого объекта
+        queryset = queryset.only(*loaded_fields, model_field.field.name)
+    return queryset
+
+
+def plan_queryset(queryset, serializer):
+    """Возвращает queryset, загружающий ровно то, что выведет сериализатор"""
+    plan = build_plan(queryset.model, serializer)
+
+    annotations = {name: expression for name, expression in plan.annotations.items()
+                   if name not in queryset.query.annotations}
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*plan.prefetch_related)
+    if plan.restrict_columns:
+        queryset = queryset.only(*plan.only)
+    return queryset
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from api.blobs import attach_blob, get_or_register_blob
+from api.exceptions import DirectUploadUnavailable, UploadConflict
+from api.models import FileBlob, ProfileFile
+from api.storage import profile_files_storage, supports_presigned_upload
+from api.uploads import file_checksum
+
+signer = signing.TimestampSigner(salt='api.presigned.upload')
+
+
+def presign_upload(profile, filename, length, checksum):
+    """
+    Выдает ссылку на прямую загрузку файла в хранилище. Путь совпадает с путем blob,
+    поэтому после загрузки файл не нужно переносить. Состояние загрузки хранится в подписанном токене.
+    """
+    if not supports_presigned_upload(profile_files_storage):
+        raise DirectUploadUnavailable()
+
+    name = FileBlob.get_upload_path(FileBlob(checksum=checksum), filename)
+    url, headers = profile_files_storage.presigned_put_url(name, length, checksum, settings.PRESIGNED_UPLOAD_TTL)
+    token = signer.sign_object({
+        'profile_id': str(profile.pk), 'name': name, 'filename': filename, 'length': length, 'checksum': checksum,
+    })
+    return {'token': token, 'url': url, 'method': 'PUT', 'headers': headers,
+            'expires_in': settings.PRESIGNED_UPLOAD_TTL}
+
+
+def load_upload(token):
+    """Возвращает состояние загрузки из токена; токен живет столько же, сколько ссылка на загрузку"""
+    try:
+        return signer.unsign_object(token, max_age=settings.PRESIGNED_UPLOAD_TTL)
+    except signing.BadSignature:
+        raise UploadConflict("Upload token is invalid or expired")
+
+
+def completed_upload_key(token):
+    return f'presigned_upload_completed_{hashlib.sha256(token.encode()).hexdigest()}'
+
+
+def get_completed_file(profile, token):
+    """Файл профиля, уже созданный по этому токену, или None. Вызывается под блокировкой профиля"""
+    profile_file_id = cache.get(completed_upload_key(token))
+    if profile_file_id is None:
+        return None
+    # Если транзакция, создавшая файл, откатилась, записи нет и загрузку можно завершить заново
+    return ProfileFile.objects.filter(pk=profile_file_id, profile=profile).first()
+
+
+def complete_upload(profile, upload, token):
+    """
+    Проверяет загруженный клиентом объект и привязывает его к профилю. Вызывается внутри транзакции
+    под блокировкой профиля. Объект с неверным размером или содержимым удаляется из хранилища.
+    Использованный токен запоминается до его истечения, чтобы повтор запроса не создал второй файл.
+    """
+    name = upload['name']
+    if not profile_files_storage.exists(name):
+        raise UploadConflict("Uploaded file not found in storage")
+
+    size = profile_files_storage.size(name)
+    checksum = profile_files_storage.stored_checksum(name)
+    if checksum is None and size == upload['length']:
+        # Хранилище не сохранило SHA-256: считаем его сами, читая объект частями
+        with profile_files_storage.open(name, 'rb') as file:
+            checksum = file_checksum(file)
+    if size != upload['length'] or checksum != upload['checksum']:
+        profile_files_storage.delete(name)
+        raise UploadConflict("Uploaded file does not match the declared size or checksum")
+
+    blob = get_or_register_blob(name, checksum, size)
+    profile_file = attach_blob(profile, blob, upload['filename'])
+    cache.set(completed_upload_key(token), profile_file.pk, timeout=settings.PRESIGNED_UPLOAD_TTL)
+    return profile_file
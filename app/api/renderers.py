@@ -0,0 +1,71 @@
+import datetime
+import uuid
+
+import orjson
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # MessagePack нужен только внутренним сервисам
+    msgpack = None
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_drf_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """То, что orjson не умеет сам: ленивые строки переводов и все, что понимает JSONEncoder DRF (Decimal, QuerySet...)"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer на orjson: UUID и datetime кодируются нативно (время в UTC с суффиксом Z),
+    остальное - как в JSONEncoder DRF. orjson умеет только отступ в 2 пробела, поэтому другой отступ
+    (например, indent=4 в Accept или в browsable API) рендерит JSONRenderer DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = ORJSON_OPTIONS
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent == 2:
+            options |= orjson.OPT_INDENT_2
+        elif indent:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=encode_default, option=options)
+
+        # Как и JSONRenderer DRF, экранируем разделители строк, которые ломают JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+def _msgpack_default(obj):
+    # Те же строковые представления, что и в JSON, чтобы клиентам не нужно было различать форматы
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)[1:-1].decode()
+    return encode_default(obj)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """application/msgpack для внутренних сервисов; выбирается по заголовку Accept"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
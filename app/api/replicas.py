@@ -0,0 +1,157 @@
+import logging
+import random
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+logger = logging.getLogger(__name__)
+
+# Чтение с реплик включается только для представлений этих приложений
+REPLICA_APPS = ('api', 'admin_api')
+# Сколько секунд измеренное отставание реплики хранится в кэше (общем для всех воркеров)
+LAG_CHECK_INTERVAL = 2
+
+# Отставание в секундах; 0, если реплика догнала primary (на простаивающем primary
+# pg_last_xact_replay_timestamp не меняется, поэтому сравниваются позиции WAL)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# База для чтения в текущем запросе; Local из asgiref виден и в потоках sync_to_async
+_state = Local()
+
+
+def measure_replica_lag(alias):
+    """Отставание реплики в секундах; недоступная реплика считается бесконечно отстающей"""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning("Replica %s is unavailable", alias, exc_info=True)
+        return float('inf')
+
+
+def get_replica_lags():
+    lags = {alias: cache.get(f'replica_lag_{alias}') for alias in settings.DATABASE_REPLICAS}
+    for alias, lag in lags.items():
+        if lag is None:
+            lags[alias] = measure_replica_lag(alias)
+            cache.set(f'replica_lag_{alias}', lags[alias], timeout=LAG_CHECK_INTERVAL)
+    return lags
+
+
+def choose_replica():
+    """Случайная реплика с отставанием не больше REPLICA_MAX_LAG_SECONDS или None (читать с primary)"""
+    replicas = [alias for alias, lag in get_replica_lags().items() if lag <= settings.REPLICA_MAX_LAG_SECONDS]
+    return random.choice(replicas) if replicas else None
+
+
+def get_request_user_id(request):
+    """
+    id пользователя из access-токена. Middleware работает до аутентификации DRF, поэтому токен проверяется здесь
+    (только подпись и срок, без запроса к БД). None - для анонимного запроса или неверного токена.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = header and authentication.get_raw_token(header)
+        if not raw_token:
+            return None
+        return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except AuthenticationFailed:
+        return None
+
+
+def get_pin_key(request):
+    """Ключ отметки о записи по id пользователя: отметка переживает обновление токена и повторный вход"""
+    user_id = get_request_user_id(request)
+    if user_id is None:
+        return None
+    return f"replica_pin_{user_id}"
+
+
+class ReplicaRouter:
+    """
+    Чтение - с реплики, выбранной ReplicaRoutingMiddleware для текущего запроса, иначе с default.
+    Запись и миграции - всегда в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'database', None)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in settings.DATABASE_REPLICAS else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    GET/HEAD/OPTIONS к представлениям api и admin_api читают с реплики. После запроса с записью пользователь
+    REPLICA_STICKY_SECONDS секунд читает с primary (отметка в Redis), чтобы сразу видеть свои изменения;
+    реплики, отстающие больше REPLICA_MAX_LAG_SECONDS, не используются.
+    Потоковые ответы читают БД уже после выхода из middleware, поэтому фиксируют базу через queryset.using().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.database = None
+        pin_key = self.get_write_pin_key(request)
+        if pin_key is not None:
+            cache.set(pin_key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.database = None
+        pin_key = self.get_write_pin_key(request)
+        if pin_key is not None:
+            await cache.aset(pin_key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def get_write_pin_key(self, request):
+        """Ключ отметки, которую нужно поставить после запроса с записью, или None"""
+        if not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS:
+            return None
+        return get_pin_key(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS \
+                or view_func.__module__.split('.')[0] not in REPLICA_APPS:
+            return None
+        pin_key = get_pin_key(request)
+        if pin_key is not None and cache.get(pin_key):
+            return None
+        _state.database = choose_replica()
+        return None
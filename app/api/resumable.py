@@ -0,0 +1,237 @@
+import errno
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.http import UnreadablePostError
+from redis.exceptions import LockError
+
+from api.blobs import attach_blob, create_profile_file, delete_storage_files, get_or_register_blob, store_blob_file
+from api.exceptions import UploadConflict
+from api.uploads import UploadTooLarge
+
+CHUNK_SIZE = 64 * 2 ** 10
+PART_SUFFIX = '.part'
+LOCK_TIMEOUT = 60 * 10  # Сколько секунд живет блокировка сессии, если запрос упал, не сняв ее
+
+
+class AssembledFile(File):
+    """Собранный файл на локальном диске: FileSystemStorage переносит его через rename, а не копирует"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def copy_file_range(source, target):
+    """Дописывает source в конец target без копирования через память процесса, если ядро это умеет"""
+    target.flush()
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+        return
+
+    size = os.fstat(source.fileno()).st_size
+    copied = 0
+    try:
+        while copied < size:
+            count = os.copy_file_range(source.fileno(), target.fileno(), size - copied)
+            if count == 0:
+                break
+            copied += count
+    except OSError as err:
+        # Файловая система не поддерживает copy_file_range - копируем обычным способом
+        if copied or err.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+
+class ResumableUpload:
+    """
+    Сессия возобновляемой загрузки: состояние хранится в кеше (Redis), части - на локальном диске.
+    Каждая часть записывается в файл с именем по смещению, с которого она начинается.
+    Сессией может пользоваться только создавший ее администратор (user_id).
+    """
+
+    def __init__(self, id, profile_id, filename, length, offset=0, user_id=None):
+        self.id = id
+        self.profile_id = profile_id
+        self.filename = filename
+        self.length = length
+        self.offset = offset
+        self.user_id = user_id
+
+    @staticmethod
+    def cache_key(upload_id):
+        return f'upload_session_{upload_id}'
+
+    @property
+    def parts_dir(self):
+        return os.path.join(settings.RESUMABLE_UPLOAD_DIR, str(self.id))
+
+    @classmethod
+    def create(cls, profile_id, filename, length, user_id):
+        upload = cls(uuid4(), profile_id, filename, length, user_id=user_id)
+        # Сначала сессия, потом каталог: purge_abandoned не должен принять новый каталог за брошенный
+        upload.save()
+        os.makedirs(upload.parts_dir, exist_ok=True)
+        return upload
+
+    @classmethod
+    def get(cls, upload_id):
+        data = cache.get(cls.cache_key(upload_id))
+        if data is None:
+            return None
+        return cls(upload_id, **data)
+
+    @classmethod
+    def purge_abandoned(cls):
+        """Удаляет каталоги частей, сессия которых истекла в кеше, и возвращает их число"""
+        try:
+            names = os.listdir(settings.RESUMABLE_UPLOAD_DIR)
+        except FileNotFoundError:
+            return 0
+
+        purged = 0
+        for name in names:
+            try:
+                upload_id = UUID(name)
+            except ValueError:
+                continue
+            path = os.path.join(settings.RESUMABLE_UPLOAD_DIR, name)
+            if os.path.isdir(path) and cls.get(upload_id) is None:
+                shutil.rmtree(path, ignore_errors=True)
+                purged += 1
+        return purged
+
+    def save(self):
+        data = {'profile_id': self.profile_id, 'filename': self.filename, 'length': self.length, 'offset': self.offset,
+                'user_id': self.user_id}
+        cache.set(self.cache_key(self.id), data, timeout=settings.RESUMABLE_UPLOAD_TTL)
+
+    def delete(self):
+        cache.delete(self.cache_key(self.id))
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+    @property
+    def is_complete(self):
+        return self.offset == self.length
+
+    @contextmanager
+    def lock(self):
+        # Одновременно в сессию может писать только один запрос. Блокировка redis хранит случайный токен
+        # и снимается, только если он совпадает: истекшую и взятую другим запросом блокировку не трогаем
+        lock = cache.lock(f'{self.cache_key(self.id)}_lock', timeout=LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            raise UploadConflict("Another request is writing to this upload")
+        try:
+            yield
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                pass
+
+    def write_chunk(self, stream, offset):
+        """
+        Пишет часть с позиции offset. Если соединение оборвалось посреди тела запроса,
+        полученные байты сохраняются, и клиент продолжает с нового смещения.
+        """
+        # Состояние могло измениться, пока запрос ждал блокировку
+        current = self.get(self.id)
+        if current is None:
+            raise UploadConflict("Upload session has expired")
+        self.offset = current.offset
+        if offset != self.offset:
+            raise UploadConflict(f"Upload offset is {self.offset}")
+
+        remaining = self.length - offset
+        part_path = os.path.join(self.parts_dir, f'{offset:020d}{PART_SUFFIX}')
+        written = 0
+        os.makedirs(self.parts_dir, exist_ok=True)
+        with open(part_path, 'wb') as part:
+            while stream is not None:
+                try:
+                    chunk = stream.read(CHUNK_SIZE)
+                except UnreadablePostError:
+                    break
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > remaining:
+                    part.close()
+                    os.remove(part_path)
+                    raise UploadTooLarge(f"Chunk exceeds declared upload length {self.length}")
+                part.write(chunk)
+
+        if not written:
+            os.remove(part_path)
+            return 0
+
+        self.offset += written
+        self.save()
+        return written
+
+    def assemble(self):
+        """Склеивает части по порядку смещений в один файл и возвращает путь к нему и SHA-256"""
+        assembled_path = os.path.join(self.parts_dir, 'assembled')
+        position = 0
+        # Без буфера: copy_file_range двигает позицию дескриптора напрямую
+        with open(assembled_path, 'wb', buffering=0) as target:
+            for name in sorted(name for name in os.listdir(self.parts_dir) if name.endswith(PART_SUFFIX)):
+                part_offset = int(name[:-len(PART_SUFFIX)])
+                if part_offset >= self.length:
+                    continue
+                if part_offset != position:
+                    raise UploadConflict(f"Upload part at offset {position} is missing")
+                with open(os.path.join(self.parts_dir, name), 'rb') as source:
+                    copy_file_range(source, target)
+                position = target.tell()
+
+        if position != self.length:
+            raise UploadConflict(f"Assembled {position} bytes of {self.length}")
+
+        sha256 = hashlib.sha256()
+        with open(assembled_path, 'rb') as assembled:
+            for chunk in iter(lambda: assembled.read(CHUNK_SIZE * 16), b''):
+                sha256.update(chunk)
+        return assembled_path, sha256.hexdigest()
+
+    def store(self):
+        """
+        Собирает файл, считает SHA-256 и переносит байты в хранилище, если такого содержимого еще нет.
+        Вызывается до транзакции: под блокировкой профиля finalize остается только создать строки.
+        Возвращает (путь собранного файла, SHA-256, путь в хранилище или None).
+        """
+        assembled_path, checksum = self.assemble()
+        with open(assembled_path, 'rb') as assembled:
+            name = store_blob_file(AssembledFile(assembled, name=self.filename), checksum)
+        return assembled_path, checksum, name
+
+    def finalize(self, profile, stored):
+        """Привязывает сохраненный store() файл к профилю. Вызывается внутри транзакции"""
+        assembled_path, checksum, name = stored
+        if name is not None:
+            blob = get_or_register_blob(name, checksum, self.length)
+            return attach_blob(profile, blob, self.filename)
+        # Содержимое уже хранилось; если его blob успели удалить, файл сохраняется заново
+        with open(assembled_path, 'rb') as assembled:
+            return create_profile_file(profile, AssembledFile(assembled, name=self.filename),
+                                       checksum=checksum, size=self.length)
+
+    @staticmethod
+    def discard(stored):
+        """Удаляет из хранилища байты, сохраненные store(), если привязать их к профилю не удалось"""
+        _, _, name = stored
+        if name is not None:
+            delete_storage_files([name])
+
+    def headers(self):
+        return {'Upload-Offset': str(self.offset), 'Upload-Length': str(self.length)}
+
+    def as_dict(self):
+        return {'id': self.id, 'profile_id': self.profile_id, 'filename': self.filename,
+                'length': self.length, 'offset': self.offset}
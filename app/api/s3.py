@@ -0,0 +1,45 @@
+import base64
+import binascii
+
+from botocore.exceptions import ClientError
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+
+class ProfileFilesS3Storage(S3Storage):
+    """
+    S3-совместимое хранилище файлов профилей (AWS S3, MinIO).
+    Дополнительно выдает подписанные ссылки на PUT, чтобы клиент загружал файл в бакет напрямую.
+    """
+
+    def presigned_put_url(self, name, length, checksum, expires):
+        """
+        Возвращает ссылку и заголовки, с которыми клиент должен выполнить PUT.
+        Размер и SHA-256 входят в подпись: хранилище не примет другое содержимое.
+        """
+        checksum_b64 = base64.b64encode(bytes.fromhex(checksum)).decode()
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': self._normalize_name(clean_name(name)),
+            'ContentLength': length,
+            'ChecksumSHA256': checksum_b64,
+        }
+        url = self.bucket.meta.client.generate_presigned_url(
+            'put_object', Params=params, ExpiresIn=expires, HttpMethod='PUT')
+        return url, {'Content-Length': str(length), 'x-amz-checksum-sha256': checksum_b64}
+
+    def stored_checksum(self, name):
+        """SHA-256 объекта, посчитанный хранилищем при загрузке, или None, если хранилище его не сохранило"""
+        try:
+            head = self.bucket.meta.client.head_object(
+                Bucket=self.bucket_name, Key=self._normalize_name(clean_name(name)), ChecksumMode='ENABLED')
+        except ClientError:
+            return None
+        checksum = head.get('ChecksumSHA256')
+        # Для составных загрузок хранилище возвращает checksum от checksum частей ("...-N") - он не подходит
+        if not checksum or '-' in checksum:
+            return None
+        try:
+            return base64.b64decode(checksum).hex()
+        except binascii.Error:
+            return None
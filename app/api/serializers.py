@@ -1,38 +1,92 @@
+import copy
+import os
+
 import markdown
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count
 from rest_framework import serializers
 from rest_framework.generics import get_object_or_404
 
+from .exceptions import DuplicateSubmissionError, is_constraint_violation
 from .models import Profile, Task, Submission, SubmissionHistory, ProfileFile, TaskSubmission, TaskProfile
+from .blobs import create_profile_file, delete_profile_files
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 
 User = get_user_model()
 
 
-class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Исключает поля из exclude_fields. Набор полей строится (с разбором модели) один раз
+    на пару (класс сериализатора, исключенные поля), каждый экземпляр получает копии нужных ему полей.
+
+    only_fields (?fields=) оставляет только перечисленные поля из selectable_fields,
+    include_fields (?include=) возвращает исключенные представлением связи из expandable_fields.
+    Ключ кеша не зависит от параметров запроса (include_fields лишь сужает заданные представлением
+    exclude_fields), поэтому число записей ограничено набором представлений.
+    """
+    _fields_cache = {}
+    selectable_fields = ()
+    expandable_fields = ()
+
     def __init__(self, *args, **kwargs):
         # Поля для включения/исключения
         exclude_fields = kwargs.pop('exclude_fields', None)
+        only_fields = kwargs.pop('only_fields', None)
+        include_fields = kwargs.pop('include_fields', None)
+        self._exclude_fields = frozenset(exclude_fields or ())
+        self._only_fields = None if only_fields is None else frozenset(only_fields)
+        self._include_fields = frozenset(include_fields or ())
+
+        errors = {}
+        unknown_fields = sorted((self._only_fields or frozenset()) - set(self.selectable_fields))
+        if unknown_fields:
+            errors['fields'] = [f"Field '{name}' cannot be selected" for name in unknown_fields]
+        unknown_includes = sorted(self._include_fields - set(self.expandable_fields))
+        if unknown_includes:
+            errors['include'] = [f"Relation '{name}' cannot be included" for name in unknown_includes]
+        if errors:
+            raise ValidationError(errors)
+
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        exclude_fields = self._exclude_fields - self._include_fields
+        key = (type(self), exclude_fields)
+        fields = self._fields_cache.get(key)
+        if fields is None:
+            fields = super().get_fields()
+            # Если указаны exclude_fields, то удаляем эти поля
+            for field_name in exclude_fields:
+                fields.pop(field_name, None)
+            self._fields_cache[key] = fields
 
-        super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
+        if self._only_fields is not None:
+            # Поля только для записи не выводятся, поэтому их не трогаем
+            fields = {name: field for name, field in fields.items()
+                      if field.write_only or name in self._only_fields or name in self._include_fields}
+        # Поля привязываются к конкретному сериализатору, поэтому в кеше лежат непривязанные оригиналы,
+        # а копируются только выбранные
+        return {name: copy.deepcopy(field) for name, field in fields.items()}
 
-        # Если указаны exclude_fields, то удаляем эти поля
-        if exclude_fields is not None:
-            for field_name in exclude_fields:
-                self.fields.pop(field_name, None)
+
+class DynamicFieldsModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    pass
 
 
 class ProfileFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProfileFile
-        fields = ('file',)
+        fields = ('file', 'name', 'size', 'checksum')
+        read_only_fields = ('name', 'size', 'checksum')
 
 
 class SubmissionHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = SubmissionHistory
-        fields = ['id', 'changed_at', 'previous_comment', 'previous_admin_comment', 'previous_status']
+        fields = ['id', 'changed_at', 'changed_fields', 'previous_comment', 'previous_admin_comment', 'previous_status']
         read_only_fields = ['id']
 
 
@@ -45,6 +99,23 @@ class SubmissionSerializer(DynamicFieldsModelSerializer):
         read_only_fields = ['id']
 
 
+class SubmissionLatestHistorySerializer(SubmissionSerializer):
+    change_history = serializers.SerializerMethodField(method_name='get_latest_change_history')
+    change_history_count = serializers.IntegerField(read_only=True)
+    # Последние K записей выбирает сериализатор, из запроса нужно только общее количество
+    planner_hints = {
+        'change_history': {},
+        'change_history_count': {'annotate': {'change_history_count': Count('change_history', distinct=True)}},
+    }
+
+    class Meta(SubmissionSerializer.Meta):
+        fields = SubmissionSerializer.Meta.fields + ('change_history_count',)
+
+    def get_latest_change_history(self, obj):
+        latest_history = obj.change_history.order_by('-changed_at')[:self.context['history_limit']]
+        return SubmissionHistorySerializer(latest_history, many=True).data
+
+
 class SubmissionAdminUpdateSerializer(DynamicFieldsModelSerializer):
     status = serializers.CharField(required=True)
     admin_comment = serializers.CharField(required=True)
@@ -55,11 +126,50 @@ class SubmissionAdminUpdateSerializer(DynamicFieldsModelSerializer):
         read_only_fields = ['id']
 
 
+class SubmissionReviewListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        submission_ids = [review['id'] for review in attrs]
+        if len(submission_ids) != len(set(submission_ids)):
+            raise ValidationError("Each submission can be reviewed only once per request")
+        return attrs
+
+
+class SubmissionReviewSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Submission.Status.choices)
+    admin_comment = serializers.CharField()
+
+    class Meta:
+        fields = ('id', 'status', 'admin_comment')
+        list_serializer_class = SubmissionReviewListSerializer
+
+
+class SubmissionClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    class Meta:
+        fields = ('count',)
+
+
+class SubmissionReleaseSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=100)
+
+    class Meta:
+        fields = ('ids',)
+
+
+class ClaimedSubmissionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Submission
+        fields = ('id', 'task_id', 'user_id', 'status', 'comment', 'admin_comment', 'lease_expires_at')
+        read_only_fields = fields
+
+
 class FilteredSubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         read_only_fields = ['id']
-        exclude = ['change_history', 'task_id', 'comment', 'admin_comment']
+        exclude = ['task_id', 'comment', 'admin_comment', 'reviewer', 'lease_expires_at', 'created_at']
 
 
 class GroupedSubmissionSerializer(serializers.Serializer):
@@ -79,6 +189,16 @@ class ProfileSerializer(DynamicFieldsModelSerializer):
     )
     description_ru_html = serializers.SerializerMethodField(method_name='get_description_ru_html')
     description_en_html = serializers.SerializerMethodField(method_name='get_description_en_html')
+    selectable_fields = ('id', 'description_ru', 'description_en', 'description_ru_html', 'description_en_html',
+                         'tasks_count')
+    # files не раскрывается: списки и карточки профилей читаются без проверки участия в профиле,
+    # а файлы отдаются только участникам через ProfileFileDownloadView и ProfileFileLinkView
+    expandable_fields = ('tasks',)
+    planner_hints = {
+        'tasks_count': {'annotate': {'tasks_count': Count('tasks', distinct=True)}},
+        'description_ru_html': {'only': ('description_ru',)},
+        'description_en_html': {'only': ('description_en',)},
+    }
 
     class Meta:
         model = Profile
@@ -87,7 +207,9 @@ class ProfileSerializer(DynamicFieldsModelSerializer):
         read_only_fields = ['id']
 
     def get_count_tasks(self, obj):
-        return obj.tasks.count()
+        # Количество уже посчитано в запросе, если его строил планировщик
+        tasks_count = getattr(obj, 'tasks_count', None)
+        return obj.tasks.count() if tasks_count is None else tasks_count
 
     def get_description_ru_html(self, obj):
         return markdown.markdown(obj.description_ru)
@@ -106,32 +228,69 @@ class ProfileSerializer(DynamicFieldsModelSerializer):
     def update(self, instance, validated_data):
         uploaded_files = validated_data.pop('uploaded_files', [])
 
-        if uploaded_files:
-            for profile_file in instance.files.all():
-                profile_file.file.delete()  # Удаляет сам файл
-                profile_file.delete()
-
-        if len(uploaded_files) + instance.files.count() > settings.PROFILE_MAX_NUMBER_FILES:
-            raise ValidationError(
-                {"detail": f"Total number of files exceeded, maximum is {settings.PROFILE_MAX_NUMBER_FILES}"})
+        with transaction.atomic():
+            if uploaded_files:
+                # Новые файлы заменяют старые, поэтому в лимит считаются только они
+                if len(uploaded_files) > settings.PROFILE_MAX_NUMBER_FILES:
+                    raise ValidationError(
+                        {"detail": f"Total number of files exceeded, maximum is {settings.PROFILE_MAX_NUMBER_FILES}"})
+                # Строки удаляются одним запросом, содержимое - в фоне после коммита
+                delete_profile_files(instance.files.all())
 
-        self._handle_file_upload(instance, uploaded_files)
+            self._handle_file_upload(instance, uploaded_files)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
 
         return instance
 
     def _handle_file_upload(self, profile, uploaded_files):
         for file in uploaded_files:
             if file.size <= settings.PROFILE_MAX_FILE_SIZE:
-                ProfileFile.objects.create(profile=profile, file=file)
+                create_profile_file(profile, file)
             else:
                 raise ValidationError({
                     "detail": f"File '{file.name}' size exceeded, maximum size {settings.PROFILE_MAX_FILE_SIZE / (1024 * 1024)} MB"})
 
 
+class ResumableUploadCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    length = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        fields = ('filename', 'length',)
+
+    def validate_filename(self, value):
+        # Имя файла используется в пути хранилища, поэтому каталоги отбрасываются
+        filename = os.path.basename(value.replace('\\', '/'))
+        if not filename or filename in ('.', '..'):
+            raise ValidationError("Invalid file name")
+        return filename
+
+    def validate_length(self, value):
+        if value > settings.PROFILE_MAX_FILE_SIZE:
+            raise ValidationError(f"File size exceeded, maximum size {settings.PROFILE_MAX_FILE_SIZE} bytes")
+        return value
+
+
+class PresignedUploadCreateSerializer(ResumableUploadCreateSerializer):
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', help_text="SHA-256 содержимого в hex")
+
+    class Meta:
+        fields = ('filename', 'length', 'checksum')
+
+    def validate_checksum(self, value):
+        return value.lower()
+
+
+class PresignedUploadCompleteSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+    class Meta:
+        fields = ('token',)
+
+
 class TaskSerializer(DynamicFieldsModelSerializer):
     task_exclude_fields = ['id', 'task_id', 'description_ru', 'description_en', 'description_ru_html',
                            'description_en_html', 'description_ru_html', 'description_en_html', 'tasks', 'tasks_count']
@@ -139,9 +298,19 @@ class TaskSerializer(DynamicFieldsModelSerializer):
     description_ru_html = serializers.SerializerMethodField(method_name='get_description_ru_html')
     description_en_html = serializers.SerializerMethodField(method_name='get_description_en_html')
     submissions_count = serializers.SerializerMethodField(method_name='get_count_submissions')
+    selectable_fields = ('id', 'profile_id', 'title_ru', 'title_en', 'description_ru', 'description_en',
+                         'description_ru_html', 'description_en_html', 'status', 'type', 'submissions_count')
+    expandable_fields = ('profile',)
+    planner_hints = {
+        'submissions_count': {'annotate': {'submissions_count': Count('submissions', distinct=True)}},
+        'description_ru_html': {'only': ('description_ru',)},
+        'description_en_html': {'only': ('description_en',)},
+    }
 
     def get_count_submissions(self, obj):
-        return obj.submissions.count()
+        # Количество уже посчитано в запросе, если его строил планировщик или фильтр по количеству ответов
+        submissions_count = getattr(obj, 'submissions_count', None)
+        return obj.submissions.count() if submissions_count is None else submissions_count
 
     def get_description_ru_html(self, obj):
         return markdown.markdown(obj.description_ru)
@@ -155,19 +324,43 @@ class TaskSerializer(DynamicFieldsModelSerializer):
                   'description_en_html', 'status', 'type', 'submissions_count', 'profile')
         read_only_fields = ['id']
 
+    @transaction.atomic
     def create(self, validated_data):
         task = Task.objects.create(**validated_data)
 
-        task_profile = TaskProfile.objects.create(
+        TaskProfile.objects.create(
             profile=validated_data.get('profile_id'),
             task=task
         )
 
-        task_profile.save()
-
         return task
 
 
+class TaskImportListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        profile_ids = {task['profile_id'] for task in attrs}
+        existing_profile_ids = set(Profile.objects.filter(id__in=profile_ids).values_list('id', flat=True))
+        missing_profile_ids = profile_ids - existing_profile_ids
+        if missing_profile_ids:
+            raise ValidationError(
+                {"profile_id": [f"Profile {profile_id} not found" for profile_id in sorted(map(str, missing_profile_ids))]})
+        return attrs
+
+
+class TaskImportSerializer(serializers.Serializer):
+    profile_id = serializers.UUIDField()
+    title_ru = serializers.CharField(max_length=180)
+    title_en = serializers.CharField(max_length=180)
+    description_ru = serializers.CharField()
+    description_en = serializers.CharField()
+    status = serializers.ChoiceField(choices=Task.Status.choices, default=Task.Status.AVAILABLE)
+    type = serializers.ChoiceField(choices=Task.Type.choices, default=Task.Type.FREE)
+
+    class Meta:
+        fields = ('profile_id', 'title_ru', 'title_en', 'description_ru', 'description_en', 'status', 'type')
+        list_serializer_class = TaskImportListSerializer
+
+
 class ProfileChangeSerializer(serializers.Serializer):
     profile_id = serializers.UUIDField()
     user_id = serializers.UUIDField()
@@ -183,6 +376,56 @@ class ProfileChangeSerializer(serializers.Serializer):
         return data
 
 
+class ProfilePairSerializer(serializers.Serializer):
+    user_id = serializers.UUIDField()
+    profile_id = serializers.UUIDField()
+
+
+class ProfileBulkChangeSerializer(serializers.Serializer):
+    max_pairs = 10000
+
+    pairs = ProfilePairSerializer(many=True, required=False, allow_empty=False)
+    user_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    profile_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+
+    class Meta:
+        fields = ('pairs', 'user_ids', 'profile_ids',)
+
+    def validate(self, data):
+        # Либо явный список пар, либо декартово произведение user_ids x profile_ids
+        if 'pairs' in data:
+            if 'user_ids' in data or 'profile_ids' in data:
+                raise ValidationError("Pass either pairs or user_ids with profile_ids, not both")
+            pairs = {(pair['user_id'], pair['profile_id']) for pair in data['pairs']}
+        elif 'user_ids' in data and 'profile_ids' in data:
+            user_ids, profile_ids = set(data['user_ids']), set(data['profile_ids'])
+            if len(user_ids) * len(profile_ids) > self.max_pairs:
+                raise ValidationError(f"No more than {self.max_pairs} pairs per request")
+            pairs = {(user_id, profile_id) for user_id in user_ids for profile_id in profile_ids}
+        else:
+            raise ValidationError("Pass pairs or both user_ids and profile_ids")
+
+        if len(pairs) > self.max_pairs:
+            raise ValidationError(f"No more than {self.max_pairs} pairs per request")
+
+        user_ids = {user_id for user_id, _ in pairs}
+        profile_ids = {profile_id for _, profile_id in pairs}
+        errors = {}
+        missing_user_ids = user_ids - set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        if missing_user_ids:
+            errors['user_ids'] = [f"User {user_id} not found" for user_id in sorted(map(str, missing_user_ids))]
+        missing_profile_ids = profile_ids - set(Profile.objects.filter(id__in=profile_ids).values_list('id', flat=True))
+        if missing_profile_ids:
+            errors['profile_ids'] = [f"Profile {profile_id} not found" for profile_id in sorted(map(str, missing_profile_ids))]
+        if errors:
+            raise ValidationError(errors)
+
+        data['pairs'] = sorted(pairs)
+        data['user_ids'] = user_ids
+        data['profile_ids'] = profile_ids
+        return data
+
+
 class SubmissionCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
@@ -193,35 +436,38 @@ class SubmissionCreateUpdateSerializer(serializers.ModelSerializer):
         user = self.context['user']
         task = self.context['task']
 
-        # Создание объекта Submission с извлеченными и валидированными данными
-        submission = Submission.objects.create(
-            user_id=user,
-            task_id=task,
-            comment=validated_data['comment'],
-            status=Submission.Status.WAITING
-        )
-
-        task_submission = TaskSubmission.objects.create(
-            task=task,
-            submission=submission
-        )
-        task_submission.save()
+        # Повторный ответ отсекается уникальным ограничением (user_id, task_id) прямо при INSERT,
+        # без предварительной проверки exists() и гонки между ней и вставкой
+        try:
+            with transaction.atomic():
+                submission = Submission.objects.create(
+                    user_id=user,
+                    task_id=task,
+                    comment=validated_data['comment'],
+                    status=Submission.Status.WAITING
+                )
+                TaskSubmission.objects.create(
+                    task=task,
+                    submission=submission
+                )
+        except IntegrityError as exc:
+            if not is_constraint_violation(exc, 'unique_submission_user_task'):
+                raise
+            raise DuplicateSubmissionError()
 
         return submission
 
     def update(self, instance, validated_data):
-        submission_history = SubmissionHistory.objects.create(
-            submission=instance,
-            previous_comment=instance.comment,
-            previous_admin_comment=instance.admin_comment,
-            previous_status=instance.status
-        )
-        submission_history.save()
+        # История пишется одним INSERT по FK и только если что-то действительно изменилось
+        submission_history = SubmissionHistory.from_changes(instance, validated_data)
+        if submission_history is None:
+            return instance
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        with transaction.atomic():
+            submission_history.save(force_insert=True)
 
-        instance.change_history.add(submission_history)
-        instance.save()
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=list(validated_data))
 
         return instance
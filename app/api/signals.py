@@ -2,32 +2,49 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
 
-from api.models import Profile, Task
+from api.background import run_in_background
+from api.blobs import cleanup_files
+from api.models import Profile, ProfileFile, Task
+
+LANGS = ('ru', 'en')
+
+
+def delete_cache_patterns(*patterns):
+    for pattern in patterns:
+        keys = cache.keys(pattern)
+        cache.delete_many(keys)
+
+
+def invalidate_profile_list_cache():
+    for lang in LANGS:
+        delete_cache_patterns(f'profiles_list_{lang}_page_*', f"admin_profiles_list_{lang}_page_*")
+
+
+def invalidate_task_list_cache():
+    for lang in LANGS:
+        delete_cache_patterns(f'tasks_list_{lang}_page_*', f'admin_tasks_list_{lang}_page_*')
 
 
 # Сигналы для инвалидации кеша
 @receiver(post_save, sender=Profile)
 @receiver(post_delete, sender=Profile)
 def invalidate_profile_cache(sender, instance, **kwargs):
-
-    for lang in ['ru', 'en']:
-        cache_key = f"profile_{lang}_{instance.id}"
-        cache.delete(cache_key)
-        patterns = (f'profiles_list_{lang}_page_*', f"admin_profiles_list_{lang}_page_*")
-        for pattern in patterns:
-            keys = cache.keys(pattern)
-            cache.delete_many(keys)
+    cache.delete_many([f"profile_{lang}_{instance.id}" for lang in LANGS])
+    invalidate_profile_list_cache()
 
 # Сигналы для инвалидации кеша
 @receiver(post_save, sender=Task)
 @receiver(post_delete, sender=Task)
 def invalidate_task_cache(sender, instance, **kwargs):
+    cache.delete_many([f"task_{lang}_{instance.id}" for lang in LANGS])
+    invalidate_task_list_cache()
 
-    for lang in ['ru', 'en']:
-        cache_key = f"task_{lang}_{instance.id}"
-        cache.delete(cache_key)
-        patterns = (f'tasks_list_{lang}_page_*', f'admin_tasks_list_{lang}_page_*')
-        for pattern in patterns:
-            keys = cache.keys(pattern)
-            cache.delete_many(keys)
 
+# Содержимое файла удаляется, когда на него не остается ссылок
+@receiver(post_delete, sender=ProfileFile)
+def collect_profile_file_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        run_in_background(cleanup_files, [instance.blob_id])
+    elif instance.file:
+        # Файл, загруженный до дедупликации, принадлежит только этой строке
+        run_in_background(cleanup_files, [], [instance.file.name])
@@ -0,0 +1,189 @@
+import json
+
+from django.contrib.postgres.aggregates.mixins import OrderableAggMixin
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Aggregate, F, Func, JSONField, OrderBy, TextField, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.settings import api_settings
+
+from api.planner import get_serializer_fields
+
+
+class JSONBuildObject(Func):
+    """json_build_object, а не jsonb_build_object: jsonb переставляет ключи, а порядок должен совпадать с DRF"""
+    function = 'JSON_BUILD_OBJECT'
+    output_field = JSONField()
+
+
+class JSONAgg(OrderableAggMixin, Aggregate):
+    function = 'JSON_AGG'
+    template = '%(function)s(%(expressions)s %(ordering)s)'
+    output_field = JSONField()
+
+
+class FirstInGroup(OrderableAggMixin, Aggregate):
+    """Значение выражения у первой строки группы в порядке ordering"""
+    function = 'ARRAY_AGG'
+    template = '(%(function)s(%(expressions)s %(ordering)s))[1]'
+
+
+class ISODateTime(Func):
+    """timestamptz в формате DateTimeField DRF при TIME_ZONE = UTC: микросекунды только если они не нулевые"""
+    template = (r"""REGEXP_REPLACE(TO_CHAR(%(expressions)s AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US'), """
+                r"""'\.000000$', '') || 'Z'""")
+    output_field = TextField()
+
+
+def _field_expression(field, model_field):
+    """SQL-выражение со значением поля в том же виде, что и field.to_representation, или None"""
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return F(field.source) if field.pk_field is None and model_field.many_to_one else None
+    if model_field.is_relation:
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        return F(field.source) if all(isinstance(key, str) for key in field.choices) else None
+    if isinstance(field, serializers.UUIDField):
+        return F(field.source) if field.uuid_format == 'hex_verbose' else None
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601 or timezone.get_current_timezone_name() != 'UTC':
+            return None
+        return ISODateTime(F(field.source))
+    if isinstance(field, (serializers.CharField, serializers.BooleanField, serializers.JSONField)) \
+            or type(field) is serializers.IntegerField:
+        return F(field.source)
+    return None
+
+
+class SQLJSONSerializer:
+    """
+    Движок ?engine=sql: JSON каждой строки собирает Postgres через json_build_object, а Python только
+    склеивает готовый текст. Поля-методы с подсказкой планировщика, где аннотация названа так же, как поле,
+    берутся из аннотации. Остальные поля-методы (например, HTML из markdown) Postgres посчитать не может:
+    они вычисляются в Python по колонкам из подсказки и вставляются в текст строки на свое место.
+    """
+
+    def __init__(self, parts, annotations):
+        # parts: ('sql', алиас, [(имя, выражение), ...]) или ('python', имя, метод, колонки)
+        self.parts = parts
+        self.annotations = annotations
+
+    @classmethod
+    def compile(cls, serializer):
+        """Возвращает SQL-сериализатор или None, если какое-то поле нельзя вывести из одной строки"""
+        serializer = getattr(serializer, 'child', serializer)
+        model = serializer.Meta.model
+        hints = getattr(serializer, 'planner_hints', {})
+        parts = []
+        annotations = {}
+
+        for name, field in get_serializer_fields(serializer).items():
+            if name in hints:
+                if not isinstance(field, serializers.SerializerMethodField):
+                    return None
+                hint_annotations = hints[name].get('annotate', {})
+                if name in hint_annotations:
+                    annotations[name] = hint_annotations[name]
+                    expression = F(name)
+                else:
+                    parts.append(('python', name, getattr(serializer, field.method_name), hints[name].get('only', ())))
+                    continue
+            else:
+                if isinstance(field, serializers.BaseSerializer) or field.source == '*' or '.' in field.source:
+                    return None
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    return None
+                expression = _field_expression(field, model_field)
+                if expression is None:
+                    return None
+
+            if not parts or parts[-1][0] != 'sql':
+                parts.append(('sql', f'sql_json_{len(parts)}', []))
+            parts[-1][2].append((name, expression))
+
+        return cls(parts, annotations)
+
+    def build_object(self):
+        """Выражение с JSON всей строки; годится для json_agg, если все поля считаются в SQL"""
+        if any(part[0] != 'sql' for part in self.parts):
+            return None
+        pairs = [item for part in self.parts for name, expression in part[2] for item in (Value(name), expression)]
+        return JSONBuildObject(*pairs)
+
+    def rows(self, queryset):
+        annotations = {name: expression for name, expression in self.annotations.items()
+                       if name not in queryset.query.annotations}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        columns = []
+        json_parts = {}
+        for part in self.parts:
+            if part[0] == 'sql':
+                pairs = [item for name, expression in part[2] for item in (Value(name), expression)]
+                json_parts[part[1]] = Cast(JSONBuildObject(*pairs), TextField())
+                columns.append(part[1])
+            else:
+                columns.extend(column for column in part[3] if column not in columns)
+        return queryset.prefetch_related(None).annotate(**json_parts).values_list(*columns, named=True)
+
+    def render(self, row):
+        if len(self.parts) == 1 and self.parts[0][0] == 'sql':
+            return getattr(row, self.parts[0][1])
+        items = []
+        for part in self.parts:
+            if part[0] == 'sql':
+                items.append(getattr(row, part[1])[1:-1])
+            else:
+                items.append(f'{json.dumps(part[1])} : {json.dumps(part[2](row), ensure_ascii=False)}')
+        return '{' + ', '.join(items) + '}'
+
+
+class GroupedSQLJSONSerializer:
+    """Строки, сгруппированные по полю: {"<поле>": ..., "<список>": [...]} с json_agg по группе"""
+
+    def __init__(self, child, group_field, list_field):
+        self.child = child
+        self.group_field = group_field
+        self.list_field = list_field
+
+    @classmethod
+    def compile(cls, child_serializer, group_field, list_field):
+        child = SQLJSONSerializer.compile(child_serializer)
+        if child is None or child.build_object() is None or child.annotations:
+            return None
+        return cls(child, group_field, list_field)
+
+    @staticmethod
+    def _ordering_term(term):
+        """(выражение, по убыванию) для элемента order_by: строки '-поле' или OrderBy"""
+        if isinstance(term, str):
+            return F(term.lstrip('-')), term.startswith('-')
+        if isinstance(term, OrderBy):
+            return term.expression, term.descending
+        return term, False
+
+    def rows(self, queryset):
+        # Порядок строк внутри группы берется из сортировки исходного queryset. Группы идут в порядке появления
+        # их первой строки, как при группировке в Python: сортируются по значениям сортировки первой строки
+        ordering = (*queryset.query.order_by, queryset.model._meta.pk.name)
+        first_row = {}
+        group_ordering = []
+        for i, term in enumerate(ordering):
+            expression, descending = self._ordering_term(term)
+            first_row[f'sql_group_order_{i}'] = FirstInGroup(expression, ordering=ordering)
+            group_ordering.append(OrderBy(F(f'sql_group_order_{i}'), descending=descending))
+        group_json = JSONBuildObject(
+            Value(self.group_field), F(self.group_field),
+            Value(self.list_field), JSONAgg(self.child.build_object(), ordering=ordering),
+        )
+        return queryset.prefetch_related(None).order_by().values(self.group_field) \
+            .annotate(sql_json=Cast(group_json, TextField()), **first_row).order_by(*group_ordering) \
+            .values_list('sql_json', named=True)
+
+    def render(self, row):
+        return row.sql_json
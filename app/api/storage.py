@@ -0,0 +1,31 @@
+from django.core.files.storage import storages
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+PROFILE_FILES_STORAGE_ALIAS = 'profile_files'
+
+
+class ProfileFilesStorage(LazyObject):
+    """Хранилище файлов профилей из STORAGES['profile_files']: локальный диск или S3-совместимое хранилище"""
+
+    def _setup(self):
+        self._wrapped = storages[PROFILE_FILES_STORAGE_ALIAS]
+
+
+profile_files_storage = ProfileFilesStorage()
+
+
+def get_profile_files_storage():
+    return profile_files_storage
+
+
+def supports_presigned_upload(storage=profile_files_storage):
+    """Умеет ли хранилище принимать файлы напрямую от клиента по подписанной ссылке"""
+    return hasattr(storage, 'presigned_put_url')
+
+
+@receiver(setting_changed)
+def reset_profile_files_storage(setting, **kwargs):
+    if setting == 'STORAGES':
+        profile_files_storage._wrapped = empty
@@ -0,0 +1,22 @@
+import json
+
+ROWS_PER_CHUNK = 100
+
+
+def stream_json_list(rows, render, envelope=None):
+    """Текст JSON-массива (или страницы пагинатора с массивом в results) частями по ROWS_PER_CHUNK строк"""
+    if envelope is None:
+        head, tail = '[', ']'
+    else:
+        placeholder = '__results__'
+        head, tail = json.dumps({**envelope, 'results': placeholder}, ensure_ascii=False).split(f'"{placeholder}"')
+        head, tail = head + '[', ']' + tail
+
+    chunk = [head]
+    for index, row in enumerate(rows):
+        chunk.append(',' + render(row) if index else render(row))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(tail)
+    yield ''.join(chunk)
@@ -1,13 +1,51 @@
+import datetime
+import gzip
+import importlib.util
+import io
+import json
+import shutil
+import tempfile
 import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework import status
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from api.blobs import create_profile_file
+from api.compression import choose_encoding
+from api.downloads import make_download_token
 from api.exceptions import DuplicateSubmissionError
-from api.models import Profile, Task, Submission, TaskProfile, UserProfile, TaskSubmission
+from api.fast import FastListSerializer
+from api.parsers import MessagePackParser, ORJSONParser
+from api.planner import plan_queryset
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.replicas import ReplicaRouter, ReplicaRoutingMiddleware
+from api import views
+from api.urls import read_view
+from api.views import ProfilesListView
+from api.models import Profile, ProfileFile, Task, Submission, SubmissionHistory, TaskProfile, UserProfile, \
+    TaskSubmission
+from api.serializers import ProfileSerializer, SubmissionCreateUpdateSerializer, TaskSerializer
+from admin_api.views import AdminUsersListView
+from users.models import UserActionLog
+from users.serializers import UserSerializer
 from django.core.cache import cache
 
 User = get_user_model()
@@ -232,7 +270,7 @@ class TasksListViewTest(APITestCase):
 
     def test_prefetch_related(self):
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(5):  # 1 for tasks, 1 for related submissions
+        with self.assertNumQueries(4):  # submissions count is annotated in the tasks query
             response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
@@ -241,7 +279,7 @@ class TasksListViewTest(APITestCase):
         cache.clear()
 
         # First request should hit the database
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             response1 = self.client.get(self.url)
 
         # Second request should use cache
@@ -402,6 +440,30 @@ class SubmissionCreateUpdateRetrieveViewTest(APITestCase):
         self.submission.refresh_from_db()
         self.assertEqual(self.submission.comment, 'Updated comment')
 
+    def test_update_submission_writes_history(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.put(self.url, {'comment': 'Updated comment'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        history = SubmissionHistory.objects.get(submission=self.submission)
+        self.assertEqual(history.changed_fields, ['comment'])
+        self.assertEqual(history.previous_comment, 'Initial comment')
+        self.assertEqual(history.previous_status, Submission.Status.WAITING)
+
+    def test_update_submission_without_changes_skips_history(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.put(self.url, {'comment': 'Initial comment'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(SubmissionHistory.objects.filter(submission=self.submission).exists())
+
+    @override_settings(SUBMISSION_HISTORY_CHANGED_FIELDS_ONLY=True)
+    def test_update_submission_history_changed_fields_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.put(self.url, {'comment': 'Updated comment'})
+        history = SubmissionHistory.objects.get(submission=self.submission)
+        self.assertEqual(history.previous_comment, 'Initial comment')
+        self.assertIsNone(history.previous_status)
+        self.assertIsNone(history.previous_admin_comment)
+
     def test_partial_update_submission(self):
         self.client.force_authenticate(user=self.user)
         data = {'comment': 'Partially updated comment'}
@@ -417,6 +479,23 @@ class SubmissionCreateUpdateRetrieveViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertRaises(DuplicateSubmissionError)
 
+    def test_duplicate_submission_not_created(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.url, {'comment': 'Duplicate submission'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Submission.objects.filter(task_id=self.task, user_id=self.user).count(), 1)
+        self.assertEqual(TaskSubmission.objects.filter(task=self.task).count(), 1)
+
+    def test_unique_submission_constraint(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Submission.objects.create(task_id=self.task, user_id=self.user, comment='Second submission')
+
+    def test_other_integrity_errors_not_reported_as_duplicate(self):
+        new_task = Task.objects.create(title_ru='Новая задача', title_en='New Task', profile_id=self.profile)
+        serializer = SubmissionCreateUpdateSerializer(context={'user': self.user, 'task': new_task})
+        with self.assertRaises(IntegrityError):
+            serializer.create({'comment': None})
+
     def test_retrieve_nonexistent_submission(self):
         self.client.force_authenticate(user=self.user)
         url = reverse('submission-detail', kwargs={'taskId': uuid.uuid4(), 'lang': 'ru'})
@@ -472,3 +551,784 @@ class SubmissionCreateUpdateRetrieveViewTest(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(f"{self.url}?ordering=-status")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(FILE_DOWNLOAD_BACKEND='django', FILE_DOWNLOAD_URL_TTL=300)
+class ProfileFileDownloadViewTest(APITestCase):
+    content = b'0123456789' * 100
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        self.other_user = User.objects.create_user('otheruser', 'other@example.com', 'otherpass')
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.profile = Profile.objects.create(description_ru='Тестовый профиль', description_en='Test profile')
+        UserProfile.objects.create(user=self.user, profile=self.profile)
+        self.profile_file = create_profile_file(self.profile, SimpleUploadedFile('report.txt', self.content))
+        kwargs = {'lang': 'ru', 'profileId': self.profile.id, 'fileId': self.profile_file.id}
+        self.url = reverse('profile-file-download', kwargs=kwargs)
+        self.link_url = reverse('profile-file-link', kwargs=kwargs)
+
+    def test_member_downloads_file(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.profile_file.checksum}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('report.txt', response['Content-Disposition'])
+
+    def test_non_member_forbidden(self):
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_anonymous_unauthorized(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_admin_downloads_file(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_superuser_without_staff_flag_downloads_file(self):
+        superuser = User.objects.create_user('root', 'root@example.com', 'rootpass', is_superuser=True)
+        self.client.force_authenticate(user=superuser)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.link_url).status_code, status.HTTP_200_OK)
+
+    def test_file_of_other_profile_not_found(self):
+        other_profile = Profile.objects.create(description_ru='Другой профиль', description_en='Other profile')
+        UserProfile.objects.create(user=self.other_user, profile=other_profile)
+        self.client.force_authenticate(user=self.other_user)
+        url = reverse('profile-file-download',
+                      kwargs={'lang': 'ru', 'profileId': other_profile.id, 'fileId': self.profile_file.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_range_request(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range_mismatch_returns_full_file(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_if_none_match_not_modified(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.profile_file.checksum}"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='nginx', FILE_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_nginx_backend(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.profile_file.file.name}')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='sendfile')
+    def test_sendfile_backend(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.profile_file.file.path)
+
+    def test_web_server_backends_redirect_to_storage_without_local_path(self):
+        storage = self.profile_file.file.storage
+        self.client.force_authenticate(user=self.user)
+        for backend in ('nginx', 'sendfile'):
+            with self.subTest(backend=backend), self.settings(FILE_DOWNLOAD_BACKEND=backend), \
+                    mock.patch.object(storage, 'path', side_effect=NotImplementedError), \
+                    mock.patch.object(storage, 'url', return_value='https://s3.example.com/signed'):
+                response = self.client.get(self.url)
+                self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+                self.assertEqual(response['Location'], 'https://s3.example.com/signed')
+                self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_signed_link(self):
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(self.link_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.link_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['expires_in'], 300)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(response.data['url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_signed_link_expired_or_tampered(self):
+        token = make_download_token(self.profile_file)
+        response = self.client.get(f'{self.url}?token={token}x')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch('django.core.signing.time.time', return_value=10 ** 10):
+            response = self.client.get(f'{self.url}?token={token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class QueryPlannerTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(description_ru='Профиль', description_en='Profile')
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        for i in range(3):
+            task = Task.objects.create(title_ru=f'Задача {i}', title_en=f'Task {i}', description_ru='Описание',
+                                       description_en='Description', profile_id=self.profile)
+            TaskProfile.objects.create(profile=self.profile, task=task)
+            submission = Submission.objects.create(task_id=task, user_id=self.user, comment='Ответ')
+            TaskSubmission.objects.create(task=task, submission=submission)
+
+    def test_excluded_language_columns_and_relations_not_loaded(self):
+        exclude_fields = ('files', 'tasks', 'description_en', 'description_en_html')
+        queryset = plan_queryset(Profile.objects.all(), ProfileSerializer(exclude_fields=exclude_fields))
+
+        self.assertEqual(queryset.query.deferred_loading, ({'id', 'description_ru'}, False))
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+        with self.assertNumQueries(1):
+            data = ProfileSerializer(queryset, many=True, exclude_fields=exclude_fields).data
+        self.assertEqual(data[0]['tasks_count'], 3)
+        self.assertNotIn('description_en', data[0])
+
+    def test_nested_relations_loaded_in_fixed_number_of_queries(self):
+        queryset = plan_queryset(Task.objects.all(), TaskSerializer())
+        # Задачи с профилем одним запросом и файлы профилей вторым, независимо от количества задач
+        with self.assertNumQueries(2):
+            data = TaskSerializer(queryset, many=True).data
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]['submissions_count'], 1)
+        self.assertEqual(data[0]['profile'], {'files': []})
+
+    def test_tasks_list_counts_submissions_without_prefetch(self):
+        serializer = TaskSerializer(exclude_fields=('profile', 'profile_id', 'title_en', 'description_en',
+                                                    'description_en_html'))
+        queryset = plan_queryset(Task.objects.all(), serializer)
+
+        self.assertEqual(queryset.query.select_related, False)
+        self.assertNotIn('description_en', queryset.query.deferred_loading[0])
+        self.assertIn('submissions_count', queryset.query.annotations)
+
+
+class DynamicFieldsSerializerTest(TestCase):
+    def test_fields_built_once_per_exclude_set(self):
+        ProfileSerializer._fields_cache.clear()
+        get_fields = serializers.ModelSerializer.get_fields
+        with mock.patch.object(serializers.ModelSerializer, 'get_fields', autospec=True,
+                               side_effect=get_fields) as mocked:
+            first = ProfileSerializer(exclude_fields=('files',))
+            second = ProfileSerializer(exclude_fields=['files'])
+            self.assertNotIn('files', first.fields)
+            self.assertIsNot(first.fields['tasks'], second.fields['tasks'])
+            self.assertIs(second.fields['tasks'].parent, second)
+            self.assertIn('files', ProfileSerializer().fields)
+        self.assertEqual(mocked.call_count, 2)
+
+    def test_field_selection_does_not_grow_cache(self):
+        ProfileSerializer._fields_cache.clear()
+        exclude_fields = ('tasks', 'files')
+        for only_fields in (['id'], ['id', 'description_ru'], ['description_en']):
+            serializer = ProfileSerializer(exclude_fields=exclude_fields, only_fields=only_fields)
+            # uploaded_files только для записи и остается всегда
+            self.assertEqual(set(serializer.fields), {*only_fields, 'uploaded_files'})
+        serializer = ProfileSerializer(exclude_fields=exclude_fields, only_fields=['id'], include_fields=['tasks'])
+        self.assertEqual(set(serializer.fields), {'id', 'tasks', 'uploaded_files'})
+        self.assertEqual(len(ProfileSerializer._fields_cache), 2)
+
+
+class FastListSerializerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        User.objects.create_user('noemail', '', 'testpass')
+        self.profile = Profile.objects.create(description_ru='# Профиль\n\n**жирный**', description_en='Profile')
+        Profile.objects.create(description_ru='', description_en='Пусто "кавычки" \\ <tag>')
+        UserProfile.objects.create(user=self.user, profile=self.profile)
+        for i, status_value in enumerate(Task.Status.values):
+            task = Task.objects.create(title_ru=f'Задача {i}', title_en=f'Task {i}', description_ru=f'*Описание* {i}',
+                                       description_en='Description', profile_id=self.profile, status=status_value)
+            TaskProfile.objects.create(profile=self.profile, task=task)
+            submission = Submission.objects.create(task_id=task, user_id=self.user, comment='Ответ')
+            TaskSubmission.objects.create(task=task, submission=submission)
+
+    def assertParity(self, queryset, serializer):
+        queryset = plan_queryset(queryset, serializer)
+        fast_serializer = FastListSerializer.compile(serializer)
+        self.assertIsNotNone(fast_serializer)
+
+        expected = JSONRenderer().render(type(serializer)(queryset, many=True, **serializer._kwargs).data)
+        actual = JSONRenderer().render(fast_serializer.to_representation(fast_serializer.values(queryset)))
+        self.assertEqual(actual, expected)
+
+    def test_profiles_list_parity(self):
+        for lang in ('ru', 'en'):
+            self.assertParity(Profile.objects.order_by('id'), ProfileSerializer(
+                exclude_fields=('files', 'tasks', f'description_{lang}', f'description_{lang}_html')))
+
+    def test_tasks_list_parity(self):
+        for lang in ('ru', 'en'):
+            self.assertParity(Task.objects.order_by('id'), TaskSerializer(exclude_fields=(
+                'profile', 'submissions', f'title_{lang}', f'description_{lang}', f'description_{lang}_html',
+                'profile_id')))
+
+    def test_users_list_parity(self):
+        self.assertParity(User.objects.order_by('id'), UserSerializer(exclude_fields=('profiles',)))
+
+    def test_nested_fields_not_supported(self):
+        self.assertIsNone(FastListSerializer.compile(ProfileSerializer()))
+        self.assertIsNone(FastListSerializer.compile(TaskSerializer()))
+
+    def test_endpoint_matches_regular_serializer(self):
+        self.client.force_login(self.user)
+        url = reverse('tasks', kwargs={'lang': 'en', 'profileId': self.profile.id})
+        cache.clear()
+        fast_response = self.client.get(url)
+        cache.clear()
+        with mock.patch('api.views.TasksListView.fast_list', False):
+            regular_response = self.client.get(url)
+        self.assertEqual(fast_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast_response.content, regular_response.content)
+
+
+class ORJSONRendererParserTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        self.profile = Profile.objects.create(description_ru='Профиль', description_en='Profile')
+        self.url = reverse('profiles', kwargs={'lang': 'ru'})
+
+    def test_render_native_types(self):
+        value = uuid.uuid4()
+        moment = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        data = {'id': value, 'at': moment, 'lazy': gettext_lazy('Профиль'), 'amount': Decimal('1.5'), 1: None}
+
+        rendered = json.loads(ORJSONRenderer().render(data))
+        self.assertEqual(rendered, {'id': str(value), 'at': '2024-05-01T12:30:15.123456Z', 'lazy': 'Профиль',
+                                    'amount': 1.5, '1': None})
+
+    def test_matches_drf_renderer(self):
+        data = {'text': 'Строка\u2028"кавычки"', 'items': [1, 2.5, True, None], 'nested': {'id': uuid.uuid4()}}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertNotIn(b'\xe2\x80\xa8', ORJSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_from_accept_header(self):
+        rendered = ORJSONRenderer().render({'a': 1}, accepted_media_type='application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+        rendered = ORJSONRenderer().render({'a': 1}, accepted_media_type='application/json; indent=4')
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+    def test_parse(self):
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"a": "б"}'.encode())), {'a': 'б'})
+        self.assertEqual(parser.parse(io.BytesIO('{"a": "é"}'.encode('latin-1')), parser_context={'encoding': 'latin-1'}),
+                         {'a': 'é'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": NaN}'))
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a":'))
+
+    def test_endpoint_uses_orjson(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.json()['results'][0]['id'], str(self.profile.id))
+
+    @skipUnless(importlib.util.find_spec('msgpack'), "msgpack is not installed")
+    def test_msgpack_negotiation(self):
+        import msgpack
+
+        self.client.force_authenticate(user=self.user)
+        json_data = self.client.get(self.url).json()
+        cache.clear()
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json_data)
+
+    @skipUnless(importlib.util.find_spec('msgpack'), "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        value = uuid.uuid4()
+        moment = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        packed = MessagePackRenderer().render({'id': value, 'at': moment, 'data': b'\x00'})
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(packed)),
+                         {'id': str(value), 'at': '2024-05-01T12:30:00Z', 'data': b'\x00'})
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(packed[:-3]))
+        with mock.patch('api.parsers.msgpack.unpackb', side_effect=TypeError("unhashable type: 'list'")), \
+                self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(packed))
+
+
+class FieldSelectionTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        self.profiles = [Profile.objects.create(description_ru=f'Профиль **{i}**', description_en=f'Profile {i}')
+                         for i in range(3)]
+        for profile in self.profiles:
+            ProfileFile.objects.create(profile=profile, name='readme.txt', size=10, checksum='a' * 64)
+        self.tasks = [Task.objects.create(title_ru=f'Задача {i}', title_en=f'Task {i}', description_ru='*Описание*',
+                                          profile_id=self.profiles[0]) for i in range(3)]
+        for task in self.tasks:
+            TaskProfile.objects.create(task=task, profile=self.profiles[0])
+        UserProfile.objects.create(user=self.user, profile=self.profiles[0])
+        self.profiles_url = reverse('profiles', kwargs={'lang': 'ru'})
+        self.tasks_url = reverse('tasks', kwargs={'lang': 'ru', 'profileId': self.profiles[0].id})
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_skip_computation_and_columns(self):
+        with mock.patch('api.serializers.markdown.markdown') as render_markdown:
+            response, queries = self.get(f'{self.profiles_url}?fields=id')
+        render_markdown.assert_not_called()
+        self.assertEqual([list(item) for item in response.data['results']], [['id']] * 3)
+        page_query = next(sql for sql in queries if 'LIMIT' in sql)
+        self.assertNotIn('description_ru', page_query)
+        self.assertNotIn('COUNT', page_query)
+
+    def test_fields_keep_requested_computed_fields(self):
+        response, _ = self.get(f'{self.tasks_url}?fields=title_ru, submissions_count,description_ru_html')
+        self.assertEqual(sorted(item['title_ru'] for item in response.data['results']), ['Задача 0', 'Задача 1', 'Задача 2'])
+        self.assertEqual(response.data['results'][0]['description_ru_html'], '<p><em>Описание</em></p>')
+        self.assertEqual(list(response.data['results'][0]), ['title_ru', 'description_ru_html', 'submissions_count'])
+
+    def test_include_prefetches_in_one_query(self):
+        response, queries = self.get(f'{self.profiles_url}?include=tasks&fields=id')
+        self.assertEqual(len(response.data['results']), 3)
+        for item in response.data['results']:
+            self.assertEqual(set(item), {'id', 'tasks'})
+        tasks = {item['id']: item['tasks'] for item in response.data['results']}
+        self.assertEqual(sorted(tasks[str(self.profiles[0].id)]), sorted(str(task.id) for task in self.tasks))
+        self.assertEqual(len([sql for sql in queries if 'api_taskprofile' in sql]), 1)
+
+    def test_include_files_not_allowed(self):
+        self.client.force_authenticate(user=None)
+        for url in (self.profiles_url, reverse('profile-detail', kwargs={'lang': 'ru', 'profileId': self.profiles[0].id})):
+            response = self.client.get(f'{url}?include=files')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('include', response.data)
+
+    def test_include_related_object_joined(self):
+        response, queries = self.get(f'{self.tasks_url}?include=profile')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIn('profile', response.data['results'][0])
+        # Профиль берется JOIN в запросе страницы; файлы профиля в списке задач не раскрываются
+        self.assertNotIn('files', response.data['results'][0]['profile'])
+        self.assertEqual(len([sql for sql in queries if 'api_profilefile' in sql]), 0)
+        self.assertEqual(len([sql for sql in queries if 'FROM "api_profile"' in sql]), 0)
+
+    def test_selection_not_allowed(self):
+        response = self.client.get(f'{self.profiles_url}?fields=id,uploaded_files')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+        response = self.client.get(f'{self.tasks_url}?include=submissions')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('include', response.data)
+
+    def test_cache_separated_by_selection(self):
+        full, _ = self.get(self.profiles_url)
+        sparse, _ = self.get(f'{self.profiles_url}?fields=id')
+        self.assertIn('description_ru_html', full.data['results'][0])
+        self.assertEqual(list(sparse.data['results'][0]), ['id'])
+        cached, queries = self.get(f'{self.profiles_url}?fields=id')
+        self.assertEqual(cached.data, sparse.data)
+
+    def test_detail_selection(self):
+        url = reverse('task-detail', kwargs={'lang': 'ru', 'taskId': self.tasks[0].id})
+        response, _ = self.get(f'{url}?fields=id,status')
+        self.assertEqual(response.data, {'id': str(self.tasks[0].id), 'status': self.tasks[0].status})
+        response, _ = self.get(url)
+        self.assertIn('title_ru', response.data)
+
+
+class StreamingListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        self.profiles = [Profile.objects.create(description_ru=f'Профиль {i}', description_en=f'Profile {i}')
+                         for i in range(25)]
+        self.url = reverse('profiles', kwargs={'lang': 'ru'})
+        self.client.force_authenticate(user=self.admin_user)
+
+    def expected(self):
+        exclude_fields = ('files', 'tasks', 'description_en', 'description_en_html')
+        queryset = plan_queryset(Profile.objects.order_by('id'), ProfileSerializer(exclude_fields=exclude_fields))
+        return json.loads(JSONRenderer().render(ProfileSerializer(queryset, many=True, exclude_fields=exclude_fields).data))
+
+    def test_stream_whole_list(self):
+        response = self.client.get(f'{self.url}?stream=1&ordering=id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected())
+
+    def test_stream_only_for_admins(self):
+        for user in (self.user, None):
+            self.client.force_authenticate(user=user)
+            response = self.client.get(f'{self.url}?stream=1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(response.streaming)
+            self.assertEqual(len(response.data['results']), 20)
+
+    def test_unpaginated_large_list_streams(self):
+        with mock.patch.object(ProfilesListView, 'pagination_class', None), \
+                mock.patch.object(ProfilesListView, 'stream_chunk_size', 10):
+            response = self.client.get(f'{self.url}?ordering=id')
+            self.assertTrue(response.streaming)
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected())
+        self.assertIsNone(cache.get('profiles_list_ru_page_1'))
+
+    def test_unpaginated_small_list_cached(self):
+        with mock.patch.object(ProfilesListView, 'pagination_class', None):
+            response = self.client.get(f'{self.url}?ordering=id')
+            self.assertFalse(response.streaming)
+            self.assertEqual(json.loads(response.content), self.expected())
+        self.assertIsNotNone(cache.get('profiles_list_ru_page_1'))
+
+    def test_rows_serialized_lazily(self):
+        represented = []
+        represent = FastListSerializer.represent
+
+        def counting_represent(serializer, row):
+            represented.append(row)
+            return represent(serializer, row)
+
+        with mock.patch.object(FastListSerializer, 'represent', counting_represent), \
+                mock.patch('api.streaming.ROWS_PER_CHUNK', 5):
+            response = self.client.get(f'{self.url}?stream=1')
+            chunks = iter(response.streaming_content)
+            next(chunks)
+            # Первая часть ответа готова, а остальные строки еще не прочитаны
+            self.assertLess(len(represented), len(self.profiles))
+            b''.join(chunks)
+        self.assertEqual(len(represented), len(self.profiles))
+
+    def test_stream_without_fast_serializer(self):
+        with mock.patch.object(ProfilesListView, 'fast_list', False):
+            response = self.client.get(f'{self.url}?stream=1&ordering=id')
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected())
+
+    @skipUnless(importlib.util.find_spec('msgpack'), "msgpack is not installed")
+    def test_non_json_renderer_not_streamed(self):
+        response = self.client.get(f'{self.url}?stream=1', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.streaming)
+
+
+class CompressedCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        for i in range(10):
+            Profile.objects.create(description_ru=f'# Профиль {i}\n\n' + 'Длинное **описание** профиля. ' * 20,
+                                   description_en='Profile')
+        self.url = reverse('profiles', kwargs={'lang': 'ru'})
+        self.client.force_authenticate(user=self.user)
+
+    def test_choose_encoding(self):
+        variants = {'identity': b'', 'gzip': b'', 'br': b''}
+        self.assertEqual(choose_encoding('gzip, deflate, br', variants), 'br')
+        self.assertEqual(choose_encoding('gzip;q=1.0, br;q=0.5', variants), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0, gzip;q=0', variants), 'identity')
+        self.assertEqual(choose_encoding('*', {'identity': b'', 'gzip': b''}), 'gzip')
+        self.assertEqual(choose_encoding(None, variants), 'identity')
+
+    def test_compressed_variants_served(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content) * 3, len(plain.content))
+        self.assertEqual(compressed.data, plain.json())
+
+    @skipUnless(importlib.util.find_spec('brotli'), "brotli is not installed")
+    def test_brotli_preferred(self):
+        import brotli
+
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_cache_hit_skips_rendering_and_compression(self):
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        with mock.patch('api.compression.gzip.compress') as compress, \
+                mock.patch.object(ORJSONRenderer, 'render') as render:
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        compress.assert_not_called()
+        render.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=10 ** 9)
+    def test_small_response_not_compressed(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class AsyncReadViewsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'testpass')
+        self.profile = Profile.objects.create(description_ru='Профиль **1**', description_en='Profile')
+        Profile.objects.create(description_ru='Профиль 2', description_en='Profile 2')
+        UserProfile.objects.create(user=self.user, profile=self.profile)
+        self.task = Task.objects.create(title_ru='Задача', title_en='Task', description_ru='Описание *1*',
+                                        profile_id=self.profile, status='AVAILABLE')
+        TaskProfile.objects.create(task=self.task, profile=self.profile)
+        Submission.objects.create(task_id=self.task, user_id=self.user, comment='Initial comment')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.endpoints = (
+            ('profiles', views.AsyncProfilesListView, {}),
+            ('profile-detail', views.AsyncProfileRetrieveView, {'profileId': self.profile.id}),
+            ('tasks', views.AsyncTasksListView, {'profileId': self.profile.id}),
+            ('task-detail', views.AsyncTaskRetrieveView, {'taskId': self.task.id}),
+            ('submission-detail', views.AsyncSubmissionCreateUpdateRetrieveView, {'taskId': self.task.id}),
+        )
+
+    def call(self, view_class, method='get', data=None, query='', headers=None, **kwargs):
+        factory = AsyncRequestFactory()
+        request = getattr(factory, method)(f'/{query}', data, content_type='application/json',
+                                           headers=self.headers if headers is None else headers)
+        response = async_to_sync(view_class.as_view())(request, lang='ru', **kwargs)
+        return response if response.streaming else response.render()
+
+    def test_views_are_async(self):
+        for _, view_class, _ in self.endpoints:
+            self.assertTrue(iscoroutinefunction(view_class.as_view()))
+
+    def test_same_data_as_sync_views(self):
+        for name, view_class, kwargs in self.endpoints:
+            expected = self.client.get(reverse(name, kwargs={'lang': 'ru', **kwargs}))
+            cache.clear()
+            response = self.call(view_class, **kwargs)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+            self.assertEqual(json.loads(response.content), expected.json(), name)
+        self.assertEqual(UserActionLog.objects.filter(user=self.user).count(), 2 * len(self.endpoints))
+
+    def test_cache_hit_skips_database(self):
+        first = self.call(views.AsyncProfilesListView)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.call(views.AsyncProfilesListView)
+        self.assertEqual(second.content, first.content)
+        self.assertFalse([query for query in queries if 'api_profile' in query['sql']])
+
+    def test_field_selection_and_stream(self):
+        response = self.call(views.AsyncProfileRetrieveView, query='?fields=id', profileId=self.profile.id)
+        self.assertEqual(json.loads(response.content), {'id': str(self.profile.id)})
+
+        expected = self.client.get(reverse('tasks', kwargs={'lang': 'ru', 'profileId': self.profile.id}))
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'adminpass')
+        response = self.call(views.AsyncTasksListView, query='?stream=1', profileId=self.profile.id,
+                             headers={'Authorization': f'Bearer {AccessToken.for_user(admin_user)}'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected.json()['results'])
+
+    def test_errors(self):
+        response = self.call(views.AsyncProfileRetrieveView, profileId=uuid.uuid4())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.call(views.AsyncProfilesListView, query='?page=100')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.call(views.AsyncSubmissionCreateUpdateRetrieveView, headers={}, taskId=self.task.id)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_write_methods_use_sync_handlers(self):
+        response = self.call(views.AsyncSubmissionCreateUpdateRetrieveView, method='put',
+                             data={'comment': 'Updated comment'}, taskId=self.task.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Submission.objects.get(task_id=self.task).comment, 'Updated comment')
+
+    def test_urls_use_async_views_under_asgi(self):
+        with override_settings(ASYNC_READ_VIEWS=True):
+            self.assertIs(read_view(views.TasksListView, views.AsyncTasksListView).view_class, views.AsyncTasksListView)
+        with override_settings(ASYNC_READ_VIEWS=False):
+            self.assertIs(read_view(views.TasksListView, views.AsyncTasksListView).view_class, views.TasksListView)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.lags = {'replica_1': 0.0, 'replica_2': 0.0}
+        patcher = mock.patch('api.replicas.measure_replica_lag', side_effect=lambda alias: self.lags[alias])
+        self.measure = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'userpass') for i in range(2)]
+        self.token = str(AccessToken.for_user(self.users[0]))
+
+    def request(self, method='get', view=views.ProfilesListView, token=None):
+        """Прогоняет запрос через middleware и возвращает базу, с которой представление читало бы модели"""
+        request = getattr(self.factory, method)('/', HTTP_AUTHORIZATION=f'Bearer {token or self.token}')
+        databases = []
+
+        def get_response(request):
+            middleware.process_view(request, view.as_view(), (), {})
+            databases.append(self.router.db_for_read(Profile))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        self.assertIsNone(self.router.db_for_read(Profile))
+        return databases[0]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertIn(self.request(), ('replica_1', 'replica_2'))
+        self.assertIn(self.request(view=AdminUsersListView), ('replica_1', 'replica_2'))
+        self.assertIsNone(self.request(view=TokenObtainPairView))
+        self.assertIsNone(self.request(method='post'))
+
+    def test_read_your_writes(self):
+        self.request(method='patch', view=views.TaskRetrieveView)
+        self.assertIsNone(self.request())
+        self.assertIsNotNone(self.request(token=str(AccessToken.for_user(self.users[1]))))
+
+        cache.clear()
+        self.assertIsNotNone(self.request())
+
+    def test_read_your_writes_after_token_change(self):
+        self.request(method='patch', view=views.TaskRetrieveView)
+        # Новый токен того же пользователя (обновление или повторный вход) по-прежнему читает с primary
+        new_token = str(AccessToken.for_user(self.users[0]))
+        self.assertNotEqual(new_token, self.token)
+        self.assertIsNone(self.request(token=new_token))
+
+    def test_invalid_token_not_pinned(self):
+        self.request(method='patch', view=views.TaskRetrieveView, token='not-a-jwt')
+        self.assertEqual(cache.keys('replica_pin_*'), [])
+        self.assertIsNotNone(self.request(token='not-a-jwt'))
+
+    def test_streaming_body_reads_chosen_replica(self):
+        view = views.ProfilesListView(request=mock.Mock(accepted_renderer=JSONRenderer()), kwargs={'lang': 'ru'},
+                                      lang='ru', pagination_class=None, format_kwarg=None)
+        querysets = []
+
+        def get_response(request):
+            middleware.process_view(request, views.ProfilesListView.as_view(), (), {})
+            view.streaming_list_response(Profile.objects.all())
+            view.sql_list_response(Profile.objects.all())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        with mock.patch.object(QuerySet, 'iterator', autospec=True,
+                               side_effect=lambda queryset, **kwargs: querysets.append(queryset) or iter(())):
+            middleware(self.factory.get('/'))
+        # Тело ответа читается после выхода из middleware: база должна остаться той, что выбрана для запроса
+        self.assertEqual(len(querysets), 2)
+        for queryset in querysets:
+            self.assertIn(queryset.db, ('replica_1', 'replica_2'))
+
+    def test_lagging_replica_skipped(self):
+        self.lags['replica_1'] = 30.0
+        self.assertEqual({self.request() for _ in range(10)}, {'replica_2'})
+
+        cache.clear()
+        self.lags['replica_2'] = float('inf')
+        self.assertIsNone(self.request())
+
+    def test_lag_measured_once_per_interval(self):
+        for _ in range(5):
+            self.request()
+        self.assertEqual(self.measure.call_count, 2)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertIsNone(self.request())
+        self.measure.assert_not_called()
+
+    def test_router_writes_to_primary(self):
+        profile = Profile(description_ru='Профиль')
+        profile._state.db = 'replica_1'
+        task = Task(title_ru='Задача')
+        task._state.db = 'default'
+        self.assertEqual(self.router.db_for_write(Profile, instance=profile), 'default')
+        self.assertTrue(self.router.allow_relation(profile, task))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'api'))
+        self.assertIsNone(self.router.allow_migrate('default', 'api'))
+
+
+class UniqueConstraintsMigrationTest(TransactionTestCase):
+    migrate_from = [('api', '0003_alter_profile_options_alter_profilefile_file_and_more')]
+    migrate_to = [('api', '0004_unique_constraints')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_merged_before_constraints(self):
+        get_model = self.apps.get_model
+        user = get_model('users', 'User').objects.create(username='testuser', email='test@example.com')
+        profile = get_model('api', 'Profile').objects.create(description_ru='Профиль', description_en='Profile')
+        task = get_model('api', 'Task').objects.create(title_ru='Задача', title_en='Task', description_ru='',
+                                                      description_en='', profile_id=profile)
+        Submission = get_model('api', 'Submission')
+        plain = Submission.objects.create(user_id=user, task_id=task, comment='Первый')
+        with_history = Submission.objects.create(user_id=user, task_id=task, comment='Второй')
+        reviewed = Submission.objects.create(user_id=user, task_id=task, comment='Третий', status='ACCEPTED')
+        history = get_model('api', 'SubmissionHistory').objects.create(submission=reviewed, previous_comment='')
+        for submission in (plain, with_history, reviewed):
+            get_model('api', 'TaskSubmission').objects.create(task=task, submission=submission)
+        get_model('api', 'SubmissionHistory').objects.filter(id=history.id).update(submission=with_history)
+        for _ in range(2):
+            get_model('api', 'UserProfile').objects.create(user=user, profile=profile)
+            get_model('api', 'TaskProfile').objects.create(task=task, profile=profile)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+
+        self.assertEqual(list(apps.get_model('api', 'Submission').objects.values_list('id', flat=True)),
+                         [with_history.id])
+        self.assertEqual(apps.get_model('api', 'SubmissionHistory').objects.get().submission_id, with_history.id)
+        self.assertEqual(apps.get_model('api', 'TaskSubmission').objects.get().submission_id, with_history.id)
+        self.assertEqual(apps.get_model('api', 'UserProfile').objects.count(), 1)
+        self.assertEqual(apps.get_model('api', 'TaskProfile').objects.count(), 1)
+
+    def test_reviewed_submission_kept_without_history(self):
+        get_model = self.apps.get_model
+        user = get_model('users', 'User').objects.create(username='testuser', email='test@example.com')
+        profile = get_model('api', 'Profile').objects.create(description_ru='Профиль', description_en='Profile')
+        task = get_model('api', 'Task').objects.create(title_ru='Задача', title_en='Task', description_ru='',
+                                                      description_en='', profile_id=profile)
+        Submission = get_model('api', 'Submission')
+        Submission.objects.create(user_id=user, task_id=task, comment='Первый')
+        reviewed = Submission.objects.create(user_id=user, task_id=task, comment='Второй', admin_comment='Хорошо')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        self.assertEqual(apps.get_model('api', 'Submission').objects.get().id, reviewed.id)
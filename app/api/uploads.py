@@ -0,0 +1,107 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db.models import Count, Sum
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
+
+from api.models import ProfileFile
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Upload size exceeded"
+
+
+def get_profile_usage(profile_id):
+    """Возвращает количество и суммарный размер файлов профиля"""
+    usage = ProfileFile.objects.filter(profile_id=profile_id).aggregate(count=Count('id'), size=Sum('size'))
+    return usage['count'], usage['size'] or 0
+
+
+def check_profile_limits(profile_id, new_files_count, new_files_size):
+    """Проверяет, что новые файлы поместятся в лимиты профиля по количеству и суммарному размеру"""
+    count, size = get_profile_usage(profile_id)
+    if count + new_files_count > settings.PROFILE_MAX_NUMBER_FILES:
+        raise UploadTooLarge(f"Total number of files exceeded, maximum is {settings.PROFILE_MAX_NUMBER_FILES}")
+    if size + new_files_size > settings.PROFILE_MAX_TOTAL_SIZE:
+        raise UploadTooLarge(
+            f"Total size of profile files exceeded, maximum is {settings.PROFILE_MAX_TOTAL_SIZE} bytes")
+
+
+def file_checksum(file):
+    """SHA-256 файла: берется посчитанный при загрузке или считается по частям"""
+    checksum = getattr(file, 'checksum', None)
+    if checksum:
+        return checksum
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ProfileFileUploadHandler(FileUploadHandler):
+    """
+    Пишет загружаемые файлы частями во временный файл на диске, попутно считая SHA-256,
+    и прерывает загрузку с 413, как только превышен лимит на файл, на профиль или на количество файлов.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None, max_file_size=None, remaining_size=None, remaining_files=None):
+        super().__init__(request)
+        self.max_file_size = max_file_size
+        self.remaining_size = remaining_size
+        self.remaining_files = remaining_files
+        self.file = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.remaining_files is not None:
+            if self.remaining_files <= 0:
+                raise UploadTooLarge(f"Total number of files exceeded, maximum is {settings.PROFILE_MAX_NUMBER_FILES}")
+            self.remaining_files -= 1
+
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.max_file_size is not None and self.size > self.max_file_size:
+            self.abort(f"File '{self.file_name}' size exceeded, maximum size {self.max_file_size} bytes")
+        if self.remaining_size is not None and self.size > self.remaining_size:
+            self.abort(f"Total size of profile files exceeded, maximum is {settings.PROFILE_MAX_TOTAL_SIZE} bytes")
+
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.checksum = self.sha256.hexdigest()
+        if self.remaining_size is not None:
+            self.remaining_size -= file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+
+    def abort(self, detail):
+        # Временный файл удаляется при закрытии, остаток тела запроса не читается
+        self.upload_interrupted()
+        raise UploadTooLarge(detail)
+
+
+class StreamingMultiPartParser(MultiPartParser):
+    """Multipart-парсер, который берет обработчики загрузки у view (метод get_upload_handlers)"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        get_upload_handlers = getattr(parser_context.get('view'), 'get_upload_handlers', None)
+        if get_upload_handlers is not None:
+            request.upload_handlers = get_upload_handlers(request)
+        return super().parse(stream, media_type, parser_context)
@@ -1,14 +1,26 @@
+from django.conf import settings
 from django.urls import path, include
 from . import views
 
+
+def read_view(view_class, async_view_class):
+    """Под ASGI (ASYNC_READ_VIEWS) горячие представления чтения подключаются в асинхронном варианте"""
+    return (async_view_class if settings.ASYNC_READ_VIEWS else view_class).as_view()
+
+
 urlpatterns = [
     path("auth/", include("users.urls")),
-    path("profiles/", views.ProfilesListView.as_view(), name='profiles'),
-    path("profiles/<uuid:profileId>/", views.ProfileRetrieveView.as_view(), name='profile-detail'),
-    path("profiles/<uuid:profileId>/tasks/", views.TasksListView.as_view(), name='tasks'),
-    path("tasks/<uuid:taskId>/", views.TaskRetrieveView.as_view(), name='task-detail'),
-    path("tasks/<uuid:taskId>/submission/", views.SubmissionCreateUpdateRetrieveView.as_view(), name='submission-detail'),
+    path("profiles/", read_view(views.ProfilesListView, views.AsyncProfilesListView), name='profiles'),
+    path("profiles/<uuid:profileId>/", read_view(views.ProfileRetrieveView, views.AsyncProfileRetrieveView),
+         name='profile-detail'),
+    path("profiles/<uuid:profileId>/tasks/", read_view(views.TasksListView, views.AsyncTasksListView), name='tasks'),
+    path("profiles/<uuid:profileId>/files/<int:fileId>/", views.ProfileFileDownloadView.as_view(),
+         name='profile-file-download'),
+    path("profiles/<uuid:profileId>/files/<int:fileId>/link/", views.ProfileFileLinkView.as_view(),
+         name='profile-file-link'),
+    path("tasks/<uuid:taskId>/", read_view(views.TaskRetrieveView, views.AsyncTaskRetrieveView), name='task-detail'),
+    path("tasks/<uuid:taskId>/submission/",
+         read_view(views.SubmissionCreateUpdateRetrieveView, views.AsyncSubmissionCreateUpdateRetrieveView),
+         name='submission-detail'),
     path("admin/", include("admin_api.urls")),
 ]
-
-
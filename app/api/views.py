@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
@@ -5,21 +6,27 @@ from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.generics import GenericAPIView, get_object_or_404
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.mixins import CreateModelMixin, UpdateModelMixin, RetrieveModelMixin
 from rest_framework.response import Response
-from django.core.cache import cache
-
-from api.exceptions import DuplicateSubmissionError
-from api.mixins import UserActionLogMixin
-from api.models import Profile, Task, Submission
+from django.conf import settings
+from django.shortcuts import aget_object_or_404
+from django.urls import reverse
+
+from api.fast import FastListSerializer
+from api.downloads import IgnoreClientContentNegotiation, make_download_token, serve_profile_file
+from api.mixins import AsyncListMixin, AsyncReadMixin, CompressedCacheMixin, QueryPlannerMixin, SQLJSONListMixin, \
+    StreamingListMixin, UserActionLogMixin
+from api.models import Profile, Task, Submission, ProfileFile
 from api.filters import TasksFilter, SubmissionsFilter
 from api.serializers import ProfileSerializer, TaskSerializer, SubmissionSerializer, SubmissionCreateUpdateSerializer
-from api.permissions import IsProfileOwnerOrReadOnly, TaskNotDonePermission, SubmissionTaskNotDonePermission
+from api.permissions import IsProfileOwnerOrReadOnly, TaskNotDonePermission, SubmissionTaskNotDonePermission, \
+    IsProfileFileMember, IsProfileFileMemberOrSignedURL
 
 User = get_user_model()
 
 
-class BaseLangAPIView(UserActionLogMixin, GenericAPIView):
+class BaseLangAPIView(CompressedCacheMixin, QueryPlannerMixin, UserActionLogMixin, GenericAPIView):
 
     def initial(self, request, *args, **kwargs):
         super().initial(request, *args, **kwargs)
@@ -30,38 +37,82 @@ class BaseLangAPIView(UserActionLogMixin, GenericAPIView):
             return "en"
         return "ru"
 
+    def get_field_selection(self) -> dict:
+        """?fields=a,b и ?include=c превращаются в аргументы DynamicFieldsMixin (только при чтении)"""
+        if self.request.method not in SAFE_METHODS:
+            return {}
+        selection = {}
+        for param, kwarg in (('fields', 'only_fields'), ('include', 'include_fields')):
+            value = self.request.query_params.get(param)
+            if value is not None:
+                selection[kwarg] = tuple(sorted({name.strip() for name in value.split(',') if name.strip()}))
+        return selection
+
+    def get_field_selection_key(self) -> str:
+        """Часть ключа кэша, по которой ответы с разным набором полей не смешиваются"""
+        selection = self.get_field_selection()
+        return ''.join(f"_{kwarg}_{','.join(names)}" for kwarg, names in sorted(selection.items()))
 
-class BaseListLangAPIView(BaseLangAPIView):
+
+class BaseListLangAPIView(StreamingListMixin, SQLJSONListMixin, BaseLangAPIView):
     not_found_name: str = None
     list_base_cache_name: str = None
+    fast_list: bool = False  # Сериализовать список через values() (api.fast), если это позволяют поля
+
+    def get_fast_serializer(self):
+        if not self.fast_list or self.request.method != 'GET':
+            return None
+        return FastListSerializer.compile(self.get_serializer())
+
+    def get_list_cache_key(self):
+        page = self.request.query_params.get('page', 1)
+        return f'{self.list_base_cache_name}_list_{self.lang}_page_{page}{self.get_field_selection_key()}'
 
     def list(self, request, *args, **kwargs):
-        page = request.query_params.get('page', 1)
+        sql_engine = self.wants_sql_engine()
+        stream = self.wants_stream()
 
-        cache_key = f'{self.list_base_cache_name}_list_{self.lang}_page_{page}'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+        cache_key = self.get_list_cache_key()
+        cached_response = None if sql_engine or stream else self.get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
 
         queryset = self.filter_queryset(self.get_queryset())
         if not queryset.exists():
             raise NotFound(self.not_found_name)
-        page = self.paginate_queryset(queryset)
 
-        if page is not None:
+        if sql_engine:
+            # Текст ответа собирает Postgres, поэтому он не кэшируется вместе с данными DRF
+            response = self.sql_list_response(queryset)
+            if response is not None:
+                return response
+
+        fast_serializer = self.get_fast_serializer()
+        page = None if stream else self.paginate_queryset(
+            queryset if fast_serializer is None else fast_serializer.values(queryset))
+
+        if page is None and (stream or not self.is_small_list(queryset)):
+            # Вся большая выборка целиком: пишем ее потоком, не собирая список в памяти и не кэшируя
+            response = self.streaming_list_response(queryset, fast_serializer)
+            if response is not None:
+                return response
+
+        if fast_serializer is not None:
+            data = fast_serializer.to_representation(fast_serializer.values(queryset) if page is None else page)
+            response_data = data if page is None else self.get_paginated_response(data).data
+        elif page is not None:
             serializer = self.get_serializer(page, many=True)
             response_data = self.get_paginated_response(serializer.data).data
         else:
             serializer = self.get_serializer(queryset, many=True)
             response_data = serializer.data
 
-        cache.set(cache_key, response_data, timeout=60)
-
-        return Response(response_data)
+        return self.cache_response(cache_key, response_data)
 
 
 class ProfilesListView(BaseListLangAPIView):
     list_base_cache_name = "profiles"
+    fast_list = True
     not_found_name = "Profiles not found"
     serializer_class = ProfileSerializer
 
@@ -69,12 +120,13 @@ class ProfilesListView(BaseListLangAPIView):
         lang = self.get_exclude_lang()
 
         kwargs['exclude_fields'] = ('files', 'tasks', f'description_{lang}', f'description_{lang}_html')
+        kwargs.update(self.get_field_selection())
 
         serializer = self.get_serializer_class()
         return serializer(*args, **kwargs)
 
     def get_queryset(self):
-        return Profile.objects.prefetch_related('tasks')
+        return Profile.objects.filter(deleted_at__isnull=True)
 
     def get(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
@@ -91,34 +143,84 @@ class ProfileRetrieveView(RetrieveModelMixin, BaseLangAPIView):
         lang = self.get_exclude_lang()
 
         kwargs['exclude_fields'] = ('user_id', 'files', f'description_{lang}', f'description_{lang}_html')
+        kwargs.update(self.get_field_selection())
         serializer = self.get_serializer_class()
         return serializer(*args, **kwargs)
 
+    def get_queryset(self):
+        return Profile.objects.filter(deleted_at__isnull=True)
+
     def get_object(self):
         profile_id = self.kwargs.get("profileId")
-        profile = get_object_or_404(Profile.objects.prefetch_related('tasks'), id=profile_id)
+        profile = get_object_or_404(self.filter_queryset(self.get_queryset()), id=profile_id)
         self.check_object_permissions(self.request, profile)
         return profile
 
+    def get_cache_key(self):
+        # Кэшируется только ответ с полным набором полей
+        return None if self.get_field_selection() else f"profile_{self.lang}_{self.kwargs.get('profileId')}"
+
     def get(self, request, *args, **kwargs):
         profile_id = self.kwargs.get("profileId")
-        cache_key = f"profile_{self.lang}_{profile_id}"
-        cached_response = cache.get(cache_key)
+        cache_key = self.get_cache_key()
+        cached_response = cache_key and self.get_cached_response(cache_key)
 
         if cached_response:
             self.log_user_action(f"Retrieved profile {profile_id}")
-            return Response(cached_response)
+            return cached_response
 
         response = self.retrieve(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=60)
+        if cache_key:
+            response = self.cache_response(cache_key, response.data)
 
         self.log_user_action(f"Retrieved profile {profile_id}")
 
         return response
 
 
+class ProfileFileDownloadView(BaseLangAPIView):
+    """
+    Скачивание файла профиля. Доступ проверяет Django, а сами байты при FILE_DOWNLOAD_BACKEND=nginx/sendfile
+    отдает веб-сервер; в режиме django поддерживаются Range, ETag и Last-Modified.
+    """
+    permission_classes = (IsProfileFileMemberOrSignedURL,)
+    content_negotiation_class = IgnoreClientContentNegotiation
+    pagination_class = None
+    filter_backends = ()
+
+    def get_queryset(self):
+        return ProfileFile.objects.filter(profile_id=self.kwargs.get('profileId'), profile__deleted_at__isnull=True)
+
+    def get_object(self):
+        profile_file = get_object_or_404(self.get_queryset(), id=self.kwargs.get('fileId'))
+        self.check_object_permissions(self.request, profile_file)
+        return profile_file
+
+    def get(self, request, *args, **kwargs):
+        profile_file = self.get_object()
+        self.log_user_action(f"Downloaded file {profile_file.id} of profile {profile_file.profile_id}")
+        return serve_profile_file(request, profile_file)
+
+
+class ProfileFileLinkView(ProfileFileDownloadView):
+    """Выдает подписанную ссылку на скачивание файла, которая действует FILE_DOWNLOAD_URL_TTL секунд"""
+    permission_classes = (IsProfileFileMember,)
+    content_negotiation_class = GenericAPIView.content_negotiation_class
+
+    def get(self, request, *args, **kwargs):
+        profile_file = self.get_object()
+        url = reverse('profile-file-download', kwargs={
+            'lang': self.lang, 'profileId': profile_file.profile_id, 'fileId': profile_file.id})
+        self.log_user_action(f"Created download link for file {profile_file.id} of profile {profile_file.profile_id}")
+        return Response({
+            'url': request.build_absolute_uri(f'{url}?token={make_download_token(profile_file)}'),
+            'expires_in': settings.FILE_DOWNLOAD_URL_TTL,
+        })
+
+
 class TasksListView(BaseListLangAPIView):
     list_base_cache_name = "tasks"
+    fast_list = True
     not_found_name = "No tasks found matching the given criteria"
     lookup_url_kwarg = "profileId"
     filterset_class = TasksFilter
@@ -127,15 +229,21 @@ class TasksListView(BaseListLangAPIView):
 
     def get_queryset(self):
         profile_id = self.kwargs.get('profileId')
-        queryset = Task.objects.select_related('profile_id').prefetch_related('submissions').filter(profile_id=profile_id)
+        queryset = Task.objects.filter(
+            profile_id=profile_id, deleted_at__isnull=True, profile_id__deleted_at__isnull=True)
         return queryset
 
     def get_serializer(self, *args, **kwargs):
         lang = self.get_exclude_lang()
         kwargs['exclude_fields'] = (
             'profile', 'submissions', f'title_{lang}', f'description_{lang}', f'description_{lang}_html', 'profile_id')
-        serializer = self.get_serializer_class()
-        return serializer(*args, **kwargs)
+        kwargs.update(self.get_field_selection())
+        serializer = self.get_serializer_class()(*args, **kwargs)
+        # Профиль из ?include=profile выводится без файлов: список задач доступен не только участникам профиля
+        profile = getattr(serializer, 'child', serializer).fields.get('profile')
+        if profile is not None:
+            profile.fields.pop('files', None)
+        return serializer
 
     def get_ordering_fields(self):
         fields = ['id', 'status', 'type', 'submissions_count', f'title_{self.lang}']
@@ -153,27 +261,33 @@ class TaskRetrieveView(RetrieveModelMixin, BaseLangAPIView):
     lookup_url_kwarg = 'taskId'
 
     def get_queryset(self):
-        return Task.objects.select_related('profile_id').prefetch_related('submissions')
+        return Task.objects.filter(deleted_at__isnull=True, profile_id__deleted_at__isnull=True)
 
     def get_serializer(self, *args, **kwargs):
         lang = self.get_exclude_lang()
         kwargs['exclude_fields'] = (f'title_{lang}', f'description_{lang}', f'description_{lang}_html')
+        kwargs.update(self.get_field_selection())
 
         serializer = self.get_serializer_class()
 
         return serializer(*args, **kwargs)
 
+    def get_cache_key(self):
+        # Кэшируется только ответ с полным набором полей
+        return None if self.get_field_selection() else f"task_{self.lang}_{self.kwargs.get('taskId')}"
+
     def get(self, request, *args, **kwargs):
         task_id = self.kwargs.get('taskId')
-        cache_key = f"task_{self.lang}_{task_id}"
-        cached_response = cache.get(cache_key)
+        cache_key = self.get_cache_key()
+        cached_response = cache_key and self.get_cached_response(cache_key)
 
         if cached_response:
             self.log_user_action(f"Retrieved task {task_id}")
-            return Response(cached_response)
+            return cached_response
 
         response = self.retrieve(request, *args, **kwargs)
-        cache.set(cache_key, response.data, timeout=60)
+        if cache_key:
+            response = self.cache_response(cache_key, response.data)
 
         self.log_user_action(f"Retrieved task {task_id}")
         return response
@@ -188,7 +302,8 @@ class SubmissionCreateUpdateRetrieveView(UserActionLogMixin, CreateModelMixin, U
     ordering_fields = ('status',)
 
     def get_queryset(self):
-        return Submission.objects.select_related('task_id').only('task_id__status', 'comment')
+        return Submission.objects.select_related('task_id').only(
+            'task_id__status', 'user_id', 'comment', 'admin_comment', 'status')
 
     def get_object(self):
         queryset = self.get_queryset()
@@ -216,18 +331,13 @@ class SubmissionCreateUpdateRetrieveView(UserActionLogMixin, CreateModelMixin, U
         serializer.is_valid(raise_exception=True)
 
         task_id = self.kwargs.get('taskId')
-        task = get_object_or_404(Task, id=task_id)
+        task = get_object_or_404(Task, id=task_id, deleted_at__isnull=True, profile_id__deleted_at__isnull=True)
 
         if task.status == 'DONE':
             raise PermissionDenied("This task is already completed and cannot be accessed.")
 
-        user = self.request.user
-
-        if Submission.objects.filter(task_id=task_id, user_id=user).exists():
-            raise DuplicateSubmissionError()
-
         serializer.context['task'] = task
-        serializer.context['user'] = user
+        serializer.context['user'] = self.request.user
 
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
@@ -266,4 +376,72 @@ class SubmissionCreateUpdateRetrieveView(UserActionLogMixin, CreateModelMixin, U
         return self.update(request, *args, **kwargs)
 
     def patch(self, request, *args, **kwargs):
-        return self.partial_update(request, *args, **kwargs)
\ No newline at end of file
+        return self.partial_update(request, *args, **kwargs)
+
+
+# Асинхронные версии представлений чтения для ASGI (см. api/urls.py и taskplatform/asgi.py).
+# Запись, права и сериализаторы - от синхронных родителей, GET идет через aget().
+
+class AsyncProfilesListView(AsyncListMixin, ProfilesListView):
+
+    async def aget(self, request, *args, **kwargs):
+        response = await self.alist(request, *args, **kwargs)
+        await self.alog_user_action("Viewed profile list")
+        return response
+
+
+class AsyncProfileRetrieveView(AsyncReadMixin, ProfileRetrieveView):
+    lookup_field = 'id'
+    lookup_url_kwarg = 'profileId'
+
+    async def aget(self, request, *args, **kwargs):
+        profile_id = self.kwargs.get("profileId")
+        cache_key = self.get_cache_key()
+        response = cache_key and await self.aget_cached_response(cache_key)
+
+        if not response:
+            response = await self.aretrieve(request, *args, **kwargs)
+            if cache_key:
+                response = await self.acache_response(cache_key, response.data)
+
+        await self.alog_user_action(f"Retrieved profile {profile_id}")
+        return response
+
+
+class AsyncTasksListView(AsyncListMixin, TasksListView):
+
+    async def aget(self, request, *args, **kwargs):
+        response = await self.alist(request, *args, **kwargs)
+        await self.alog_user_action(f"Viewed tasks list for profile {self.kwargs.get('profileId')}")
+        return response
+
+
+class AsyncTaskRetrieveView(AsyncReadMixin, TaskRetrieveView):
+
+    async def aget(self, request, *args, **kwargs):
+        task_id = self.kwargs.get('taskId')
+        cache_key = self.get_cache_key()
+        response = cache_key and await self.aget_cached_response(cache_key)
+
+        if not response:
+            response = await self.aretrieve(request, *args, **kwargs)
+            if cache_key:
+                response = await self.acache_response(cache_key, response.data)
+
+        await self.alog_user_action(f"Retrieved task {task_id}")
+        return response
+
+
+class AsyncSubmissionCreateUpdateRetrieveView(AsyncReadMixin, SubmissionCreateUpdateRetrieveView):
+
+    async def aget_object(self):
+        obj = await aget_object_or_404(
+            self.get_queryset(), user_id=self.request.user, task_id=self.kwargs.get('taskId'))
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+    async def aget(self, request, *args, **kwargs):
+        response = await self.aretrieve(request, *args, **kwargs)
+
+        await self.alog_user_action(f"Viewed himself submission for task {self.kwargs.get('taskId')}")
+        return response
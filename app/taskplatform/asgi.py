@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taskplatform.settings")
+# Под ASGI горячие представления чтения работают асинхронно (api/urls.py); ASYNC_READ_VIEWS= отключает их
+os.environ.setdefault("ASYNC_READ_VIEWS", "1")
 
 application = get_asgi_application()
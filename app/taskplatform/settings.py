@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import importlib.util
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.replicas.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -104,6 +106,20 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (api.replicas): DATABASE_REPLICA_HOSTS=host[:port],... с теми же БД и пользователем
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    replica_host, _, replica_port = replica_host.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES['default']['PORT'],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -147,12 +163,39 @@ else:
         'django.contrib.staticfiles.finders.FileSystemFinder',
         'django.contrib.staticfiles.finders.AppDirectoriesFinder',
     )
-    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
     STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+PROFILE_FILES_STORAGE = os.environ.get('PROFILE_FILES_STORAGE') or 'filesystem'  # Хранилище файлов профилей: filesystem или s3 (S3-совместимое, например MinIO)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'profile_files': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+}
+
+if PROFILE_FILES_STORAGE == 's3':
+    STORAGES['profile_files'] = {
+        'BACKEND': 'api.s3.ProfileFilesS3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('S3_BUCKET_NAME'),
+            'endpoint_url': os.environ.get('S3_ENDPOINT_URL') or None,  # Адрес MinIO или другого S3-совместимого хранилища
+            'access_key': os.environ.get('S3_ACCESS_KEY_ID'),
+            'secret_key': os.environ.get('S3_SECRET_ACCESS_KEY'),
+            'region_name': os.environ.get('S3_REGION_NAME') or None,
+            'default_acl': None,
+            'querystring_auth': True,
+        },
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -171,6 +214,18 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        # application/msgpack включается, если установлен msgpack
+        *(('api.renderers.MessagePackRenderer',) if importlib.util.find_spec('msgpack') else ()),
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(('api.parsers.MessagePackParser',) if importlib.util.find_spec('msgpack') else ()),
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': os.environ.get('PAGINATION_PAGE_SIZE'),
 
@@ -226,5 +281,24 @@ INTERNAL_IPS = [
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('DATA_UPLOAD_MAX_MEMORY_SIZE'))  # Максимальный размер загружаемого файла в БИТ
 PROFILE_MAX_NUMBER_FILES = int(os.environ.get('PROFILE_MAX_NUMBER_FILES'))  # Максимальное количество файлов у профиля
 PROFILE_MAX_FILE_SIZE = int(os.environ.get('PROFILE_MAX_FILE_SIZE'))  # Максимальный размер загружаемого файла в профиле в БИТ
-
-
+SUBMISSION_HISTORY_CHANGED_FIELDS_ONLY = bool(os.environ.get('SUBMISSION_HISTORY_CHANGED_FIELDS_ONLY'))  # Хранить в истории ответа только измененные поля
+SUBMISSION_REVIEW_LEASE_SECONDS = int(os.environ.get('SUBMISSION_REVIEW_LEASE_SECONDS', 300))  # На сколько секунд ответ закрепляется за проверяющим
+
+
+USER_PROVISION_HASH_WORKERS = int(os.environ.get('USER_PROVISION_HASH_WORKERS') or 0) or None  # Количество процессов для хеширования паролей в команде provision_users (по умолчанию - число ядер)
+BACKGROUND_TASKS_EAGER = bool(os.environ.get('BACKGROUND_TASKS_EAGER'))  # Выполнять фоновые задачи синхронно после коммита (для тестов и отладки)
+BACKGROUND_TASKS_WORKERS = int(os.environ.get('BACKGROUND_TASKS_WORKERS', 2))  # Количество потоков для фоновых задач
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', 1000))  # Сколько строк удаляется за одну транзакцию при фоновом удалении
+PROFILE_MAX_TOTAL_SIZE = int(os.environ.get('PROFILE_MAX_TOTAL_SIZE') or PROFILE_MAX_FILE_SIZE * PROFILE_MAX_NUMBER_FILES)  # Максимальный суммарный размер файлов профиля в БАЙТ
+RESUMABLE_UPLOAD_DIR = os.environ.get('RESUMABLE_UPLOAD_DIR') or BASE_DIR / 'uploads'  # Каталог для частей возобновляемых загрузок
+RESUMABLE_UPLOAD_TTL = int(os.environ.get('RESUMABLE_UPLOAD_TTL', 24 * 60 * 60))  # Сколько секунд хранится незавершенная сессия загрузки
+FILE_DOWNLOAD_BACKEND = os.environ.get('FILE_DOWNLOAD_BACKEND') or 'django'  # Кто отдает файлы профилей: django, nginx (X-Accel-Redirect) или sendfile (X-Sendfile)
+FILE_DOWNLOAD_ACCEL_PREFIX = os.environ.get('FILE_DOWNLOAD_ACCEL_PREFIX') or '/protected-media/'  # internal location nginx, из которого отдаются файлы при X-Accel-Redirect
+FILE_DOWNLOAD_URL_TTL = int(os.environ.get('FILE_DOWNLOAD_URL_TTL', 5 * 60))  # Сколько секунд действует подписанная ссылка на скачивание файла
+FILE_CLEANUP_RETRIES = int(os.environ.get('FILE_CLEANUP_RETRIES', 3))  # Сколько раз фоновая очистка файлов пытается удалить содержимое
+FILE_CLEANUP_RETRY_DELAY = float(os.environ.get('FILE_CLEANUP_RETRY_DELAY', 1))  # Пауза в секундах перед повтором (растет с номером попытки)
+PRESIGNED_UPLOAD_TTL = int(os.environ.get('PRESIGNED_UPLOAD_TTL', 15 * 60))  # Сколько секунд действует ссылка на прямую загрузку файла в хранилище
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024))  # Ответы из кэша меньше этого размера в байтах не сжимаются
+ASYNC_READ_VIEWS = bool(os.environ.get('ASYNC_READ_VIEWS'))  # Асинхронные представления чтения (включается в taskplatform/asgi.py)
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))  # Реплика, отстающая больше этого числа секунд, не используется для чтения
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))  # Сколько секунд после запроса с записью клиент читает с primary
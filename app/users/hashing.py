@@ -0,0 +1,21 @@
+"""
+Хеширование паролей в отдельных процессах. Модуль намеренно не импортирует Django: процессы запускаются
+через spawn и загружают только его и класс хешера, без настроек, моделей и сигналов.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def encode_password(hasher, password, salt):
+    return hasher.encode(password, salt)
+
+
+def encode_passwords_in_processes(hasher, passwords, salts, workers):
+    """
+    Хеширует пароли в workers процессах. spawn, а не fork: в родительском процессе уже работают потоки
+    (api.background), и копия их блокировок в дочернем процессе может зависнуть навсегда.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(encode_password, [hasher] * len(passwords), passwords, salts, chunksize=chunksize))
@@ -0,0 +1,43 @@
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import provision_users
+from users.serializers import UserProvisionSerializer
+
+
+class Command(BaseCommand):
+    help = "Массовое создание пользователей из CSV/JSON/NDJSON файла"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу с пользователями")
+        parser.add_argument('--format', choices=('csv', 'json', 'ndjson'), help="Формат файла (по умолчанию по расширению)")
+        parser.add_argument('--workers', type=int, help="Количество процессов для хеширования паролей")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                if file_format == 'csv':
+                    data = list(csv.DictReader(file))
+                elif file_format == 'json':
+                    data = json.load(file)
+                elif file_format == 'ndjson':
+                    data = [json.loads(line) for line in file if line.strip()]
+                else:
+                    raise CommandError(f"Unsupported file format: {file_format}")
+        except (OSError, ValueError, csv.Error) as err:
+            raise CommandError(f"Could not read {path}: {err}")
+
+        serializer = UserProvisionSerializer(data=data, many=True, allow_empty=False)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors, ensure_ascii=False, default=str))
+
+        workers = options['workers'] or settings.USER_PROVISION_HASH_WORKERS or os.cpu_count() or 1
+        users = provision_users(serializer.validated_data, workers=workers)
+        self.stdout.write(self.style.SUCCESS(f"Created {len(users)} users"))
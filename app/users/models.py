@@ -9,6 +9,7 @@ class User(AbstractUser):
     username = models.CharField(max_length=100, unique=True, verbose_name="Имя пользователя")
     email = models.EmailField(unique=True, verbose_name="Почта пользователя")
     profiles = models.ManyToManyField("api.Profile", verbose_name="Профили пользователя", blank=True, through="api.UserProfile")
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="Помечен на удаление")
 
 
 class UserActionLog(models.Model):
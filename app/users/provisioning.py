@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.db import transaction
+
+from admin_api.signals import invalidate_users_list_cache
+from api.models import UserProfile
+from users.hashing import encode_password, encode_passwords_in_processes
+
+User = get_user_model()
+
+# Меньше этого количества пароли хешируются в текущем процессе: запуск пула дороже самого хеширования
+PARALLEL_HASH_THRESHOLD = 64
+BATCH_SIZE = 1000
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Хеширует пароли хешером по умолчанию. При workers > 1 работа распределяется по процессам (users.hashing):
+    так делает только команда provision_users, в запросе веб-сервера пароли хешируются в текущем процессе.
+    """
+    hasher = get_hasher()
+    passwords = list(passwords)
+    # Соль генерируется здесь: хешеру в дочернем процессе не нужны настройки Django
+    salts = [hasher.salt() for _ in passwords]
+
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or workers <= 1:
+        return [encode_password(hasher, password, salt) for password, salt in zip(passwords, salts)]
+    return encode_passwords_in_processes(hasher, passwords, salts, workers)
+
+
+def provision_users(users_data, workers=1):
+    """
+    Создает пользователей и их привязки к профилям пачками.
+    users_data - список словарей с ключами username, email, password и необязательным profiles.
+    """
+    encoded_passwords = hash_passwords([user_data['password'] for user_data in users_data], workers=workers)
+
+    users = [
+        User(username=user_data['username'], email=user_data['email'], password=encoded_password)
+        for user_data, encoded_password in zip(users_data, encoded_passwords)
+    ]
+    user_profiles = [
+        UserProfile(user=user, profile_id=profile_id)
+        for user, user_data in zip(users, users_data)
+        for profile_id in user_data.get('profiles', ())
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        UserProfile.objects.bulk_create(user_profiles, batch_size=BATCH_SIZE)
+
+    # bulk_create не шлет post_save, поэтому список пользователей инвалидируется один раз
+    invalidate_users_list_cache()
+
+    return users
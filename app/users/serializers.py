@@ -1,24 +1,22 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from rest_framework import serializers
 
+from api.models import Profile
+from api.serializers import DynamicFieldsMixin
 from users.models import UserActionLog
 
 User = get_user_model()
 
 
-class DynamicFieldsUserSerializer(BaseUserSerializer):
-    def __init__(self, *args, **kwargs):
-        # Поля для включения/исключения
-        exclude_fields = kwargs.pop('exclude_fields', None)
-
-        super(DynamicFieldsUserSerializer, self).__init__(*args, **kwargs)
-
-        # Если указаны exclude_fields, то удаляем эти поля
-        if exclude_fields is not None:
-            for field_name in exclude_fields:
-                self.fields.pop(field_name, None)
+class DynamicFieldsUserSerializer(DynamicFieldsMixin, BaseUserSerializer):
+    pass
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -42,6 +40,11 @@ class UserChangePasswordSerializer(serializers.Serializer):
 
 class UserSerializer(DynamicFieldsUserSerializer):
     profiles_count = serializers.SerializerMethodField(method_name='get_count_profiles')
+    selectable_fields = ('id', 'username', 'email', 'profiles_count')
+    expandable_fields = ('profiles',)
+    planner_hints = {
+        'profiles_count': {'annotate': {'profiles_count': Count('profiles', distinct=True)}},
+    }
 
     class Meta(BaseUserSerializer.Meta):
         model = User
@@ -49,4 +52,57 @@ class UserSerializer(DynamicFieldsUserSerializer):
         read_only_fields = ['id']
 
     def get_count_profiles(self, obj):
-        return obj.profiles.count()
+        # Количество уже посчитано в запросе, если его строил планировщик
+        profiles_count = getattr(obj, 'profiles_count', None)
+        return obj.profiles.count() if profiles_count is None else profiles_count
+
+
+class ProfileIdsField(serializers.ListField):
+    child = serializers.UUIDField()
+
+    def to_internal_value(self, data):
+        # В CSV профили передаются одной ячейкой через ";"
+        if isinstance(data, str):
+            data = [profile_id for profile_id in data.replace(',', ';').split(';') if profile_id.strip()]
+        # Повторы одного профиля дали бы одинаковые привязки и нарушение unique_user_profile
+        return list(dict.fromkeys(super().to_internal_value(data)))
+
+
+class UserProvisionListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        errors = {}
+        for field in ('username', 'email'):
+            counts = Counter(user[field] for user in attrs)
+            duplicates = {value for value, count in counts.items() if count > 1}
+            existing = set(User.objects.filter(**{f'{field}__in': counts}).values_list(field, flat=True))
+            if duplicates or existing:
+                errors[field] = [f"User with {field} {value} already exists" for value in sorted(duplicates | existing)]
+
+        profile_ids = {profile_id for user in attrs for profile_id in user.get('profiles', ())}
+        existing_profile_ids = set(Profile.objects.filter(id__in=profile_ids).values_list('id', flat=True))
+        missing_profile_ids = profile_ids - existing_profile_ids
+        if missing_profile_ids:
+            errors['profiles'] = [f"Profile {profile_id} not found" for profile_id in sorted(map(str, missing_profile_ids))]
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class UserProvisionSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=100)
+    email = serializers.EmailField()
+    password = serializers.CharField(style={"input_type": "password"}, write_only=True)
+    profiles = ProfileIdsField(required=False, default=list)
+
+    class Meta:
+        fields = ('username', 'email', 'password', 'profiles')
+        list_serializer_class = UserProvisionListSerializer
+
+    def validate(self, attrs):
+        # Те же AUTH_PASSWORD_VALIDATORS, что и при регистрации через djoser (включая сходство с username/email)
+        try:
+            validate_password(attrs['password'], User(username=attrs['username'], email=attrs['email']))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'password': list(exc.messages)})
+        return attrs